@@ -0,0 +1,310 @@
+# pylint: disable=line-too-long
+# pylint: disable=broad-except
+
+"""Headless local HTTP API exposing Lexi's configured prompts to editors and scripts."""
+
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import secrets
+from urllib.parse import urlsplit
+from state_manager import StateManager
+from llm_service import LLMService
+from request_scheduler import PRIORITIES
+from model_router import ModelRouter
+from gemini_client import add_call_observer, configure_context_cache
+from usage_tracker import UsageTracker
+import llm_fixtures
+from prompt_processing import determine_input_type, find_prompt, fill_prompt_template, get_request_options, postprocess_response
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 415: "Unsupported Media Type", 500: "Internal Server Error"}
+_LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+
+class HttpError(Exception):
+    """An error answered with the given HTTP status and message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ApiServer:
+    """
+    Minimal asyncio HTTP/1.1 server bound to localhost.
+
+    Every request needs an "Authorization: Bearer <token>" header. Requests from
+    web pages (a foreign Origin) or through DNS rebinding (a non-localhost Host)
+    are refused, so a browser cannot spend the user's quota.
+
+    Endpoints:
+        GET  /prompts  Lists the prompts from prompts.json.
+        POST /run      Runs a prompt. JSON body: {"text", "prompt", "type", "from_language",
+                       "to_language", "custom_prompt", "stream", "priority"}. With "stream": true the response is a
+                       Server-Sent Events stream of {"delta"} events ending with a "done" event.
+    """
+
+    def __init__(self, state_manager, llm_service, token, host="127.0.0.1", port=8765, model_router=None):
+        """
+        Initializes the ApiServer.
+
+        Args:
+            state_manager: The StateManager with loaded settings and prompts.
+            llm_service: The LLMService running on the server's event loop.
+            token: The bearer token clients must send.
+            host: The interface to bind (localhost only by default).
+            port: The TCP port to listen on.
+            model_router: Optional ModelRouter choosing the model per request.
+        """
+        self.token = token
+        self.state_manager = state_manager
+        self.llm_service = llm_service
+        self.model_router = model_router or ModelRouter({})
+        self.host = host
+        self.port = port
+
+    async def serve_forever(self):
+        """Starts listening and serves clients until cancelled."""
+        server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        print(f"Lexi API server listening on http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    async def _read_request(self, reader):
+        """Reads one HTTP request. Returns (method, path, headers, body)."""
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        if not request_line:
+            raise HttpError(400, "Empty request")
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError as e:
+            raise HttpError(400, "Malformed request line") from e
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError as e:
+            raise HttpError(400, "Invalid Content-Length") from e
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), urlsplit(target).path, headers, body
+
+    def _check_access(self, headers):
+        """
+        Refuses requests from web pages and unauthenticated clients.
+
+        Raises:
+            HttpError: 403 for a foreign Origin or Host, 401 without the bearer token.
+        """
+        host = headers.get("host", "")
+        host_name = host.rsplit(":", 1)[0] if not host.endswith("]") else host
+        if host_name not in _LOCAL_HOSTS:
+            raise HttpError(403, "Host must be localhost") # DNS rebinding: a web page's name resolving to 127.0.0.1
+        origin = headers.get("origin")
+        if origin is not None and urlsplit(origin).hostname not in ("127.0.0.1", "localhost", "::1"):
+            raise HttpError(403, "Cross-origin requests are not allowed")
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode("utf-8"), self.token.encode("utf-8")):
+            raise HttpError(401, "Missing or wrong bearer token")
+
+    async def _handle_client(self, reader, writer):
+        """Serves a single connection (one request, then close)."""
+        try:
+            method, path, headers, body = await self._read_request(reader)
+            self._check_access(headers)
+            if path == "/prompts":
+                if method != "GET":
+                    raise HttpError(405, "Use GET")
+                await self._send_json(writer, 200, self.state_manager.get_prompts_config())
+            elif path == "/run":
+                if method != "POST":
+                    raise HttpError(405, "Use POST")
+                if headers.get("content-type", "").split(";", 1)[0].strip().lower() != "application/json":
+                    raise HttpError(415, "Content-Type must be application/json")
+                await self._handle_run(writer, body)
+            else:
+                raise HttpError(404, f"Unknown endpoint {path}")
+        except HttpError as e:
+            await self._send_json(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass # Client went away
+        except Exception as e:
+            print(f"Error handling API request: {e}")
+            try:
+                await self._send_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _send_json(self, writer, status, payload):
+        """Writes a complete JSON response."""
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+        await writer.drain()
+
+    async def _send_event(self, writer, event, payload):
+        """Writes one Server-Sent Event."""
+        writer.write(f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+        await writer.drain()
+
+    async def _send_delta(self, writer, text_so_far, sent_length):
+        """
+        Sends the new part of the streamed text.
+
+        A shorter text means request_routed fell back to another model, whose answer
+        starts over: a "reset" event tells the client to discard the text received so far.
+
+        Returns:
+            int: The length of the text the client now has.
+        """
+        if len(text_so_far) < sent_length:
+            await self._send_event(writer, "reset", {})
+            sent_length = 0
+        if len(text_so_far) > sent_length:
+            await self._send_event(writer, "delta", {"delta": text_so_far[sent_length:]})
+        return len(text_so_far)
+
+    def _resolve_request(self, body):
+        """Validates a /run body. Returns (request, prompt_def, text, final_prompt)."""
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HttpError(400, f"Invalid JSON: {e}") from e
+        if not isinstance(request, dict):
+            raise HttpError(400, "The body must be a JSON object")
+        for field in ("text", "prompt", "type", "from_language", "to_language", "custom_prompt", "priority"):
+            if request.get(field) is not None and not isinstance(request[field], str):
+                raise HttpError(400, f"'{field}' must be a string")
+        text = (request.get("text") or "").strip()
+        if not text:
+            raise HttpError(400, "'text' is required")
+        config = self.state_manager.get_config()
+        input_type = request.get("type") or determine_input_type(text)
+        label = request.get("prompt") or config.get("last_processing_option", "Translate")
+        prompt_def = find_prompt(self.state_manager.get_prompts_config(), input_type, label)
+        if prompt_def is None:
+            raise HttpError(404, f"No '{label}' prompt for {input_type} input")
+        template = request.get("custom_prompt") if label == "Custom Prompt" and request.get("custom_prompt") else prompt_def.get("prompt", "{text}")
+        final_prompt = fill_prompt_template(
+            template, text,
+            request.get("from_language") or config.get("source_language", "English"),
+            request.get("to_language") or config.get("target_language", "Ukrainian"))
+        if request.get("priority", "interactive") not in PRIORITIES:
+            raise HttpError(400, f"'priority' must be one of {', '.join(PRIORITIES)}")
+        return request, prompt_def, text, final_prompt
+
+    async def _handle_run(self, writer, body):
+        """Runs a prompt, answering with JSON or an SSE stream."""
+        request, prompt_def, text, final_prompt = self._resolve_request(body)
+        config = self.state_manager.get_config()
+        api_key = config.get("api_key")
+        if not api_key:
+            raise HttpError(500, "API key is missing in settings.json")
+        model_name, generation_settings, response_schema = get_request_options(prompt_def, config, request.get("from_language"), request.get("to_language"))
+        priority = request.get("priority", "interactive")
+        label = prompt_def.get("label")
+        models = self.model_router.rank(label, len(text), model_name, prompt_def.get("quality_tier"))
+
+        def run_request(on_chunk=None):
+            return self.llm_service.request_routed(self.model_router, label, len(text), models, api_key, final_prompt, generation_settings, response_schema, on_chunk, priority)
+
+        if not request.get("stream"):
+            response = await run_request()
+            markdown_text, plain_text, word_entry = postprocess_response(prompt_def, text, response)
+            await self._send_json(writer, 200, {"markdown": markdown_text, "text": plain_text or markdown_text, "entry": word_entry})
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        chunks = asyncio.Queue()
+        # Diff and structured prompts need the complete response, so only plain prompts stream deltas
+        on_chunk = None if prompt_def.get("mode") else chunks.put_nowait
+        task = asyncio.ensure_future(run_request(on_chunk))
+        sent_length = 0
+        try:
+            while True:
+                getter = asyncio.ensure_future(chunks.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                sent_length = await self._send_delta(writer, getter.result(), sent_length)
+            while not chunks.empty(): # Chunks queued just before the request finished
+                sent_length = await self._send_delta(writer, chunks.get_nowait(), sent_length)
+            response = task.result()
+            markdown_text, plain_text, word_entry = postprocess_response(prompt_def, text, response)
+            await self._send_event(writer, "done", {"markdown": markdown_text, "text": plain_text or markdown_text, "entry": word_entry})
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # The 200 headers are already sent: report the failure inside the event stream
+            print(f"Error streaming API response: {e}")
+            await self._send_event(writer, "error", {"error": str(e)})
+        finally:
+            if not task.done():
+                task.cancel() # Client disconnected: unsubscribe from the shared request
+
+
+def load_api_token(config, token_path=os.path.join("config", "api_token")):
+    """
+    Returns the bearer token: "api_server_token" from settings.json, else a random one kept in token_path.
+
+    The generated token lives in its own file, readable only by the user, so the GUI
+    rewriting settings.json never drops it.
+    """
+    if config.get("api_server_token"):
+        return config["api_server_token"]
+    try:
+        with open(token_path, "r", encoding="utf-8") as token_file:
+            token = token_file.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    token = secrets.token_urlsafe(32)
+    descriptor = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w", encoding="utf-8") as token_file:
+        token_file.write(token)
+    print(f"Generated an API token in {token_path}")
+    return token
+
+
+async def _main(port):
+    """Loads the configuration and serves the API on the current event loop."""
+    state_manager = StateManager(os.path.join("config", "settings.json"), os.path.join("config", "prompts.json"))
+    state_manager.load_state()
+    llm_fixtures.configure_from_environment() # LEXI_RECORD_LLM / LEXI_REPLAY_LLM
+    config = state_manager.get_config()
+    # Accounted separately from the GUI's usage file, which the GUI rewrites while it runs
+    usage_tracker = UsageTracker(os.path.join("config", "api_usage.json"), config.get("quota"))
+    add_call_observer(usage_tracker.record)
+    configure_context_cache(config.get("context_cache"))
+    llm_service = LLMService(config.get("llm_max_concurrency", 2), config.get("hedging"), usage_tracker)
+    llm_service.start(asyncio.get_running_loop())
+    server = ApiServer(state_manager, llm_service, load_api_token(config), port=port or config.get("api_server_port", 8765), model_router=ModelRouter(config.get("model_router", {})))
+    try:
+        await server.serve_forever()
+    finally:
+        usage_tracker.save()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lexi headless API server")
+    parser.add_argument("--port", type=int, help="Port to listen on (default: api_server_port from settings.json)")
+    arguments = parser.parse_args()
+    try:
+        asyncio.run(_main(arguments.port))
+    except KeyboardInterrupt:
+        print("API server stopped.")
@@ -1,8 +1,10 @@
 # pylint: disable=line-too-long
 
 """Main application for the Lexi text assistant with system tray integration."""
+import argparse
 import os
 import sys
+import time
 import tkinter as tk
 from hotkey_manager import HotkeyManager
 from tray_manager import TrayManager
@@ -10,6 +12,13 @@ from state_manager import StateManager
 from ui_manager import UIManager
 from api_key_manager import ApiKeyManager
 from app_logic import AppLogic
+from idle_manager import IdleManager
+from instance_manager import InstanceManager
+from metrics import metrics
+from profiler import profiler, PROFILE_ENV_VAR
+import llm_fixtures
+
+_PROCESS_START = time.perf_counter()
 
 class App(tk.Tk):
     """Main application class for the Lexi text assistant."""
@@ -26,7 +35,8 @@ class App(tk.Tk):
 
         self.config_filepath = os.path.join("config", "settings.json")
         self.prompts_filepath = os.path.join("config", "prompts.json")
-        
+        self.session_state_filepath = os.path.join("config", "session_state.json")
+        metrics.set_output_file(os.path.join("config", "metrics.jsonl"))
 
         self.icon_filepath = os.path.join(self.base_path, "icons", "Feather1.ico")
         css_filepath = os.path.join("config", "styles.css")
@@ -47,15 +57,22 @@ class App(tk.Tk):
 
         # Initialize AppLogic
         self.tray_manager = TrayManager(self)
-        self.app_logic = AppLogic(self.ui_manager, self.state_manager, self.tray_manager)
+        self.app_logic = AppLogic(self.ui_manager, self.state_manager, self.tray_manager, self.session_state_filepath)
         self.app_logic.load_css(css_filepath) # Load CSS via AppLogic
 
+        # Trim memory while the window stays hidden in the tray
+        self.idle_manager = IdleManager(self, self.app_logic, self.ui_manager, config.get("idle_trim_minutes", 10))
+        self.tray_manager.add_visibility_listener(self.idle_manager.on_visibility_changed)
+        self.idle_manager.register_trim_callback(self.app_logic.render_cache.clear)
+        self.idle_manager.register_trim_callback(self.app_logic.paragraph_cache.clear)
+
         # Initialize ApiKeyManager
         self.api_key_manager = ApiKeyManager(self, self.state_manager, self.ui_manager)
 
         # Initialize TrayManager and HotkeyListener
         self.tray_manager.create_icon()
-        self.hotkey_manager = HotkeyManager(self.app_logic._on_hotkey_triggered) # Pass AppLogic method
+        self.hotkey_manager = HotkeyManager(self.app_logic._on_hotkey_triggered, config.get("hotkeys"), config.get("hotkey_window_ms", 400)) # Pass AppLogic method
+        self.app_logic.clipboard_manager.set_simulated_keys_listener(self.hotkey_manager.expect_simulated_keys)
         self.hotkey_manager.start()
 
         # Bind Escape key to hide window (only if system tray is available)
@@ -124,9 +141,49 @@ class App(tk.Tk):
         print("Escape key pressed. Minimizing window.")
         self.iconify()  # Minimize to taskbar
 
+def parse_arguments():
+    """Parses the command line: optional text to process and the prompt label to use."""
+    parser = argparse.ArgumentParser(description="Lexi - Gemini-Powered Text Assistant")
+    parser.add_argument("text", nargs="?", help="Text to process ('-' reads it from stdin)")
+    parser.add_argument("--prompt", help="Label of the prompt to run, e.g. 'Translate'")
+    args = parser.parse_args()
+    if args.text == "-":
+        args.text = sys.stdin.read()
+    return args
+
 if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    # Single-instance mode: hand the text to the running instance and exit
+    try:
+        instance_manager = InstanceManager()
+    except OSError as e:
+        print(f"Single-instance mode unavailable: {e}")
+        instance_manager = None
+    if instance_manager is not None and instance_manager.forward_to_running_instance({"text": arguments.text or "", "prompt": arguments.prompt}):
+        print("Lexi is already running. Request forwarded.")
+        sys.exit(0)
+
+    llm_fixtures.configure_from_environment() # LEXI_RECORD_LLM / LEXI_REPLAY_LLM
     app = App()
 
+    def on_forwarded_request(message):
+        # Called on the listener thread; process on the Tk thread
+        if message.get("text"):
+            app.after(0, app.app_logic.process_external_text, message["text"], message.get("prompt"))
+        else:
+            app.after(0, app.tray_manager.show_window) # Bare launch: just bring the window up
+
+    if instance_manager is not None:
+        instance_manager.start_server(on_forwarded_request)
+    if os.environ.get(PROFILE_ENV_VAR, "") not in ("", "0"):
+        profiler.enable() # From the Tk thread, so its stacks are the ones sampled
+    if arguments.text:
+        app.after_idle(app.app_logic.process_external_text, arguments.text, arguments.prompt)
+    # Once the window is up (and after a command line request has been sent), warm up the renderer
+    app.after_idle(lambda: metrics.record("startup", ready_ms=round((time.perf_counter() - _PROCESS_START) * 1000, 1)))
+    app.after_idle(app.app_logic.warm_up_renderer)
+
     # Handle closing the window via the 'X' button
     def on_closing():
         # Save window state before hiding/exiting
@@ -144,6 +201,11 @@ if __name__ == "__main__":
     app.mainloop()
 
     # Save window state and stop threads when mainloop exits
+    if instance_manager is not None:
+        instance_manager.stop() # Let the next launch become the running instance
     app.tray_manager.stop_icon() # Ensure icon is stopped when mainloop exits
     app.hotkey_manager.stop() # Ensure hotkey listener is stopped
     app.hotkey_manager.join() # Wait for the hotkey listener thread to finish
+    app.app_logic.llm_service.stop() # Stop the LLM request loop
+    app.app_logic.usage_tracker.save() # Persist the token usage recorded since the last save
+    profiler.disable() # Writes the profiling report if profiling was enabled
@@ -1,40 +1,116 @@
 # pylint: disable=line-too-long
 # pylint: disable=broad-except
 
-import asyncio
+import html
+import json
+import os
+import xml.etree.ElementTree as ElementTree
 import threading
+import time
 import tkinter as tk # Import tkinter for state constants
+from concurrent.futures import ThreadPoolExecutor
 import pyperclip # Import pyperclip for clipboard access
-from gemini_client import get_llm_response # Import the LLM function
-from markdown_renderer import render_markdown_to_html, _markdown_to_plain_text # Import the markdown renderer and plain text converter
+from llm_service import LLMService
+from gemini_client import add_call_observer, configure_context_cache, is_error, ErrorResponse
+from usage_tracker import UsageTracker
+from markdown_renderer import parse_markdown, wrap_html_document, _markdown_to_plain_text # Import the markdown renderer and plain text converter
 from clipboard_manager import ClipboardManager # Import the new ClipboardManager
+from prompt_processing import determine_input_type, fill_prompt_template, fill_paragraph_prompt, get_request_options, postprocess_response
+from paragraph_cache import ParagraphCache, split_paragraphs, join_paragraphs, make_prompt_key
+from render_cache import RenderCache
+from text_diff import strip_wrapping_quotes
+from metrics import metrics
+from profiler import profiled
+from ui_update_bus import UIUpdateBus
+from model_router import ModelRouter
+from session import Session
+from quick_peek import QuickPeek
+
+# Representative response used to warm up the renderer: one of each element the prompts produce
+_WARM_UP_MARKDOWN = """## Warm-up
+
+**Lexi** /ˈlɛksi/ — *noun*: a ~~text~~ ++writing++ assistant.
+
+1. First `item`
+2. Second item
+
+- Bullet with a [link](https://example.com)
+
+| Source | Translation |
+|--------|-------------|
+| word   | слово       |
+
+> Quoted example.
+"""
 
 class AppLogic:
     """Contains the core application logic for Lexi."""
 
-    def __init__(self, ui_manager, state_manager, tray_manager):
+    def __init__(self, ui_manager, state_manager, tray_manager, session_state_filepath=None, usage_filepath=None):
         """
         Initializes the AppLogic.
 
         Args:
             ui_manager: The UIManager instance.
             state_manager: The StateManager instance.
+            tray_manager: The TrayManager instance.
+            session_state_filepath: Where the sessions' responses are offloaded while the app is idle.
+            usage_filepath: Where token usage is accounted (config/usage.json by default).
         """
         self.ui_manager = ui_manager
         self.state_manager = state_manager
         self.tray_manager = tray_manager
+        self.session_state_filepath = session_state_filepath or os.path.join("config", "session_state.json")
         self.css_content = "" # Will be loaded from state_manager
-        self._last_raw_llm_response = "" # Store the raw LLM response (Markdown)
-        self._last_rendered_html = "" # Store the last rendered HTML output
+        # Session tabs: each has its own input, output and request; self.session is the one shown
+        self.sessions = [Session()]
+        self.session = self.sessions[0]
+        self._switching_session = False # Suppresses input change handling while a tab's input is restored
+        self._live_after_id = None # Pending debounced live-mode run
+        self._first_render_pending = True # The first real render after startup/restore is recorded in metrics
+        self._renderer_warmed = False
+
+        # Per-paragraph results of incremental prompts, for cheap re-runs after small edits
+        self.paragraph_cache = ParagraphCache()
+
+        # Markdown is converted on a render worker; the Tk thread only shows the result
+        self.render_cache = RenderCache()
+        self._render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LexiRender")
+        self._pending_partials = {} # session id -> (generation, text) waiting for the render worker
+        self._partials_lock = threading.Lock()
+
+        # Background results reach the Tk thread through the bus, coalesced to one update per frame
+        self.ui_update_bus = UIUpdateBus(self.ui_manager.root, self.state_manager.get_config().get("ui_frame_ms", 33))
+
+        # Picks the model per request from measured latency when "model_router" is enabled
+        self.model_router = ModelRouter(self.state_manager.get_config().get("model_router", {}))
+
+        # Word lookups captured while the window is hidden are answered in a popup at the pointer
+        quick_peek_config = self.state_manager.get_config().get("quick_peek", {})
+        self.quick_peek = QuickPeek(self.ui_manager.root, quick_peek_config.get("max_lines", 6), quick_peek_config.get("dismiss_seconds", 10))
+        self._peek = None # The quick peek request: text, prompt, future and result
 
         # Initialize the ClipboardManager
         self.clipboard_manager = ClipboardManager()
 
+        # Token usage per day, model and prompt; also paces requests near the quota limits
+        config = self.state_manager.get_config()
+        self.usage_tracker = UsageTracker(usage_filepath or os.path.join("config", "usage.json"), config.get("quota"))
+        add_call_observer(self.usage_tracker.record)
+        configure_context_cache(config.get("context_cache"))
+
+        # Initialize the request layer (shared event loop for all LLM calls)
+        self.llm_service = LLMService(config.get("llm_max_concurrency", 2), config.get("hedging"), self.usage_tracker)
+        self.llm_service.start()
+
         # Bind UI actions to logic methods
         self.ui_manager.bind_copy_button(self.copy_output)
         self.ui_manager.bind_copy_with_formatting_button(self.copy_output_with_formatting)
         # Bind input widget text change to update processing buttons
         self.ui_manager.bind_input_widget_change(self._on_input_text_change)
+        self.ui_manager.bind_live_mode_toggle(self.on_live_mode_toggled)
+        self.ui_manager.bind_session_controls(self.switch_session, self.new_session, self.close_session)
+        self._update_session_tabs()
 
 
     def load_css(self, css_filepath):
@@ -52,14 +128,28 @@ class AppLogic:
 
     def _determine_input_type(self, text):
         """Determines if the input text is a 'word' or 'phrase'."""
-        return "word" if len(text.strip().split()) == 1 else "phrase"
+        return determine_input_type(text)
+
+    def _on_prompt_button_click(self, clicked_button, prompt_def, live=False, running_request=None):
+        """
+        Handles a prompt button click, updates visual state, and triggers action.
 
-    def _on_prompt_button_click(self, clicked_button, prompt_def):
-        """Handles a prompt button click, updates visual state, and triggers action."""
+        Args:
+            clicked_button: The clicked button (unused, may be None).
+            prompt_def: The prompt definition from prompts.json.
+            live: True when triggered by live mode while the user is typing: the
+                  UI stays enabled and the request is cancelled by the next keystroke.
+            running_request: Optional (future, attach_chunk_callback) of a request already
+                  running for this prompt and input (an expanded quick peek). It is adopted
+                  instead of being submitted again; attach_chunk_callback(on_chunk) routes
+                  its streamed text to this session.
+        """
         print(f"Prompt button clicked: {prompt_def.get('label')}")
 
         # Update visual state of buttons using states via UI manager
         self.ui_manager.set_prompt_button_pressed_state(prompt_def.get('label'))
+        # The request belongs to the session shown now, even if the user switches tabs meanwhile
+        session = self.session
 
         # Get input text from UI manager
         input_text = self.ui_manager.get_input_text()
@@ -85,7 +175,7 @@ class AppLogic:
 
             from_language = self.ui_manager.get_source_language()
             to_language = self.ui_manager.get_target_language()
-            final_prompt = self.ui_manager.get_custom_prompt_text().replace("{text}", input_text).replace("{from_language}", from_language).replace("{to_language}", to_language)
+            final_prompt = fill_prompt_template(self.ui_manager.get_custom_prompt_text(), input_text, from_language, to_language)
             # Focus is set in show_custom_prompt_entry
         else:
             self.ui_manager.hide_custom_prompt_entry()
@@ -93,7 +183,7 @@ class AppLogic:
             prompt_template = prompt_def.get("prompt", "{text}")
             from_language = self.ui_manager.get_source_language()
             to_language = self.ui_manager.get_target_language()
-            final_prompt = prompt_template.replace("{text}", input_text).replace("{from_language}", from_language).replace("{to_language}", to_language)
+            final_prompt = fill_prompt_template(prompt_template, input_text, from_language, to_language)
 
 
         print(f"Final prompt sent to LLM: {final_prompt}")
@@ -101,76 +191,420 @@ class AppLogic:
         # Get API key and model name from state manager
         config = self.state_manager.get_config()
         api_key = config.get("api_key")
-        model_name = config.get("llm_model", "")
+        # A prompt may override the global model and tune its generation settings
+        model_name, generation_settings, response_schema = get_request_options(prompt_def, config, from_language, to_language)
 
         if not api_key:
             print("API key is missing. Cannot call LLM.")
             # Optionally show an error message in the UI
-            self._update_ui_after_llm("Error: API key is missing. Please go to settings.json to add it.")
+            self._update_ui_after_llm(ErrorResponse("Error: API key is missing. Please go to settings.json to add it."), session=session)
             return
 
-        # Disable UI while processing via UI manager
-        self.ui_manager.toggle_main_widgets_state(tk.DISABLED)
+        # Re-runs of incremental prompts on long texts only resubmit the changed paragraphs
+        incremental_run = None
+        if prompt_def.get("incremental") and prompt_def.get("label") != "Custom Prompt" and running_request is None:
+            incremental_run = self._plan_incremental_run(prompt_def, input_text, from_language, to_language, model_name, generation_settings)
+
+        # Any newer request of this session supersedes its pending one
+        self._cancel_current_request(session)
+        session.request_generation += 1
+        generation = session.request_generation
+        session.last_request_signature = (prompt_def.get("label"), final_prompt, from_language, to_language)
+
+        session.request_in_flight = True
+        session.current_request_live = live
+        session.offloaded = False # The new response supersedes the offloaded one
+        session.partial_text = ""
+        session.partial_render = None
+        session.input_text = input_text
+        session.selected_label = prompt_def.get("label")
+        self._update_session_tabs()
+        if not live:
+            # Disable the session's widgets while processing; other tabs stay usable
+            self.ui_manager.toggle_main_widgets_state(tk.DISABLED)
         # Use load_html to display "Processing..." as HtmlFrame doesn't have insert/delete
         self.ui_manager.update_output_html("<p>Processing...</p>")
 
-        # Run the async LLM call in a separate thread
-        def run_llm_async():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+        # Stream plain responses into the output; diff and structured modes need the complete text
+        on_chunk = None
+        if not prompt_def.get("mode"):
+            def on_chunk(text_so_far):
+                self._queue_partial_render(session, generation, text_so_far)
+
+        # Run the LLM call on the request layer; identical in-flight requests share one call
+        if running_request is not None:
+            future, attach_chunk_callback = running_request
+            if on_chunk is not None:
+                attach_chunk_callback(on_chunk)
+        elif incremental_run is not None and incremental_run["cached"]:
+            future = self.llm_service.submit_many(api_key, model_name, incremental_run["prompts"], generation_settings, response_schema, label=prompt_def.get("label"))
+        elif self.model_router.enabled:
+            label = prompt_def.get("label")
+            models = self.model_router.rank(label, len(input_text), model_name, prompt_def.get("quality_tier"))
+            print(f"Model router candidates: {models}")
+            future = self.llm_service.submit_routed(self.model_router, label, len(input_text), models, api_key, final_prompt, generation_settings, response_schema, on_chunk)
+        else:
+            future = self.llm_service.submit(api_key, model_name, final_prompt, generation_settings, response_schema, on_chunk, label=prompt_def.get("label"))
+        session.current_future = future
+
+        def on_llm_done(done_future):
+            # Runs on the LLM service thread
+            if done_future.cancelled():
+                return # Superseded by a newer request
+            self._render_executor.submit(render_response, done_future)
+
+        def render_response(done_future):
+            # Runs on the render worker, after any partial render queued before it
+            try:
+                response = done_future.result()
+                if incremental_run is not None:
+                    response = self._finish_incremental_run(incremental_run, response)
+                markdown_text, plain_text = self._postprocess_response(session, prompt_def, input_text, response)
+            except Exception as e:
+                markdown_text, plain_text = f"An unexpected error occurred: {e}", None
             try:
-                response = loop.run_until_complete(get_llm_response(api_key, model_name, final_prompt))
-                # Schedule UI update on the main thread
-                self.ui_manager.root.after(0, self._update_ui_after_llm, response)
+                rendered = self._render_document(markdown_text, plain_text)
             except Exception as e:
-                self.ui_manager.root.after(0, self._update_ui_after_llm, f"An unexpected error occurred: {e}")
-            finally:
-                loop.close()
+                print(f"Error rendering the response: {e}")
+                rendered = None # Rendered on the Tk thread instead
+            # Schedule UI update on the main thread; it supersedes any partial response still pending
+            self.ui_update_bus.post(f"output-{session.id}", self._apply_if_current, session, generation, self._update_ui_after_llm, markdown_text, plain_text, session, rendered)
 
-        llm_thread = threading.Thread(target=run_llm_async)
-        llm_thread.start()
+        future.add_done_callback(on_llm_done)
 
+    def _plan_incremental_run(self, prompt_def, input_text, from_language, to_language, model_name, generation_settings):
+        """
+        Splits the input into paragraphs and finds which ones have no cached result.
 
-    def _on_hotkey_triggered(self):
-        """Handles actions when the global hotkey is triggered."""
-        try:
-            # Read content from the clipboard
-            clipboard_content = pyperclip.paste()
+        Returns:
+            dict: The incremental run plan, or None if the text is a single paragraph.
+                  "cached" is False on a first run: the whole text is sent and its
+                  result cached per paragraph.
+        """
+        paragraphs, separators = split_paragraphs(input_text)
+        if len(paragraphs) < 2:
+            return None
+        template = prompt_def.get("prompt", "{text}")
+        prompt_key = make_prompt_key(prompt_def.get("label"), template, from_language, to_language, model_name, generation_settings)
+        results = self.paragraph_cache.lookup(prompt_key, paragraphs)
+        changed = [i for i, result in enumerate(results) if result is None]
+        plan = {
+            "prompt_key": prompt_key,
+            "paragraphs": paragraphs,
+            "separators": separators,
+            "results": results,
+            "changed": changed,
+            "cached": len(changed) < len(paragraphs),
+            "prompts": [],
+        }
+        if plan["cached"]:
+            for i in changed:
+                previous_paragraph = paragraphs[i - 1] if i > 0 else None
+                next_paragraph = paragraphs[i + 1] if i + 1 < len(paragraphs) else None
+                plan["prompts"].append(fill_paragraph_prompt(template, paragraphs[i], previous_paragraph, next_paragraph, from_language, to_language))
+            print(f"Incremental run: resubmitting {len(changed)} of {len(paragraphs)} paragraphs.")
+            metrics.record("incremental_run", changed=len(changed), paragraphs=len(paragraphs))
+        return plan
+
+    def _finish_incremental_run(self, plan, response):
+        """
+        Caches the new paragraph results and returns the merged response text.
 
-            # Handle edge cases: empty or non-text clipboard
-            if not clipboard_content or not isinstance(clipboard_content, str):
-                print("Hotkey triggered, but clipboard is empty or not text. Ignoring.")
-                return # Ignore silently as per spec
+        Args:
+            plan: The plan returned by _plan_incremental_run.
+            response: The list of changed-paragraph responses, or the whole-text
+                      response on a first run.
+        """
+        if not plan["cached"]:
+            if not is_error(response):
+                self.paragraph_cache.store_response(plan["prompt_key"], plan["paragraphs"], strip_wrapping_quotes("\n\n".join(plan["paragraphs"]), response))
+            return response
+        results = list(plan["results"])
+        for i, paragraph_response in zip(plan["changed"], response):
+            if is_error(paragraph_response):
+                return paragraph_response
+            results[i] = strip_wrapping_quotes(plan["paragraphs"][i], paragraph_response)
+            self.paragraph_cache.put(plan["prompt_key"], plan["paragraphs"][i], results[i])
+        return join_paragraphs(results, plan["separators"])
+
+    def _cancel_current_request(self, session=None):
+        """Cancels the pending request of a session (the active one by default), if any."""
+        session = session or self.session
+        if session.current_future is not None and not session.current_future.done():
+            print("Cancelling outdated request.")
+            session.current_future.cancel()
+            session.request_in_flight = False
+            session.last_request_signature = None # The cancelled request produced no result
+        session.current_future = None
+
+    def _apply_if_current(self, session, generation, callback, *args):
+        """Runs callback on the Tk thread unless the session has started a newer request since."""
+        if generation == session.request_generation and session in self.sessions:
+            callback(*args)
+
+    @profiled("render_document")
+    def _render_document(self, markdown_text, plain_text=None):
+        """
+        Converts a response for display (on the render worker).
 
-            # Display the main window and bring it into focus via TrayManager (handled in App)
-            self.tray_manager.show_window()
+        Returns:
+            tuple: (tree, html_content, plain_text) where plain_text is the text the Copy buttons use.
+        """
+        tree, html_content = self.render_cache.render(markdown_text, self.css_content)
+        return tree, html_content, plain_text if plain_text is not None else _markdown_to_plain_text(markdown_text)
 
-            # Populate the input widget with the captured text via UI manager
-            self.ui_manager.set_input_text(clipboard_content)
+    def _queue_partial_render(self, session, generation, text_so_far):
+        """
+        Renders the response streamed so far on the render worker (called on the LLM service thread).
 
-            # Determine input type and create processing buttons via UI manager
-            input_text = self.ui_manager.get_input_text()
-            input_type = self._determine_input_type(input_text)
-            # Pass the button click handler callback
-            self.ui_manager.create_processing_buttons(input_type, self._on_prompt_button_click)
+        Chunks arriving while a render is queued only replace its text, so the worker
+        converts the latest text once instead of every chunk.
+        """
+        with self._partials_lock:
+            queued = session.id in self._pending_partials
+            self._pending_partials[session.id] = (generation, text_so_far)
+        if not queued:
+            self._render_executor.submit(self._render_partial_response, session)
+
+    def _render_partial_response(self, session):
+        """Converts the latest streamed text of a session and posts it to the Tk thread (render worker)."""
+        with self._partials_lock:
+            generation, text_so_far = self._pending_partials.pop(session.id)
+        if generation != session.request_generation:
+            return # Superseded by a newer request
+        try:
+            # Not memoized: partial texts are never shown twice
+            tree, html_body = parse_markdown(text_so_far)
+        except Exception as e:
+            print(f"Error rendering the partial response: {e}")
+            return
+        self.ui_update_bus.post(f"output-{session.id}", self._show_partial_response, session, generation, text_so_far,
+                                (tree, wrap_html_document(html_body, self.css_content)))
 
-            # Trigger the click event for the first button (the default one)
-            # This logic needs to be handled carefully to ensure the button exists and the callback is correct
-            # It might be better to trigger the logic directly rather than simulating a button click
-            if getattr(self.ui_manager, '_prompt_buttons', []):
-                 # Get the corresponding prompt definition
-                prompts = self.state_manager.get_prompts_config().get(input_type, [])
-                if prompts:
-                    default_prompt_def = prompts[0]
-                    # Call the button click handler directly with the first button and its definition
-                    self._on_prompt_button_click(self.ui_manager._prompt_buttons[0], default_prompt_def)
+    def _show_partial_response(self, session, generation, text_so_far, rendered):
+        """Keeps the response streamed so far and shows it if the session is active (Tk thread)."""
+        if generation != session.request_generation or not session.request_in_flight:
+            return
+        session.partial_text = text_so_far
+        session.partial_render = rendered
+        if session is not self.session:
+            return
+        tree, html_content = rendered
+        self.ui_manager.update_output_html(html_content, tree)
+
+    def _postprocess_response(self, session, prompt_def, input_text, response):
+        """
+        Turns a raw model response into the Markdown to display, according to the prompt mode.
+
+        Returns:
+            tuple: (markdown_text, plain_text) where plain_text is None unless the
+                   Copy buttons should copy something other than the displayed Markdown.
+        """
+        markdown_text, plain_text, word_entry = postprocess_response(prompt_def, input_text, response)
+        if word_entry is not None:
+            session.last_word_entry = word_entry
+        return markdown_text, plain_text
 
+    def _on_hotkey_triggered(self, prompt_label=None):
+        """
+        Handles actions when a global hotkey is triggered.
+
+        Args:
+            prompt_label: The prompt bound to the hotkey (None for the default prompt).
+        """
+        # Called from the hotkey listener thread: capture the clipboard in a worker
+        # so the listener keeps receiving key events while we wait for the copy.
+        capture_thread = threading.Thread(target=self._capture_clipboard, args=(prompt_label,), daemon=True)
+        capture_thread.start()
+
+    @profiled("capture_clipboard")
+    def _capture_clipboard(self, prompt_label=None):
+        """Copies the current selection and hands the captured text over to the Tk thread."""
+        timeout_ms = self.state_manager.get_config().get("clipboard_capture_timeout_ms", 500)
+        try:
+            clipboard_content = self.clipboard_manager.capture_selection(timeout_ms)
         except pyperclip.PyperclipException as e:
             print(f"Error handling hotkey trigger (PyperclipException): {e}")
-        # except Exception as e:
-        #     # Log or handle unexpected exceptions
-        #     print(f"Unexpected error handling hotkey trigger: {e}")
-        
+            return
+        except Exception as e:
+            # This runs on a daemon thread, where an uncaught exception would go unnoticed
+            print(f"Error capturing the selection: {e}")
+            return
+        self.ui_manager.root.after(0, self._on_clipboard_captured, clipboard_content, prompt_label)
+
+    def _on_clipboard_captured(self, clipboard_content, prompt_label=None):
+        """Shows the window with the captured text and runs the hotkey's prompt (the default one if None)."""
+        # Handle edge cases: empty or non-text clipboard
+        if not clipboard_content or not isinstance(clipboard_content, str):
+            print("Hotkey triggered, but clipboard is empty or not text. Ignoring.")
+            return # Ignore silently as per spec
+        if self._should_quick_peek(clipboard_content):
+            self.show_quick_peek(clipboard_content, prompt_label)
+            return
+        self.process_external_text(clipboard_content, prompt_label)
+
+    def _select_prompt(self, input_type, prompt_label=None):
+        """Returns the prompt with the given label for an input type, or its first (default) prompt."""
+        prompts = self.state_manager.get_prompts_config().get(input_type, [])
+        if not prompts:
+            return None
+        for p in prompts:
+            if prompt_label and p.get("label") == prompt_label:
+                return p
+        if prompt_label:
+            print(f"Prompt '{prompt_label}' not found for {input_type} input. Using the default prompt.")
+        return prompts[0]
+
+    def _should_quick_peek(self, text):
+        """True if captured text should be answered in the quick peek instead of the main window."""
+        quick_peek_config = self.state_manager.get_config().get("quick_peek", {})
+        if not quick_peek_config.get("enabled", False):
+            return False
+        if self.ui_manager.root.state() not in ("withdrawn", "iconic"):
+            return False # The window is up anyway: show the answer there
+        return self._determine_input_type(text) in quick_peek_config.get("input_types", ["word"])
+
+    def show_quick_peek(self, text, prompt_label=None):
+        """
+        Runs the default prompt on captured text and streams the first lines of the
+        answer into the quick peek popup. The main window stays hidden until expanded.
+        """
+        prompt_def = self._select_prompt(self._determine_input_type(text), prompt_label)
+        config = self.state_manager.get_config()
+        api_key = config.get("api_key")
+        if prompt_def is None or prompt_def.get("label") == "Custom Prompt" or not api_key:
+            self.process_external_text(text, prompt_label)
+            return
+        if self._peek is not None and self._peek["future"] is not None:
+            self._peek["future"].cancel() # Unsubscribes only: an identical request keeps its call
+        from_language = self.ui_manager.get_source_language()
+        to_language = self.ui_manager.get_target_language()
+        final_prompt = fill_prompt_template(prompt_def.get("prompt", "{text}"), text, from_language, to_language)
+        model_name, generation_settings, response_schema = get_request_options(prompt_def, config, from_language, to_language)
+        peek = {"text": text, "prompt_def": prompt_def, "final_prompt": final_prompt, "from_language": from_language, "to_language": to_language, "future": None, "result": None, "start": time.perf_counter(), "first_line_recorded": False}
+        self._peek = peek
+        self.quick_peek.show(text, self._expand_quick_peek, lambda: self._drop_quick_peek(peek))
+
+        def show_text(plain_text, done):
+            # Runs on the Tk thread
+            if self._peek is not peek:
+                return # Superseded by a newer capture
+            if plain_text and not peek["first_line_recorded"]:
+                peek["first_line_recorded"] = True
+                metrics.record("quick_peek_first_line", ms=round((time.perf_counter() - peek["start"]) * 1000, 1))
+            self.quick_peek.set_text(plain_text, done)
+
+        on_chunk = None
+        if not prompt_def.get("mode"):
+            peek["chunk_callback"] = lambda text_so_far: self.ui_update_bus.post("quick-peek", show_text, _markdown_to_plain_text(text_so_far), False)
+
+            def on_chunk(text_so_far):
+                # Runs on the LLM service thread; retargeted to a session when the peek is expanded
+                peek["text_so_far"] = text_so_far
+                peek["chunk_callback"](text_so_far)
+
+        def on_peek_done(done_future):
+            # Runs on the LLM service thread
+            if done_future.cancelled():
+                return
+            try:
+                markdown_text, plain_text, word_entry = postprocess_response(prompt_def, text, done_future.result())
+            except Exception as e:
+                markdown_text, plain_text, word_entry = f"An unexpected error occurred: {e}", None, None
+            peek["result"] = (markdown_text, plain_text, word_entry)
+            self.ui_update_bus.post("quick-peek", show_text, plain_text if plain_text is not None else _markdown_to_plain_text(markdown_text), True)
+
+        peek["future"] = self.llm_service.submit(api_key, model_name, final_prompt, generation_settings, response_schema, on_chunk, label=prompt_def.get("label"))
+        peek["future"].add_done_callback(on_peek_done)
+
+    def _drop_quick_peek(self, peek):
+        """Cancels the request of a quick peek closed without being expanded."""
+        if self._peek is peek:
+            self._peek = None
+        if peek["future"] is not None:
+            peek["future"].cancel() # Unsubscribes only: an identical request keeps its call
+
+    def _expand_quick_peek(self):
+        """Opens the quick peek's text and answer in the main window."""
+        peek, self._peek = self._peek, None
+        if peek is None:
+            return
+        if peek["result"] is None:
+            # Still running: the main window adopts the call instead of submitting it again
+            # (with the model router, a new submission could pick another model and restart it)
+            def attach_chunk_callback(on_chunk):
+                peek["chunk_callback"] = on_chunk
+                if peek.get("text_so_far"):
+                    on_chunk(peek["text_so_far"])
+            self.process_external_text(peek["text"], peek["prompt_def"].get("label"), (peek["future"], attach_chunk_callback))
+            return
+        if self.session.request_in_flight:
+            capture_session = self._session_for_capture()
+            if capture_session is None:
+                self._report_all_tabs_busy(peek["text"])
+                return
+            self.switch_session(capture_session.id)
+        self.tray_manager.show_window()
+        session = self.session
+        self.ui_manager.set_input_text(peek["text"])
+        self.ui_manager.create_processing_buttons(self._determine_input_type(peek["text"]), self._on_prompt_button_click)
+        self.ui_manager.set_prompt_button_pressed_state(peek["prompt_def"].get("label"))
+        session.selected_label = peek["prompt_def"].get("label")
+        session.input_text = self.ui_manager.get_input_text()
+        session.last_request_signature = (peek["prompt_def"].get("label"), peek["final_prompt"], peek["from_language"], peek["to_language"]) # Live mode must not re-run it
+        markdown_text, plain_text, word_entry = peek["result"]
+        if word_entry is not None:
+            session.last_word_entry = word_entry
+        session.request_generation += 1
+        self._render_executor.submit(self._render_stored_response, session, session.request_generation, markdown_text, plain_text)
+
+    def process_external_text(self, text, prompt_label=None, running_request=None):
+        """
+        Shows the window with the given text and processes it as if the hotkey had fired.
+
+        Args:
+            text: The text to process.
+            prompt_label: Optional label of the prompt to run instead of the default (first) one.
+            running_request: Optional request already running for this text and prompt, adopted
+                             instead of submitting it again (see _on_prompt_button_click).
+                             It is cancelled if the text cannot be shown.
+        """
+        # Display the main window and bring it into focus via TrayManager (handled in App)
+        self.quick_peek.hide()
+
+        # A busy tab keeps its request: the text goes to an idle tab or a new one
+        if self.session.request_in_flight:
+            capture_session = self._session_for_capture()
+            if capture_session is None:
+                if running_request is not None:
+                    running_request[0].cancel()
+                self._report_all_tabs_busy(text)
+                return
+            self.switch_session(capture_session.id)
+        self.tray_manager.show_window()
+
+        # Populate the input widget with the captured text via UI manager
+        self.ui_manager.set_input_text(text)
+
+        # Determine input type and create processing buttons via UI manager
+        input_text = self.ui_manager.get_input_text()
+        input_type = self._determine_input_type(input_text)
+        # Pass the button click handler callback
+        self.ui_manager.create_processing_buttons(input_type, self._on_prompt_button_click)
+
+        # Trigger the click event for the requested button, or the first (default) one
+        # This logic needs to be handled carefully to ensure the button exists and the callback is correct
+        # It might be better to trigger the logic directly rather than simulating a button click
+        selected_prompt_def = None
+        if getattr(self.ui_manager, '_prompt_buttons', []):
+             # Get the corresponding prompt definition
+            selected_prompt_def = self._select_prompt(input_type, prompt_label)
+            if selected_prompt_def is not None:
+                # Call the button click handler directly with the selected definition
+                self._on_prompt_button_click(None, selected_prompt_def, running_request=running_request)
+        if selected_prompt_def is None and running_request is not None:
+            running_request[0].cancel() # Nothing adopted it
+
     def process_input_from_enter(self):
         """Triggers processing based on the currently selected prompt option when Enter is pressed."""
         print("Enter key pressed. Initiating processing.")
@@ -203,53 +637,318 @@ class AppLogic:
 
     def _on_input_text_change(self):
         """Handles changes in the input widget text to update processing buttons."""
+        if self._switching_session:
+            return # Restoring a tab's own input, not an edit
         input_text = self.ui_manager.get_input_text()
         input_type = self._determine_input_type(input_text)
-        # Recreate processing buttons based on the new input type
+        # Recreate processing buttons based on the new input type, keeping the selected option
+        selected_prompt_label = self.ui_manager.get_pressed_prompt_button_label()
         self.ui_manager.create_processing_buttons(input_type, self._on_prompt_button_click)
+        if selected_prompt_label:
+            self.ui_manager.set_prompt_button_pressed_state(selected_prompt_label)
+
+        if self.ui_manager.get_live_mode():
+            self._schedule_live_processing()
+
+    def _schedule_live_processing(self):
+        """(Re)starts the live-mode debounce timer and cancels the outdated request."""
+        if self._live_after_id is not None:
+            self.ui_manager.root.after_cancel(self._live_after_id)
+        if self.session.request_in_flight and self.session.current_request_live:
+            self.session.request_generation += 1 # Drop results still queued for the Tk thread
+            self._cancel_current_request()
+        debounce_ms = self.state_manager.get_config().get("live_debounce_ms", 700)
+        self._live_after_id = self.ui_manager.root.after(debounce_ms, self._run_live_processing)
+
+    def _run_live_processing(self):
+        """Runs the currently selected prompt on the input after typing has paused."""
+        self._live_after_id = None
+        input_text = self.ui_manager.get_input_text()
+        selected_prompt_label = self.ui_manager.get_pressed_prompt_button_label()
+        if not input_text or not selected_prompt_label:
+            return
+        if self.session.request_in_flight and not self.session.current_request_live:
+            return # An explicit request (button, Enter, hotkey) is running
+        if selected_prompt_label == "Custom Prompt":
+            return # Would move the focus to the custom prompt entry while the user is typing
+        prompts = self.state_manager.get_prompts_config().get(self._determine_input_type(input_text), [])
+        for p in prompts:
+            if p.get("label") == selected_prompt_label:
+                from_language = self.ui_manager.get_source_language()
+                to_language = self.ui_manager.get_target_language()
+                final_prompt = fill_prompt_template(p.get("prompt", "{text}"), input_text, from_language, to_language)
+                # The languages also fill the system instruction, which is not part of the prompt
+                if (selected_prompt_label, final_prompt, from_language, to_language) == self.session.last_request_signature:
+                    return # Already processed (e.g. the text was just captured by the hotkey)
+                self._on_prompt_button_click(None, p, live=True)
+                return
+
+    def on_live_mode_toggled(self, enabled):
+        """Persists the live mode switch and stops pending live work when it is turned off."""
+        self.state_manager.update_config("live_mode", enabled)
+        if not enabled and self._live_after_id is not None:
+            self.ui_manager.root.after_cancel(self._live_after_id)
+            self._live_after_id = None
+
+
+    @profiled("update_ui_after_llm")
+    def _update_ui_after_llm(self, response_text, plain_text=None, session=None, rendered=None):
+        """
+        Stores the LLM response in its session and, if that session is shown, displays it and re-enables widgets.
 
-
-    def _update_ui_after_llm(self, response_text):
-        """Updates the UI with the LLM response (rendered Markdown) and re-enables widgets."""
-        # Use the CSS content loaded via load_css
-        css_content = self.css_content
+        Args:
+            response_text: The Markdown to display.
+            plain_text: The text the Copy buttons use instead of the Markdown converted to plain text
+                        (e.g. the corrected text for diff-mode prompts).
+            session: The session the response belongs to (defaults to the active one).
+            rendered: (tree, html_content, plain_text) from _render_document on the render worker.
+                      Without it the response is first handed to the render worker, which
+                      calls back with it: Markdown is never converted on the Tk thread.
+        """
+        session = session or self.session
+        if rendered is None:
+            self._render_executor.submit(self._render_stored_response, session, session.request_generation, response_text, plain_text)
+            return
+        # One parse: the tree feeds the native renderer, the HTML feeds HtmlFrame and "Copy with Formatting"
+        tree, html_content, plain_text = rendered
 
         # Store the raw LLM response
-        self._last_raw_llm_response = response_text
-
-        # Render Markdown to HTML
-        html_content = render_markdown_to_html(response_text, css_content)
+        session.request_in_flight = False
+        session.current_future = None
+        session.partial_text = ""
+        session.partial_render = None
+        session.last_raw_llm_response = response_text
+        session.last_plain_text = plain_text
 
         # Store the rendered HTML
-        self._last_rendered_html = html_content
+        session.last_rendered_html = html_content
+        self._update_session_tabs()
+        if session is not self.session:
+            print(f"LLM call finished in background tab '{session.title}'.")
+            return
 
-        # Update the HtmlFrame widget via UI manager
-        self.ui_manager.update_output_html(html_content)
+        # Update the output widget via UI manager
+        render_start = time.perf_counter()
+        self.ui_manager.update_output_html(html_content, tree)
+        if self._first_render_pending:
+            self._first_render_pending = False
+            metrics.record("first_render", render_ms=round((time.perf_counter() - render_start) * 1000, 1), warmed=self._renderer_warmed)
 
         # Re-enable UI via UI manager
         self.ui_manager.toggle_main_widgets_state(tk.NORMAL)
         print("LLM call finished. UI re-enabled.")
 
+    def warm_up_renderer(self, reason="startup"):
+        """
+        Parses a representative document and renders it, hidden, in the output widget
+        so the first real result paints with steady-state latency. Meant to run when
+        the UI is idle.
+
+        Args:
+            reason: "startup" or "restore" (after an idle trim), recorded in the metrics.
+        """
+        start = time.perf_counter()
+        try:
+            tree, html_body = parse_markdown(_WARM_UP_MARKDOWN)
+            html_content = wrap_html_document(f'<div style="visibility: hidden">{html_body}</div>', self.css_content)
+            parse_ms = (time.perf_counter() - start) * 1000
+            render_ms = self.ui_manager.warm_up_output(html_content, tree)
+        except Exception as e:
+            print(f"Renderer warm-up failed: {e}")
+            return
+        if render_ms is None:
+            return # A result is already shown: the output needs no warm-up
+        self._renderer_warmed = True
+        self._first_render_pending = True
+        metrics.record("renderer_warmup", reason=reason, parse_ms=round(parse_ms, 1), render_ms=round(render_ms, 1))
+
+    def offload_session(self):
+        """
+        Moves every tab's last response to disk and drops the in-memory copies.
+
+        Returns:
+            bool: False if a request is in flight and nothing was offloaded.
+        """
+        if any(session.request_in_flight for session in self.sessions):
+            return False
+        offloaded = [session for session in self.sessions if session.last_raw_llm_response]
+        if offloaded:
+            try:
+                os.makedirs(os.path.dirname(self.session_state_filepath) or ".", exist_ok=True)
+                with open(self.session_state_filepath, 'w', encoding='utf-8') as f:
+                    json.dump({"sessions": {str(session.id): {"raw_response": session.last_raw_llm_response, "plain_text": session.last_plain_text}
+                                            for session in offloaded}}, f)
+            except Exception as e:
+                print(f"Error saving session state to {self.session_state_filepath}: {e}")
+                return False
+        for session in self.sessions:
+            session.offloaded = session in offloaded
+            session.last_raw_llm_response = ""
+            session.last_rendered_html = ""
+            session.last_plain_text = ""
+        return True
+
+    def rehydrate_session(self):
+        """
+        Restores the responses offloaded by offload_session; the active tab's is shown
+        once the render worker has converted it.
+
+        Returns:
+            bool: True if a response will be shown.
+        """
+        offloaded = [session for session in self.sessions if session.offloaded]
+        if not offloaded:
+            return False # Nothing offloaded, or new requests already replaced it
+        for session in offloaded:
+            session.offloaded = False
+        try:
+            with open(self.session_state_filepath, 'r', encoding='utf-8') as f:
+                session_state = json.load(f).get("sessions", {})
+        except Exception as e:
+            print(f"Error loading session state from {self.session_state_filepath}: {e}")
+            return False
+        # Active tab first, so its response is converted before the background tabs'
+        for session in sorted(offloaded, key=lambda s: s is not self.session):
+            state = session_state.get(str(session.id))
+            if state and state.get("raw_response"):
+                self._render_executor.submit(self._render_stored_response, session, session.request_generation, state["raw_response"], state.get("plain_text"))
+        return self.session in offloaded and bool(session_state.get(str(self.session.id), {}).get("raw_response"))
+
+    def _render_stored_response(self, session, generation, response_text, plain_text):
+        """Converts a complete response (rehydrated, or from the quick peek) and posts it to the Tk thread (render worker)."""
+        try:
+            rendered = self._render_document(response_text, plain_text)
+        except Exception as e:
+            print(f"Error rendering the stored response: {e}")
+            # Shown as preformatted text rather than rendered again
+            tree = ElementTree.Element("div")
+            ElementTree.SubElement(tree, "pre").text = response_text
+            rendered = (tree, wrap_html_document(f"<pre>{html.escape(response_text)}</pre>", self.css_content),
+                        plain_text if plain_text is not None else response_text)
+        # Dropped if the session has started a new request since
+        self.ui_update_bus.post(f"output-{session.id}", self._apply_if_current, session, generation, self._update_ui_after_llm, response_text, plain_text, session, rendered)
+
+    def _session_for_capture(self):
+        """
+        Returns a tab for captured text: a new one below the tab limit, else the oldest idle one.
+
+        Returns:
+            Session: The tab, or None if the limit is reached and every tab is busy.
+        """
+        max_tabs = self.state_manager.get_config().get("max_session_tabs", 6)
+        if len(self.sessions) < max_tabs:
+            session = Session()
+            self.sessions.append(session)
+            return session
+        idle_sessions = [session for session in self.sessions if not session.request_in_flight]
+        return idle_sessions[0] if idle_sessions else None
+
+    def _report_all_tabs_busy(self, text):
+        """Tells the user that captured text was dropped because every tab is busy."""
+        print(f"All {len(self.sessions)} tabs are busy. Ignoring the captured text.")
+        self.quick_peek.show(text, self.tray_manager.show_window)
+        self.quick_peek.set_text(f"All {len(self.sessions)} tabs are busy. Wait for a request to finish or close a tab, then try again.", done=True)
+
+    def _save_session_view(self):
+        """Stores what the shared widgets show into the active session."""
+        self.session.input_text = self.ui_manager.get_input_text()
+        self.session.selected_label = self.ui_manager.get_pressed_prompt_button_label()
+        self.session.custom_prompt_text = self.ui_manager.get_custom_prompt_text()
+
+    def _show_session(self, session):
+        """Makes a session the active one and loads its state into the shared widgets."""
+        if self._live_after_id is not None:
+            # A pending live run belongs to the tab being left
+            self.ui_manager.root.after_cancel(self._live_after_id)
+            self._live_after_id = None
+        self.session = session
+        self._switching_session = True
+        try:
+            self.ui_manager.toggle_main_widgets_state(tk.NORMAL)
+            self.ui_manager.set_input_text(session.input_text)
+            self.ui_manager.input_widget.edit_modified(False)
+            input_type = self._determine_input_type(session.input_text) if session.input_text else "phrase"
+            self.ui_manager.create_processing_buttons(input_type, self._on_prompt_button_click)
+            if session.selected_label:
+                self.ui_manager.set_prompt_button_pressed_state(session.selected_label)
+            self.ui_manager.set_custom_prompt_text(session.custom_prompt_text)
+            if session.selected_label != "Custom Prompt":
+                self.ui_manager.hide_custom_prompt_entry()
+        finally:
+            self._switching_session = False
+
+        if session.request_in_flight:
+            if session.partial_render is not None:
+                tree, html_content = session.partial_render
+                self.ui_manager.update_output_html(html_content, tree)
+            else:
+                self.ui_manager.update_output_html("<p>Processing...</p>")
+            if not session.current_request_live:
+                self.ui_manager.toggle_main_widgets_state(tk.DISABLED)
+        elif session.last_raw_llm_response:
+            # Memoized: a re-shown response is only converted again (on the render worker) if it was evicted
+            document = self.render_cache.get(session.last_raw_llm_response, self.css_content)
+            if document is not None:
+                tree, html_content = document
+                self.ui_manager.update_output_html(html_content, tree)
+            else:
+                self.ui_manager.update_output_html("<p>Rendering...</p>")
+                self._render_executor.submit(self._render_stored_response, session, session.request_generation,
+                                             session.last_raw_llm_response, session.last_plain_text)
+        else:
+            self.ui_manager.update_output_html("")
+        self._update_session_tabs()
+
+    def _update_session_tabs(self):
+        """Redraws the session tabs."""
+        self.ui_manager.update_session_tabs([(session.id, session.title, session.request_in_flight) for session in self.sessions], self.session.id)
+
+    def switch_session(self, session_id):
+        """Shows the session tab with the given id."""
+        if session_id == self.session.id:
+            return
+        for session in self.sessions:
+            if session.id == session_id:
+                self._save_session_view()
+                self._show_session(session)
+                return
+
+    def new_session(self):
+        """Opens an empty session tab."""
+        session = Session()
+        self.sessions.append(session)
+        self._save_session_view()
+        self._show_session(session)
+
+    def close_session(self):
+        """Closes the active session tab, cancelling its request."""
+        session = self.session
+        self._cancel_current_request(session)
+        index = self.sessions.index(session)
+        self.sessions.remove(session)
+        if not self.sessions:
+            self.sessions.append(Session())
+        self._show_session(self.sessions[min(index, len(self.sessions) - 1)])
+
     def copy_output(self):
         """Copies the plain text output to the clipboard."""
-        if not self._last_raw_llm_response:
+        if not self.session.last_raw_llm_response:
             print("No output to copy.")
             return
 
         try:
-            plain_text = _markdown_to_plain_text(self._last_raw_llm_response)
-            pyperclip.copy(plain_text)
+            pyperclip.copy(self.session.last_plain_text)
             print("Plain text copied to clipboard.")
         except pyperclip.PyperclipException as e:
             print(f"Error copying to clipboard: {e}")
 
     def copy_output_with_formatting(self):
         """Copies the HTML output to the clipboard using the ClipboardManager."""
-        if not self._last_rendered_html:
+        if not self.session.last_rendered_html:
             print("No formatted output to copy.")
             return
 
-        success = self.clipboard_manager.copy_html_with_formatting(_markdown_to_plain_text(self._last_raw_llm_response) ,self._last_rendered_html)
+        success = self.clipboard_manager.copy_html_with_formatting(self.session.last_plain_text, self.session.last_rendered_html)
         if success:
             print("Formatted output copied to clipboard.")
         else:
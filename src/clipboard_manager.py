@@ -1,6 +1,12 @@
 # pylint: disable=broad-except
 
+import ctypes
+import ctypes.util
 import sys
+import threading
+import time
+import pyperclip
+from pynput import keyboard
 
 # Attempt to import klembord, which is needed for Windows HTML clipboard support
 try:
@@ -9,12 +15,172 @@ except ImportError:
     klembord = None
     # print("Warning: klembord library not found. HTML clipboard copying may not work on Windows.")
 
+class _X11SelectionWatcher:
+    """
+    Counts CLIPBOARD ownership changes on X11 using XFixes selection events.
+
+    Every copy makes the source application take ownership of the CLIPBOARD
+    selection, so the counter behaves like the Windows clipboard sequence number.
+    """
+
+    _XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK = 1
+    _XFIXES_SELECTION_NOTIFY = 0
+
+    def __init__(self):
+        libx11_path = ctypes.util.find_library("X11")
+        libxfixes_path = ctypes.util.find_library("Xfixes")
+        if not libx11_path or not libxfixes_path:
+            raise OSError("libX11 or libXfixes not found")
+        self._xlib = ctypes.cdll.LoadLibrary(libx11_path)
+        self._xfixes = ctypes.cdll.LoadLibrary(libxfixes_path)
+        self._xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self._xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self._xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        self._xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self._xlib.XInternAtom.restype = ctypes.c_ulong
+        self._xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        self._xlib.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        self._xlib.XFlush.argtypes = [ctypes.c_void_p]
+        self._xfixes.XFixesQueryExtension.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]
+        self._xfixes.XFixesSelectSelectionInput.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong]
+
+        self._display = self._xlib.XOpenDisplay(None)
+        if not self._display:
+            raise OSError("Cannot open X display")
+        event_base, error_base = ctypes.c_int(), ctypes.c_int()
+        if not self._xfixes.XFixesQueryExtension(self._display, ctypes.byref(event_base), ctypes.byref(error_base)):
+            raise OSError("XFixes extension is not available")
+        self._selection_notify_type = event_base.value + self._XFIXES_SELECTION_NOTIFY
+
+        root_window = self._xlib.XDefaultRootWindow(self._display)
+        clipboard_atom = self._xlib.XInternAtom(self._display, b"CLIPBOARD", 0)
+        self._xfixes.XFixesSelectSelectionInput(self._display, root_window, clipboard_atom, self._XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK)
+        self._xlib.XFlush(self._display)
+
+        self.change_count = 0
+        self.changed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Blocks on the private X connection and counts selection owner changes."""
+        event = (ctypes.c_long * 24)() # XEvent is a union padded to 24 longs
+        while True:
+            self._xlib.XNextEvent(self._display, ctypes.byref(event))
+            if ctypes.cast(event, ctypes.POINTER(ctypes.c_int))[0] == self._selection_notify_type:
+                with self.changed:
+                    self.change_count += 1
+                    self.changed.notify_all()
+
+
 class ClipboardManager:
     """Manages clipboard operations, including formatted text."""
 
+    _POLL_INTERVAL_S = 0.005
+    # Without change notifications, unchanged content usually means the user's own Ctrl+C
+    # already copied the selection, so the simulated copy is not waited for any longer
+    _UNCHANGED_SETTLE_S = 0.1
+
     def __init__(self):
         """Initializes the ClipboardManager."""
-        pass # Currently no specific initialization needed
+        self._x11_watcher = None
+        self._keyboard_controller = None
+        self._simulated_keys_listener = None
+        if sys.platform.startswith('linux'):
+            try:
+                self._x11_watcher = _X11SelectionWatcher()
+                print("Clipboard change notifications enabled (XFixes).")
+            except Exception as e:
+                print(f"XFixes clipboard notifications unavailable, falling back to polling: {e}")
+
+    def get_change_count(self):
+        """
+        Returns a counter that increases every time the clipboard changes.
+
+        Returns:
+            int or None: The clipboard sequence number, or None if the platform
+                         offers no way to observe clipboard changes.
+        """
+        if sys.platform == 'win32':
+            return ctypes.windll.user32.GetClipboardSequenceNumber()
+        if self._x11_watcher is not None:
+            return self._x11_watcher.change_count
+        return None
+
+    def _wait_for_change(self, baseline, deadline):
+        """Waits until the change counter moves past the baseline. Returns True on change."""
+        if self._x11_watcher is not None:
+            with self._x11_watcher.changed:
+                return self._x11_watcher.changed.wait_for(
+                    lambda: self._x11_watcher.change_count != baseline,
+                    timeout=max(0.0, deadline - time.monotonic()))
+        while time.monotonic() < deadline:
+            if self.get_change_count() != baseline:
+                return True
+            time.sleep(self._POLL_INTERVAL_S)
+        return False
+
+    def _wait_for_content_change(self, previous_content, deadline):
+        """Polls the clipboard content on platforms without change notifications."""
+        while time.monotonic() < deadline:
+            if pyperclip.paste() != previous_content:
+                return True
+            time.sleep(self._POLL_INTERVAL_S)
+        return False
+
+    def set_simulated_keys_listener(self, callback):
+        """
+        Registers callback(*key_names) called before keys are simulated.
+
+        Pass HotkeyManager.expect_simulated_keys, so the hotkey listener ignores our own Ctrl+C.
+        """
+        self._simulated_keys_listener = callback
+
+    def _simulate_copy(self):
+        """Sends a Ctrl+C key press to the focused application."""
+        if self._simulated_keys_listener is not None:
+            self._simulated_keys_listener("ctrl", "c")
+        if self._keyboard_controller is None:
+            self._keyboard_controller = keyboard.Controller()
+        with self._keyboard_controller.pressed(keyboard.Key.ctrl):
+            self._keyboard_controller.tap('c')
+
+    def capture_selection(self, timeout_ms=500):
+        """
+        Copies the current selection and returns the clipboard text as soon as it lands.
+
+        The clipboard change counter is recorded before the copy is simulated, so
+        the content is read right after the copy completes instead of after a
+        fixed delay. If the clipboard does not change within the timeout (e.g.
+        the selection was already copied), the current content is returned.
+        Where changes can only be seen by polling the content, the simulated copy
+        usually leaves it unchanged (the user's own Ctrl+C already copied the
+        selection), so unchanged content is accepted after a short settle time.
+
+        Args:
+            timeout_ms: Maximum time to wait for the clipboard to change.
+
+        Returns:
+            str: The clipboard content (may be empty).
+
+        Raises:
+            pyperclip.PyperclipException: If the clipboard cannot be read.
+        """
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        baseline = self.get_change_count()
+        previous_content = pyperclip.paste() if baseline is None else None
+
+        self._simulate_copy()
+
+        if baseline is not None:
+            changed = self._wait_for_change(baseline, deadline)
+        else:
+            changed = self._wait_for_content_change(previous_content, min(deadline, time.monotonic() + self._UNCHANGED_SETTLE_S))
+            if not changed:
+                return previous_content
+        if not changed:
+            print(f"Clipboard did not change within {timeout_ms} ms. Using current content.")
+        return pyperclip.paste()
 
     def _copy_html_windows(self, text_content, html_content):
         """Copies HTML content to the clipboard on Windows using klembord."""
@@ -10,6 +10,51 @@ DEFAULT_SETTINGS = {
     "target_language": "Ukrainian",
     "last_processing_option": "Translate",
     "window_geometry": "800x600",
+    "clipboard_capture_timeout_ms": 500,
+    "output_renderer": "html",
+    "idle_trim_minutes": 10,
+    "live_mode": False,
+    "live_debounce_ms": 700,
+    "api_server_port": 8765,
+    "api_server_token": "",
+    "hotkeys": [{"chord": "ctrl+c ctrl+c", "prompt": ""}],
+    "hotkey_window_ms": 400,
+    "llm_max_concurrency": 2,
+    "ui_frame_ms": 33,
+    "large_input_threshold_chars": 100000,
+    "max_session_tabs": 6,
+    "model_router": {
+        "enabled": False,
+        "models": {"gemini-2.5-flash-lite": 1, "gemini-2.5-flash": 2},
+        "explore_rate": 0.05,
+        "error_rate_threshold": 0.5,
+        "cooldown_seconds": 60
+    },
+    "hedging": {
+        "enabled": False,
+        "percentile": 90,
+        "min_delay_ms": 1000,
+        "max_hedge_rate": 0.1,
+        "fallback_model": ""
+    },
+    "context_cache": {
+        "enabled": False,
+        "min_chars": 8000,
+        "ttl_seconds": 3600
+    },
+    "quick_peek": {
+        "enabled": True,
+        "input_types": ["word"],
+        "max_lines": 6,
+        "dismiss_seconds": 10
+    },
+    "quota": {
+        "requests_per_minute": {},
+        "requests_per_day": {},
+        "tokens_per_day": {},
+        "warn_fraction": 0.8,
+        "cooldown_seconds": 60
+    },
     "source_languages": ["English", "British English", "Spanish", "French", "German", "Ukrainian", "Russian"],
     "target_languages": ["Ukrainian", "Russian", "English", "British English", "Spanish", "French", "German"]
 }
@@ -18,34 +63,40 @@ DEFAULT_PROMPTS = {
   "word": [
     {
       "label": "Full Analysis",
-      "prompt": "Provide a comprehensive analysis for the word '{text}' in {from_language}. Include its definition, synonyms, antonyms, and three example sentences.",
+      "system_instruction": "Provide a comprehensive analysis of the {from_language} word given by the user. Include its definition, synonyms, antonyms, and three example sentences.",
+      "prompt": "{text}",
       "default": False
     },
     {
       "label": "Translate",
-      "prompt": "Translate the word '{text}' from {from_language} to {to_language}.",
+      "system_instruction": "Translate the word given by the user from {from_language} to {to_language}.",
+      "prompt": "{text}",
       "default": True
     },
     {
       "label": "Custom Prompt",
-      "prompt": "'{text}'. Make a fairy tail about this word in {from_language}. Include a moral lesson.",
+      "prompt": "Make a fairy tale in {from_language} about the text below. Include a moral lesson.\n\n{text}",
       "default": False
     }
   ],
   "phrase": [
     {
       "label": "Proofread",
-      "prompt": "Proofread and correct the following text, keeping the original meaning. Explain the corrections. The original text is in {from_language}. Use Markdown for your corrections: **new text** for additions and ~~old text~~ for deletions. Original text: '{text}'",
+      "system_instruction": "Proofread and correct the text given by the user, keeping the original meaning. The original text is in {from_language}. Return only the corrected text, without quotes, comments or formatting.",
+      "prompt": "{text}",
+      "mode": "diff",
+      "incremental": True,
       "default": False
     },
     {
       "label": "Translate",
-      "prompt": "Translate the following text from {from_language} to {to_language}. Text: '{text}'",
+      "system_instruction": "Translate the text given by the user from {from_language} to {to_language}.",
+      "prompt": "{text}",
       "default": True
     },
     {
       "label": "Custom Prompt",
-      "prompt": "'{text}'. Make a fairy tail about this word in {from_language}. Include a moral lesson.",
+      "prompt": "Make a fairy tale in {from_language} about the text below. Include a moral lesson.\n\n{text}",
       "default": False
     }
   ]
@@ -77,6 +128,24 @@ def load_config(filepath):
         # Add default values for new keys if they don't exist
         config.setdefault("source_languages", DEFAULT_SETTINGS["source_languages"])
         config.setdefault("target_languages", DEFAULT_SETTINGS["target_languages"])
+        config.setdefault("clipboard_capture_timeout_ms", DEFAULT_SETTINGS["clipboard_capture_timeout_ms"])
+        config.setdefault("output_renderer", DEFAULT_SETTINGS["output_renderer"])
+        config.setdefault("idle_trim_minutes", DEFAULT_SETTINGS["idle_trim_minutes"])
+        config.setdefault("live_mode", DEFAULT_SETTINGS["live_mode"])
+        config.setdefault("live_debounce_ms", DEFAULT_SETTINGS["live_debounce_ms"])
+        config.setdefault("api_server_port", DEFAULT_SETTINGS["api_server_port"])
+        config.setdefault("api_server_token", DEFAULT_SETTINGS["api_server_token"])
+        config.setdefault("hotkeys", DEFAULT_SETTINGS["hotkeys"])
+        config.setdefault("hotkey_window_ms", DEFAULT_SETTINGS["hotkey_window_ms"])
+        config.setdefault("llm_max_concurrency", DEFAULT_SETTINGS["llm_max_concurrency"])
+        config.setdefault("ui_frame_ms", DEFAULT_SETTINGS["ui_frame_ms"])
+        config.setdefault("large_input_threshold_chars", DEFAULT_SETTINGS["large_input_threshold_chars"])
+        config.setdefault("max_session_tabs", DEFAULT_SETTINGS["max_session_tabs"])
+        config.setdefault("model_router", DEFAULT_SETTINGS["model_router"])
+        config.setdefault("hedging", DEFAULT_SETTINGS["hedging"])
+        config.setdefault("quota", DEFAULT_SETTINGS["quota"])
+        config.setdefault("quick_peek", DEFAULT_SETTINGS["quick_peek"])
+        config.setdefault("context_cache", DEFAULT_SETTINGS["context_cache"])
 
         return config
     except json.JSONDecodeError:
@@ -0,0 +1,147 @@
+# pylint: disable=line-too-long
+# pylint: disable=broad-except
+
+"""Runs a corpus of inputs through each prompt/model combination and tabulates latency and token use."""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import statistics
+import gemini_client
+import llm_fixtures
+from state_manager import StateManager
+from prompt_processing import determine_input_type, fill_prompt_template, get_request_options
+
+_COLUMNS = ("prompt", "model", "calls", "errors", "p50_ms", "p90_ms", "max_ms", "prompt_tok", "output_tok", "cached_tok")
+
+
+def load_corpus(path):
+    """
+    Loads evaluation inputs.
+
+    Args:
+        path: A .json file with a list of strings, or a text file with one input per line.
+
+    Returns:
+        list: The input texts.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return [text for text in json.load(f) if text.strip()]
+        return [line.strip() for line in f if line.strip()]
+
+
+def percentile(values, percent):
+    """Returns the given percentile of values (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def run_evaluation(state_manager, corpus, labels=None, models=None, runs=1):
+    """
+    Sends every input through every matching prompt and model, one call at a time.
+
+    Args:
+        state_manager: The StateManager with loaded settings and prompts.
+        corpus: The input texts.
+        labels: Prompt labels to evaluate (all prompts of each input's type if empty).
+        models: Models to evaluate (each prompt's configured model if empty).
+        runs: Number of times each combination is run.
+
+    Returns:
+        list: One call record (see gemini_client.add_call_observer) per call, with "label" added.
+    """
+    config = state_manager.get_config()
+    api_key = config.get("api_key", "")
+    calls = []
+    gemini_client.add_call_observer(calls.append)
+    results = []
+    for text in corpus:
+        input_type = determine_input_type(text)
+        for prompt_def in state_manager.get_prompts_config().get(input_type, []):
+            label = prompt_def.get("label")
+            if label == "Custom Prompt" or (labels and label not in labels):
+                continue
+            prompt = fill_prompt_template(prompt_def.get("prompt", "{text}"), text,
+                                          config.get("source_language", "English"), config.get("target_language", "Ukrainian"))
+            model_name, generation_settings, response_schema = get_request_options(prompt_def, config)
+            for model in models or [model_name]:
+                for _ in range(runs):
+                    # Sequential on purpose: concurrent calls would distort each other's latency
+                    await gemini_client.get_llm_response(api_key, model, prompt, generation_settings, response_schema)
+                    if calls:
+                        results.append(dict(calls.pop(), label=label))
+    return results
+
+
+def summarize(results):
+    """Aggregates call records into one row per (prompt, model)."""
+    groups = {}
+    for call in results:
+        groups.setdefault((call["label"], call["model"]), []).append(call)
+    rows = []
+    for (label, model), calls in groups.items():
+        latencies = [call["total_ms"] for call in calls if not call["error"]]
+        usages = [call["usage"] for call in calls if call["usage"]]
+
+        def mean_tokens(name):
+            return round(statistics.mean(usage.get(name, 0) for usage in usages)) if usages else "-"
+
+        rows.append({
+            "prompt": label,
+            "model": model,
+            "calls": len(calls),
+            "errors": len(calls) - len(latencies),
+            "p50_ms": round(percentile(latencies, 50)) if latencies else "-",
+            "p90_ms": round(percentile(latencies, 90)) if latencies else "-",
+            "max_ms": round(max(latencies)) if latencies else "-",
+            "prompt_tok": mean_tokens("prompt_tokens"),
+            "output_tok": mean_tokens("output_tokens"),
+            "cached_tok": mean_tokens("cached_tokens"),
+        })
+    return rows
+
+
+def format_table(rows):
+    """Formats summary rows as an aligned text table."""
+    cells = [list(_COLUMNS)] + [[str(row[column]) for column in _COLUMNS] for row in rows]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(_COLUMNS))]
+    lines = ["  ".join(cell.ljust(widths[i]) if i < 2 else cell.rjust(widths[i]) for i, cell in enumerate(line)) for line in cells]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def write_csv(path, results):
+    """Writes one CSV row per call."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["prompt", "model", "total_ms", "ttfb_ms", "prompt_tokens", "output_tokens", "cached_tokens", "error"])
+        for call in results:
+            usage = call["usage"] or {}
+            writer.writerow([call["label"], call["model"], round(call["total_ms"] or 0, 1), call["ttfb_ms"],
+                             usage.get("prompt_tokens"), usage.get("output_tokens"), usage.get("cached_tokens"), call["error"] or ""])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate Lexi's prompts: latency and token use per prompt and model")
+    parser.add_argument("corpus", help="Inputs: a text file with one input per line, or a .json list of strings")
+    parser.add_argument("--prompt", action="append", dest="labels", help="Prompt label to evaluate (repeatable; default: all)")
+    parser.add_argument("--model", action="append", dest="models", help="Model to evaluate (repeatable; default: each prompt's model)")
+    parser.add_argument("--runs", type=int, default=1, help="Runs per combination (default: 1)")
+    parser.add_argument("--record", help="Append the calls to this fixtures file")
+    parser.add_argument("--replay", help="Answer the calls from this fixtures file instead of the API")
+    parser.add_argument("--replay-timing", action="store_true", help="Replay with the recorded latencies")
+    parser.add_argument("--csv", help="Also write one row per call to this CSV file")
+    arguments = parser.parse_args()
+
+    evaluation_state = StateManager(os.path.join("config", "settings.json"), os.path.join("config", "prompts.json"))
+    evaluation_state.load_state()
+    llm_fixtures.configure(arguments.record, arguments.replay, arguments.replay_timing)
+    gemini_client.configure_context_cache(evaluation_state.get_config().get("context_cache"))
+    evaluation_results = asyncio.run(run_evaluation(evaluation_state, load_corpus(arguments.corpus), arguments.labels, arguments.models, max(1, arguments.runs)))
+    print(format_table(summarize(evaluation_results)))
+    if arguments.csv:
+        write_csv(arguments.csv, evaluation_results)
+        print(f"Per-call results written to {arguments.csv}")
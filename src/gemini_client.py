@@ -1,13 +1,193 @@
-# import asyncio
-from google import genai
-from google.genai import types
-from google.api_core import exceptions as google_exceptions
+# The Google SDK is imported on first use: it is by far the slowest import, and a second
+# Lexi instance that only forwards its text to the running one must start in milliseconds.
 
-async def get_llm_response(api_key: str, model_name: str, prompt: str) -> str:
+import asyncio
+import contextvars
+import hashlib
+import time
+
+# Per-prompt generation settings that may be declared in prompts.json
+# (system_instruction is filled with the languages by prompt_processing.get_request_options)
+GENERATION_SETTING_KEYS = ("max_output_tokens", "temperature", "thinking_budget", "system_instruction")
+
+
+
+class ErrorResponse(str):
+    """
+    An error message returned in place of a response.
+
+    Callers test the type (see is_error), never the text, so a genuine answer
+    starting with "Error" is not mistaken for a failure.
+    """
+
+
+def is_error(response):
+    """True if a response is an error message rather than model output."""
+    return isinstance(response, ErrorResponse)
+
+
+# Client pool: one client (and its HTTP connection pool) per API key
+_clients = {}
+
+# Callables notified with a record of every call (fixture recording, token accounting)
+_call_observers = []
+# When set, calls are answered from recorded fixtures instead of the API (see llm_fixtures)
+_replay_provider = None
+# Prompt label of the calls made in the current context, reported to the observers
+request_label = contextvars.ContextVar("request_label", default="")
+
+# Explicit context caching of long system instructions (see configure_context_cache)
+_context_cache_config = {}
+_context_caches = {} # (api_key, model, instruction hash) -> (cache name or None if creation failed, monotonic expiry)
+_context_cache_locks = {}
+
+
+def add_call_observer(callback):
+    """
+    Registers callback(call) invoked after every LLM call.
+
+    The call record is a dict with label, model, prompt, generation_settings, response_schema,
+    response, chunks (streamed calls), ttfb_ms, total_ms, usage, error, quota_exceeded (the API
+    refused the call for quota) and cancelled (the caller abandoned the call, e.g. a hedged-away
+    duplicate; usage then holds the tokens reported before it stopped).
+    """
+    _call_observers.append(callback)
+
+
+def set_replay_provider(provider):
+    """Answers all calls from a llm_fixtures.ReplayProvider (None restores live calls)."""
+    global _replay_provider
+    _replay_provider = provider
+
+
+def configure_context_cache(cache_config):
+    """
+    Enables explicit context caching of long system instructions.
+
+    Args:
+        cache_config (dict): The "context_cache" settings: "enabled", "min_chars" (shorter
+            instructions are sent inline) and "ttl_seconds".
+    """
+    global _context_cache_config
+    _context_cache_config = dict(cache_config or {})
+
+
+async def _get_cached_content(client, api_key, model_name, system_instruction):
+    """
+    Returns the name of an explicit cache holding the system instruction, creating it if needed.
+
+    Returns:
+        tuple: (cache name or None to send the instruction inline, cache key).
+    """
+    if not system_instruction or not _context_cache_config.get("enabled"):
+        return None, None
+    if len(system_instruction) < _context_cache_config.get("min_chars", 8000):
+        return None, None # Below the provider's minimum cache size; implicit caching still applies
+    key = (api_key, model_name, hashlib.sha256(system_instruction.encode("utf-8")).hexdigest())
+    lock = _context_cache_locks.setdefault(key, asyncio.Lock())
+    async with lock: # Concurrent first requests share one cache
+        entry = _context_caches.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0], key
+        ttl_seconds = _context_cache_config.get("ttl_seconds", 3600)
+        # Renewed early, so a request never references a cache that is about to expire
+        expiry = time.monotonic() + max(ttl_seconds - 60, ttl_seconds / 2)
+        from google.genai import types
+        try:
+            cache = await client.aio.caches.create(
+                model=model_name,
+                config=types.CreateCachedContentConfig(system_instruction=system_instruction, ttl=f"{ttl_seconds}s", display_name="lexi-instructions"))
+        except Exception as e:
+            print(f"Context caching unavailable for {model_name}: {e}. Sending the instruction inline.")
+            _context_caches[key] = (None, expiry) # Retried after the TTL
+            return None, key
+        print(f"Created context cache {cache.name} for a {len(system_instruction)}-character instruction on {model_name}.")
+        _context_caches[key] = (cache.name, expiry)
+        return cache.name, key
+
+
+def _forget_cached_content(cache_key):
+    """Drops a cache after a failed request, so the next request recreates it (it may have been deleted)."""
+    if cache_key is not None:
+        _context_caches.pop(cache_key, None)
+
+
+def _log_usage(usage):
+    """Prints the token counts of a call, including the prompt tokens served from cache."""
+    if usage:
+        print(f"Tokens: prompt {usage['prompt_tokens']} (cached {usage['cached_tokens']}), output {usage['output_tokens']}")
+
+
+def _usage_dict(usage_metadata):
+    """Converts the SDK's usage metadata into a plain dict of token counts."""
+    if usage_metadata is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage_metadata, "prompt_token_count", None) or 0,
+        "output_tokens": getattr(usage_metadata, "candidates_token_count", None) or 0,
+        "cached_tokens": getattr(usage_metadata, "cached_content_token_count", None) or 0,
+        "total_tokens": getattr(usage_metadata, "total_token_count", None) or 0,
+    }
+
+
+def _notify_call(call):
+    """Passes a call record to the observers."""
+    for callback in _call_observers:
+        try:
+            callback(call)
+        except Exception as e:
+            print(f"Error in LLM call observer: {e}")
+
+
+def get_client(api_key):
+    """Returns the pooled genai.Client for an API key, creating it on first use."""
+    client = _clients.get(api_key)
+    if client is None:
+        from google import genai
+        client = genai.Client(api_key=api_key)
+        _clients[api_key] = client
+    return client
+
+
+def build_generation_config(generation_settings=None, response_schema=None, cached_content=None):
+    """
+    Builds the GenerateContentConfig for a request.
+
+    Args:
+        generation_settings (dict, optional): Values for any of GENERATION_SETTING_KEYS.
+            Thinking is disabled (budget 0) unless a thinking_budget is given.
+        response_schema (dict, optional): If given, the model must answer with JSON matching this schema.
+        cached_content (str, optional): Name of an explicit cache holding the system instruction,
+            which is then not sent inline.
+
+    Returns:
+        types.GenerateContentConfig: The request configuration.
+    """
+    from google.genai import types
+    generation_settings = generation_settings or {}
+    config_kwargs = {
+        "thinking_config": types.ThinkingConfig(thinking_budget=generation_settings.get("thinking_budget", 0))
+    }
+    if generation_settings.get("max_output_tokens") is not None:
+        config_kwargs["max_output_tokens"] = generation_settings["max_output_tokens"]
+    if generation_settings.get("temperature") is not None:
+        config_kwargs["temperature"] = generation_settings["temperature"]
+    if cached_content is not None:
+        config_kwargs["cached_content"] = cached_content
+    elif generation_settings.get("system_instruction"):
+        # Static instructions go first and the user text last, so the prompt prefix is cacheable
+        config_kwargs["system_instruction"] = generation_settings["system_instruction"]
+    if response_schema is not None:
+        config_kwargs["response_mime_type"] = "application/json"
+        config_kwargs["response_schema"] = response_schema
+    return types.GenerateContentConfig(**config_kwargs)
+
+
+async def get_llm_response(api_key: str, model_name: str, prompt: str, generation_settings: dict = None, response_schema: dict = None) -> str:
     """
     Get response from Google's Gemini LLM API asynchronously.
 
-    This function creates a client instance using the provided API key, then
+    This function takes the pooled client for the provided API key, then
     requests a response from the Gemini LLM API using the provided prompt.
     The response is returned as a string. If the request fails, an error message
     is returned instead.
@@ -16,39 +196,148 @@ async def get_llm_response(api_key: str, model_name: str, prompt: str) -> str:
         api_key (str): Google API key for authentication
         model_name (str): The name of the LLM model to use
         prompt (str): The input prompt for the LLM
+        generation_settings (dict, optional): Per-prompt max_output_tokens, temperature, thinking_budget and system_instruction
+        response_schema (dict, optional): JSON schema for structured output; the response text is then JSON
 
     Returns:
         str: The generated response or an error message if the request fails
     """
-    client = genai.Client(api_key=api_key)
-    
+    call = {"label": request_label.get(), "model": model_name, "prompt": prompt, "generation_settings": generation_settings or {}, "response_schema": response_schema}
+    if _replay_provider is not None:
+        recorded = await _replay_provider.replay(call)
+        _notify_call(recorded)
+        return ErrorResponse(recorded["error"]) if recorded["error"] else recorded["response"]
+
+    client = get_client(api_key)
+
     print(f"Using model: {model_name}")
-    config = types.GenerateContentConfig(
-            thinking_config=types.ThinkingConfig(thinking_budget=0) # Disables thinking
-        )
-    
+    start = time.monotonic()
+    cache_key = None
     try:
+        cached_content, cache_key = await _get_cached_content(client, api_key, model_name, (generation_settings or {}).get("system_instruction"))
+        config = build_generation_config(generation_settings, response_schema, cached_content)
         # response = await asyncio.to_thread(client.models.generate_content, model=model_name, contents=prompt, config=config)
         response = await client.aio.models.generate_content(
                             model=model_name,
                             contents=prompt,
                             config=config
                         )
+        elapsed_ms = (time.monotonic() - start) * 1000
+        usage = _usage_dict(response.usage_metadata)
+        _log_usage(usage)
+        _notify_call(dict(call, response=response.text, chunks=None, ttfb_ms=elapsed_ms, total_ms=elapsed_ms, usage=usage, error=None,
+                          quota_exceeded=False, cancelled=False))
         # Return the generated text
         return response.text
-    except google_exceptions.PermissionDenied as e:
+    except asyncio.CancelledError:
+        _notify_call(dict(call, response=None, chunks=None, ttfb_ms=None, total_ms=(time.monotonic() - start) * 1000, usage={}, error=None,
+                          quota_exceeded=False, cancelled=True))
+        raise
+    except Exception as e:
+        _forget_cached_content(cache_key)
+        message = error_message(e)
+        _notify_call(dict(call, response=None, chunks=None, ttfb_ms=None, total_ms=(time.monotonic() - start) * 1000, usage={}, error=message,
+                          quota_exceeded=is_quota_error(e), cancelled=False))
+        return message
+
+
+async def stream_llm_response(api_key: str, model_name: str, prompt: str, generation_settings: dict = None, response_schema: dict = None):
+    """
+    Streams the response from Google's Gemini LLM API.
+
+    Takes the same arguments as get_llm_response.
+
+    Yields:
+        str: Text chunks as they arrive.
+
+    Raises:
+        Exception: API errors are raised so the caller can discard the partial
+                   response; error_message() converts them for display.
+    """
+    call = {"label": request_label.get(), "model": model_name, "prompt": prompt, "generation_settings": generation_settings or {}, "response_schema": response_schema}
+    if _replay_provider is not None:
+        recorded = await _replay_provider.replay(call)
+        _notify_call(recorded)
+        if recorded["error"]:
+            raise ValueError(recorded["error"].removeprefix("Error: "))
+        for chunk in recorded["chunks"] or [recorded["response"]]:
+            yield chunk
+        return
+
+    client = get_client(api_key)
+
+    print(f"Using model (streaming): {model_name}")
+    start = time.monotonic()
+    chunks = []
+    usage_metadata = None
+    ttfb_ms = None
+    cache_key = None
+    try:
+        cached_content, cache_key = await _get_cached_content(client, api_key, model_name, (generation_settings or {}).get("system_instruction"))
+        config = build_generation_config(generation_settings, response_schema, cached_content)
+        stream = await client.aio.models.generate_content_stream(
+                            model=model_name,
+                            contents=prompt,
+                            config=config
+                        )
+        async for chunk in stream:
+            if chunk.usage_metadata is not None:
+                usage_metadata = chunk.usage_metadata # Cumulative: the last chunk has the totals
+            if chunk.text:
+                if ttfb_ms is None:
+                    ttfb_ms = (time.monotonic() - start) * 1000
+                chunks.append(chunk.text)
+                yield chunk.text
+    except (asyncio.CancelledError, GeneratorExit):
+        # Cancelled, or the consumer stopped iterating (a hedged-away duplicate): the tokens streamed so far are still billed
+        _notify_call(dict(call, response=None, chunks=chunks, ttfb_ms=ttfb_ms, total_ms=(time.monotonic() - start) * 1000, usage=_usage_dict(usage_metadata),
+                          error=None, quota_exceeded=False, cancelled=True))
+        raise
+    except Exception as e:
+        _forget_cached_content(cache_key)
+        _notify_call(dict(call, response=None, chunks=chunks, ttfb_ms=ttfb_ms, total_ms=(time.monotonic() - start) * 1000, usage=_usage_dict(usage_metadata),
+                          error=error_message(e), quota_exceeded=is_quota_error(e), cancelled=False))
+        raise
+    usage = _usage_dict(usage_metadata)
+    _log_usage(usage)
+    _notify_call(dict(call, response="".join(chunks), chunks=chunks, ttfb_ms=ttfb_ms, total_ms=(time.monotonic() - start) * 1000,
+                      usage=usage, error=None, quota_exceeded=False, cancelled=False))
+
+
+def is_quota_error(e):
+    """
+    True if an exception is the API refusing a call for quota (HTTP 429, RESOURCE_EXHAUSTED).
+
+    The google-genai SDK raises errors.ClientError with the HTTP code and status;
+    the older google-api-core exceptions raise ResourceExhausted.
+    """
+    if getattr(e, "code", None) == 429 or getattr(e, "status", None) == "RESOURCE_EXHAUSTED":
+        return True
+    try:
+        from google.api_core import exceptions as google_exceptions
+    except ImportError:
+        return False # Not installed with google-genai
+    return isinstance(e, google_exceptions.ResourceExhausted)
+
+
+def error_message(e):
+    """Converts an exception raised by the Gemini API into a user-facing error message."""
+    try:
+        from google.api_core import exceptions as google_exceptions
+    except ImportError:
+        google_exceptions = None # Not installed with google-genai
+    if is_quota_error(e):
+        # Handle quota exceeded errors
+        return ErrorResponse("Error: Quota exceeded for this API key")
+    if google_exceptions is not None and isinstance(e, google_exceptions.PermissionDenied):
         # Handle API key errors
         if "API key not valid" in str(e):
-            return "Error: Invalid API key"
-        return f"Error: {str(e)}"
-    except google_exceptions.ResourceExhausted:
-        # Handle quota exceeded errors
-        return "Error: Quota exceeded for this API key"
-    except ValueError as e:
+            return ErrorResponse("Error: Invalid API key")
+        return ErrorResponse(f"Error: {str(e)}")
+    if isinstance(e, ValueError):
         # Handle response blocked errors
         if "response blocked" in str(e).lower():
-            return "Error: Response blocked by safety filters"
-        return f"Error: {str(e)}"
-    except Exception as e:
-        # Handle any other errors
-        return f"Error: {str(e)}"
+            return ErrorResponse("Error: Response blocked by safety filters")
+        return ErrorResponse(f"Error: {str(e)}")
+    # Handle any other errors
+    return ErrorResponse(f"Error: {str(e)}")
@@ -0,0 +1,66 @@
+"""Hedging policy: when to send a duplicate of a slow LLM request, and how often that is allowed."""
+
+import threading
+from collections import deque
+
+# Delay used until enough first-byte times have been measured
+_DEFAULT_DELAY_MS = 3000
+_MIN_TTFB_SAMPLES = 10
+# The hedge rate is computed over at least this many requests, so the first hedges are not blocked
+_MIN_RATE_WINDOW = 20
+
+
+class HedgePolicy:
+    """
+    Tracks time-to-first-byte (TTFB) of LLM calls and decides when to hedge.
+
+    A request is hedged when its first byte has not arrived after the configured
+    percentile of recent TTFBs, as long as hedges stay below max_hedge_rate of
+    recent requests.
+    """
+
+    def __init__(self, hedging_config=None):
+        """
+        Initializes the HedgePolicy.
+
+        Args:
+            hedging_config (dict, optional): The "hedging" settings: "enabled", "percentile",
+                "min_delay_ms", "max_hedge_rate" and "fallback_model" (empty for the same model).
+        """
+        hedging_config = hedging_config or {}
+        self.enabled = bool(hedging_config.get("enabled", False))
+        self.percentile = hedging_config.get("percentile", 90)
+        self.min_delay_ms = hedging_config.get("min_delay_ms", 1000)
+        self.max_hedge_rate = hedging_config.get("max_hedge_rate", 0.1)
+        self.fallback_model = hedging_config.get("fallback_model") or None
+        self._ttfb_ms = deque(maxlen=200)
+        self._hedged = deque(maxlen=100) # One flag per recent request
+        self._lock = threading.Lock()
+
+    def delay_seconds(self):
+        """Returns how long to wait for the first byte before hedging."""
+        with self._lock:
+            samples = sorted(self._ttfb_ms)
+        if len(samples) < _MIN_TTFB_SAMPLES:
+            delay_ms = _DEFAULT_DELAY_MS
+        else:
+            delay_ms = samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+        return max(delay_ms, self.min_delay_ms) / 1000
+
+    def record_ttfb(self, ttfb_ms):
+        """Records the time to first byte (or to the complete response when not streaming)."""
+        with self._lock:
+            self._ttfb_ms.append(ttfb_ms)
+
+    def try_hedge(self):
+        """Records a request that has reached the hedge delay; returns True if it may be hedged."""
+        with self._lock:
+            hedged_count = sum(self._hedged)
+            allowed = hedged_count < self.max_hedge_rate * max(len(self._hedged), _MIN_RATE_WINDOW)
+            self._hedged.append(allowed)
+            return allowed
+
+    def record_unhedged(self):
+        """Records a request that got its first byte in time."""
+        with self._lock:
+            self._hedged.append(False)
@@ -0,0 +1,80 @@
+"""Microbenchmark of the hotkey listener's per-event overhead."""
+
+import argparse
+import random
+import string
+import time
+from pynput import keyboard
+from hotkey_manager import HotkeyManager
+
+# Windows virtual key codes, so the benchmark does not depend on the platform's keyboard backend
+_VK_LCONTROL = 0xA2
+_VK_LSHIFT = 0xA0
+_VK_LMENU = 0xA4
+_BENCHMARK_KEY_CODES = (
+    {_VK_LCONTROL: 1, _VK_LSHIFT: 2, _VK_LMENU: 4},
+    {**{char: [ord(char.upper())] for char in string.ascii_lowercase + string.digits}, "space": [0x20], "f8": [0x77]},
+)
+_BINDINGS = [
+    {"chord": "ctrl+c ctrl+c", "prompt": ""},
+    {"chord": "ctrl+c ctrl+t", "prompt": "Translate"},
+    {"chord": "ctrl+alt+p", "prompt": "Proofread"},
+]
+
+
+def _typing_events(count):
+    """Plain typing: letters and spaces, with an occasional shifted letter."""
+    rng = random.Random(42)
+    events = []
+    for _ in range(count // 2):
+        char = rng.choice(string.ascii_lowercase + " ")
+        key = keyboard.KeyCode.from_vk(0x20 if char == " " else ord(char.upper()))
+        if rng.random() < 0.05:
+            shift = keyboard.KeyCode.from_vk(_VK_LSHIFT)
+            events += [(True, shift), (True, key), (False, key), (False, shift)]
+        else:
+            events += [(True, key), (False, key)]
+    return events
+
+
+def _chord_events(count):
+    """Repeated double Ctrl+C chords."""
+    ctrl = keyboard.KeyCode.from_vk(_VK_LCONTROL)
+    c = keyboard.KeyCode.from_vk(ord("C"))
+    chord = [(True, ctrl), (True, c), (False, c), (True, c), (False, c), (False, ctrl)]
+    return chord * (count // len(chord))
+
+
+def run_benchmark(events, rounds):
+    """
+    Feeds events to a HotkeyManager (without a listener) and measures the time per event.
+
+    Returns:
+        tuple: (nanoseconds per event of the best round, number of chords detected per round).
+    """
+    detected = []
+    manager = HotkeyManager(detected.append, _BINDINGS, 400, key_codes=_BENCHMARK_KEY_CODES)
+    manager._running = True # Deliver callbacks without starting the OS listener
+    on_press, on_release = manager._on_press, manager._on_release
+    best_ns = None
+    for _ in range(rounds):
+        detected.clear()
+        start = time.perf_counter_ns()
+        for pressed, key in events:
+            if pressed:
+                on_press(key)
+            else:
+                on_release(key)
+        elapsed_ns = (time.perf_counter_ns() - start) / len(events)
+        best_ns = elapsed_ns if best_ns is None else min(best_ns, elapsed_ns)
+    return best_ns, len(detected)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the hotkey listener's overhead per key event")
+    parser.add_argument("--events", type=int, default=200000, help="Key events per round (default: 200000)")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds; the best is reported (default: 5)")
+    arguments = parser.parse_args()
+    for name, events in (("typing", _typing_events(arguments.events)), ("double ctrl+c", _chord_events(arguments.events))):
+        ns_per_event, chords = run_benchmark(events, arguments.rounds)
+        print(f"{name:<14} {ns_per_event:8.0f} ns/event  ({len(events)} events, {chords} chords detected)")
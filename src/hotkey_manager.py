@@ -1,57 +1,311 @@
 # pylint: disable=broad-except
 
+"""
+Global hotkey detection.
+
+Chords such as "ctrl+c ctrl+c" (a double Ctrl+C) or "ctrl+alt+t" are compiled
+into a state machine keyed on virtual key codes, so each key event costs a few
+dict lookups, and plain typing without a modifier returns after the first.
+"""
+
+import string
+import sys
 import threading
 import time
 from pynput import keyboard
 
+# Modifier bits of a key combination, and the pynput keys that set them
+MODIFIER_BITS = {"ctrl": 1, "shift": 2, "alt": 4, "cmd": 8}
+_MODIFIER_ALIASES = {"control": "ctrl", "option": "alt", "win": "cmd", "super": "cmd", "meta": "cmd"}
+_MODIFIER_KEYS = {
+    "ctrl": ("ctrl", "ctrl_l", "ctrl_r"),
+    "shift": ("shift", "shift_l", "shift_r"),
+    "alt": ("alt", "alt_l", "alt_r", "alt_gr"),
+    "cmd": ("cmd", "cmd_l", "cmd_r"),
+}
+# macOS virtual key codes of letters and digits (the keyboard position, as on a US layout)
+_MAC_VKS = {
+    "a": 0, "s": 1, "d": 2, "f": 3, "h": 4, "g": 5, "z": 6, "x": 7, "c": 8, "v": 9, "b": 11, "q": 12,
+    "w": 13, "e": 14, "r": 15, "y": 16, "t": 17, "1": 18, "2": 19, "3": 20, "4": 21, "6": 22, "5": 23,
+    "9": 25, "7": 26, "8": 28, "0": 29, "o": 31, "u": 32, "i": 34, "p": 35, "l": 37, "j": 38, "k": 40,
+    "n": 45, "m": 46,
+}
+DEFAULT_HOTKEYS = [{"chord": "ctrl+c ctrl+c", "prompt": ""}]
+# Announced simulated key events (see HotkeyManager.expect_simulated_keys) are matched for this long
+_SIMULATED_KEYS_WINDOW_S = 0.5
+
+
+def parse_chord(chord):
+    """
+    Parses a chord: key combinations separated by spaces, each being modifiers and a key joined by "+".
+
+    Example: "ctrl+c ctrl+c" (double Ctrl+C), "ctrl+shift+t", "cmd+f8".
+
+    Returns:
+        list: (modifier bits, key name) per combination.
+
+    Raises:
+        ValueError: If the chord is empty or a combination has no key or several keys.
+    """
+    combos = []
+    for combo in chord.lower().split():
+        modifiers = 0
+        key_name = None
+        for part in combo.split("+"):
+            part = _MODIFIER_ALIASES.get(part, part)
+            if part in MODIFIER_BITS:
+                modifiers |= MODIFIER_BITS[part]
+            elif key_name is None and part:
+                key_name = part
+            else:
+                raise ValueError(f"'{combo}' must have exactly one non-modifier key")
+        if key_name is None:
+            raise ValueError(f"'{combo}' has no key besides modifiers")
+        combos.append((modifiers, key_name))
+    if not combos:
+        raise ValueError("Empty chord")
+    return combos
+
+
+def platform_key_codes():
+    """
+    Returns the virtual key codes of this platform.
+
+    Returns:
+        tuple: (modifier_vks, key_vks) where modifier_vks maps a virtual key code to
+        its modifier bit and key_vks maps key names ("c", "7", "f8", "space") to codes.
+    """
+    modifier_vks = {}
+    for modifier, key_names in _MODIFIER_KEYS.items():
+        for key_name in key_names:
+            key = getattr(keyboard.Key, key_name, None)
+            if key is not None and key.value.vk is not None:
+                modifier_vks[key.value.vk] = MODIFIER_BITS[modifier]
+    key_vks = {}
+    for key in keyboard.Key:
+        if key.value.vk is not None and key.value.vk not in modifier_vks:
+            key_vks[key.name] = [key.value.vk]
+    for char in string.ascii_lowercase + string.digits:
+        if sys.platform == "win32":
+            key_vks[char] = [ord(char.upper())] # VK_A.. and VK_0.. are the ASCII codes
+        elif sys.platform == "darwin":
+            if char in _MAC_VKS:
+                key_vks[char] = [_MAC_VKS[char]]
+        else:
+            key_vks[char] = [ord(char), ord(char.upper())] # X11 keysyms, with and without Shift
+    return modifier_vks, key_vks
+
+
+class ChordDetector:
+    """
+    State machine recognizing chords from key presses and releases.
+
+    The chords of all bindings form a trie: each state is a prefix of one or
+    more chords, and a transition is a key combination (key id and modifier
+    bits). A binding fires when its last combination is pressed no later than
+    window_ms after the previous one. Key auto-repeat does not count as a press.
+    """
+
+    def __init__(self, chords, window_ms, modifier_vks, key_vks):
+        """
+        Compiles the state machine.
+
+        Args:
+            chords: One chord per binding, as returned by parse_chord.
+            window_ms: Maximum time between two combinations of a chord.
+            modifier_vks: Virtual key code -> modifier bit.
+            key_vks: Key name -> virtual key codes.
+
+        Raises:
+            ValueError: If a key is unknown or two bindings have the same chord.
+        """
+        self.window_s = window_ms / 1000.0
+        self._modifier_vks = dict(modifier_vks)
+        self._key_ids = {} # vk -> key id
+        self._transitions = {} # (state, combination) -> state
+        self._accepting = {} # state -> binding index
+        self._bare_keys = False # True if a combination has no modifier (typing then needs a look-up)
+        key_id_by_name = {}
+        for index, chord in enumerate(chords):
+            state = 0
+            for modifiers, key_name in chord:
+                if key_name not in key_vks:
+                    raise ValueError(f"Unknown key '{key_name}'")
+                key_id = key_id_by_name.setdefault(key_name, len(key_id_by_name) + 1)
+                for vk in key_vks[key_name]:
+                    self._key_ids[vk] = key_id
+                self._bare_keys = self._bare_keys or not modifiers
+                combination = key_id << 4 | modifiers
+                next_state = self._transitions.get((state, combination))
+                if next_state is None:
+                    next_state = self._transitions[(state, combination)] = len(self._transitions) + 1
+                state = next_state
+            if state in self._accepting:
+                raise ValueError(f"Chord of binding {index} is already bound")
+            self._accepting[state] = index
+        self._modifiers = 0
+        self._state = 0
+        self._last_time = 0.0
+        self._down = set() # Key ids held down, to ignore auto-repeat
+
+    def press(self, vk, now):
+        """
+        Processes a key press.
+
+        Args:
+            vk: The virtual key code.
+            now: The time of the event in seconds (time.monotonic()).
+
+        Returns:
+            int: The index of the binding whose chord is complete, else None.
+        """
+        bit = self._modifier_vks.get(vk)
+        if bit is not None:
+            self._modifiers |= bit
+            return None
+        if not self._modifiers and not self._bare_keys:
+            self._state = 0 # Fast path: plain typing, which also breaks a started chord
+            return None
+        key_id = self._key_ids.get(vk)
+        if key_id is None:
+            self._state = 0 # Another combination breaks the chord
+            return None
+        if key_id in self._down:
+            return None # Auto-repeat
+        self._down.add(key_id)
+        combination = key_id << 4 | self._modifiers
+        state = self._state if now - self._last_time <= self.window_s else 0
+        next_state = self._transitions.get((state, combination))
+        if next_state is None and state:
+            next_state = self._transitions.get((0, combination)) # Maybe the start of a new chord
+        self._last_time = now
+        if next_state is None:
+            self._state = 0
+            return None
+        binding = self._accepting.get(next_state)
+        self._state = 0 if binding is not None else next_state
+        return binding
+
+    def release(self, vk):
+        """Processes a key release."""
+        bit = self._modifier_vks.get(vk)
+        if bit is not None:
+            self._modifiers &= ~bit
+        elif self._down:
+            self._down.discard(self._key_ids.get(vk))
+
+
 class HotkeyManager:
     """
-    Manages the global hotkey listener for double Ctrl+C presses.
+    Manages the global hotkey listener.
+
+    Each binding maps a chord to a prompt label; the default binding is a
+    double Ctrl+C running the default prompt.
     """
-    def __init__(self, callback, window_ms=400):
+
+    def __init__(self, callback, bindings=None, window_ms=400, key_codes=None):
+        """
+        Initializes the HotkeyManager.
+
+        Args:
+            callback: Called with the binding's prompt label (None for the default prompt)
+                      on the listener thread when a chord is detected.
+            bindings: List of {"chord", "prompt"} dicts (see parse_chord); invalid ones are skipped.
+            window_ms: Maximum time between two combinations of a chord.
+            key_codes: (modifier_vks, key_vks) overriding platform_key_codes(), e.g. for benchmarks.
+        """
         self.callback = callback
-        self.window_s = window_ms / 1000.0
-        self._last_press_time = 0
-        self._ctrl_pressed = False
-        self._c_pressed = False
+        modifier_vks, key_vks = key_codes or platform_key_codes()
+        self.bindings = []
+        chords = []
+        for binding in bindings or DEFAULT_HOTKEYS:
+            try:
+                chord = parse_chord(binding.get("chord", ""))
+                ChordDetector([chord], window_ms, modifier_vks, key_vks) # Validates the keys
+            except ValueError as e:
+                print(f"Ignoring hotkey '{binding.get('chord')}': {e}")
+                continue
+            if chord in chords:
+                print(f"Ignoring hotkey '{binding.get('chord')}': the chord is already bound")
+                continue
+            chords.append(chord)
+            self.bindings.append(binding)
+        if not chords:
+            print("No valid hotkey. Using the default double Ctrl+C.")
+            self.bindings = list(DEFAULT_HOTKEYS)
+            chords = [parse_chord(binding["chord"]) for binding in self.bindings]
+        self._detector = ChordDetector(chords, window_ms, modifier_vks, key_vks)
+        self._modifier_vks = modifier_vks
+        self._key_vks = key_vks
+        self._simulated = [] # Announced simulated keys not released yet: [virtual key codes, pressed]
+        self._simulated_until = 0.0
+        self._simulated_lock = threading.Lock()
         self._listener = None
-        self._running = False # Renamed from _running to reflect manager state
+        self._running = False
 
-    def _on_press(self, key):
-        try:
-            # Update state of individual keys (useful for other combinations or future features)
-            if key == keyboard.Key.ctrl_l or key == keyboard.Key.ctrl_r:
-                self._ctrl_pressed = True
-            elif hasattr(key, 'char') and key.char == '\x03': # Check for Ctrl+C character
-                self._c_pressed = True
-            # print(f"Key pressed: {key}")  # Debugging output
-            # Check for the specific Ctrl+C combination event
-            # Check for Ctrl+C combination using individual key states
-            if self._ctrl_pressed and self._c_pressed:
-                # print("Ctrl+C detected")  # Debugging output
-                current_time = time.time()
-                if current_time - self._last_press_time < self.window_s:
-                    # Double press detected, call the callback
-                    if self._running: # Ensure callback is only called if listener is running
-                        self.callback()
-                    self._last_press_time = 0 # Reset to prevent triple/quadruple presses
-                else:
-                    self._last_press_time = current_time
+    def expect_simulated_keys(self, *key_names):
+        """
+        Announces a key combination about to be simulated (e.g. ClipboardManager's Ctrl+C).
+
+        The next press of each key within _SIMULATED_KEYS_WINDOW_S, and the release
+        that follows it, are ignored, so our own keys neither advance a chord nor
+        clear a modifier the user still holds. pynput's injected flag only identifies
+        them on Windows and macOS: on X11, keys sent through XTest arrive like
+        physical ones.
 
+        Args:
+            key_names: Modifier names ("ctrl") and key names ("c").
+        """
+        expected = []
+        for key_name in key_names:
+            if key_name in MODIFIER_BITS:
+                vks = frozenset(vk for vk, bit in self._modifier_vks.items() if bit == MODIFIER_BITS[key_name])
+            else:
+                vks = frozenset(self._key_vks.get(key_name, ()))
+            expected.append([vks, False])
+        with self._simulated_lock:
+            self._simulated = expected
+            self._simulated_until = time.monotonic() + _SIMULATED_KEYS_WINDOW_S
+
+    def _consume_simulated(self, vk, pressed):
+        """Returns True if the key event is an announced simulated one (which is then no longer expected)."""
+        if not self._simulated:
+            return False # Fast path: nothing announced
+        with self._simulated_lock:
+            if time.monotonic() > self._simulated_until:
+                self._simulated = []
+                return False
+            for i, (vks, simulated_pressed) in enumerate(self._simulated):
+                # A release only matches once the simulated press was seen: an earlier one is the user's
+                if vk in vks and simulated_pressed != pressed:
+                    if pressed:
+                        self._simulated[i][1] = True
+                    else:
+                        del self._simulated[i]
+                    return True
+        return False
+
+    def _on_press(self, key, injected=False):
+        try:
+            # Special keys arrive as Key members, whose value holds the virtual key code
+            vk = key.vk if key.__class__ is keyboard.KeyCode else key.value.vk
+            if self._consume_simulated(vk, True) or injected:
+                return # Our own simulated Ctrl+C (see ClipboardManager) must not move the chord state
+            binding = self._detector.press(vk, time.monotonic())
+            if binding is not None and self._running: # Ensure callback is only called if listener is running
+                self.callback(self.bindings[binding].get("prompt") or None)
         except Exception as e:
             # Log any exception to prevent the listener thread from crashing silently
             print(f"Error in hotkey listener on_press: {e}")
 
-    def _on_release(self, key):
+    def _on_release(self, key, injected=False):
         try:
-            if key == keyboard.Key.ctrl_l or key == keyboard.Key.ctrl_r:
-                self._ctrl_pressed = False
-                self._c_pressed = False
-            elif key.char == 'c':
-                self._c_pressed = False
-        except AttributeError:
-            # Ignore special keys other than Ctrl
-            pass
+            vk = key.vk if key.__class__ is keyboard.KeyCode else key.value.vk
+            if self._consume_simulated(vk, False) or injected:
+                return # A simulated Ctrl release would clear Ctrl while the user still holds it
+            self._detector.release(vk)
+        except Exception as e:
+            print(f"Error in hotkey listener on_release: {e}")
 
     def start(self):
         """Starts the keyboard listener in a separate daemon thread."""
@@ -60,7 +314,7 @@ class HotkeyManager:
             self._listener.daemon = True # Allow the program to exit even if the listener is still running
             self._listener.start()
             self._running = True
-            print("Hotkey listener started.")
+            print(f"Hotkey listener started: {', '.join(binding['chord'] for binding in self.bindings)}.")
 
     def stop(self):
         """Stops the keyboard listener."""
@@ -76,10 +330,10 @@ class HotkeyManager:
 
 if __name__ == '__main__':
     # Example Usage:
-    def my_callback():
-        print("Ctrl+C double-press detected!")
+    def my_callback(prompt_label):
+        print(f"Hotkey detected! Prompt: {prompt_label or 'default'}")
 
-    print("Listening for double Ctrl+C press (within 400ms)... Press Esc to exit.")
+    print("Listening for double Ctrl+C press (within 400ms)... Press Ctrl+C in this console to exit.")
     hotkey_manager = HotkeyManager(my_callback)
     hotkey_manager.start()
 
@@ -91,4 +345,4 @@ if __name__ == '__main__':
         pass
     finally:
         hotkey_manager.stop()
-        print("Listener stopped.")
\ No newline at end of file
+        print("Listener stopped.")
@@ -0,0 +1,93 @@
+# pylint: disable=broad-except
+
+"""Trims Lexi's memory footprint while the window sits hidden in the system tray."""
+
+import ctypes
+import ctypes.util
+import gc
+import sys
+from metrics import metrics, get_rss_bytes
+
+# A trim postponed by a request in flight is retried after this delay (while the window stays hidden)
+_BUSY_RETRY_MS = 30 * 1000
+
+
+class IdleManager:
+    """
+    Applies the idle policy: after the window has been hidden for a while, the
+    rendered document is unloaded, session state is moved to disk and a GC runs.
+    The state is rehydrated when the window is shown again.
+    """
+
+    def __init__(self, root, app_logic, ui_manager, idle_minutes):
+        """
+        Initializes the IdleManager.
+
+        Args:
+            root: The root Tkinter window (the App instance).
+            app_logic: The AppLogic instance owning the session state.
+            ui_manager: The UIManager instance owning the output widget.
+            idle_minutes: Minutes the window must stay hidden before trimming (0 disables trimming).
+        """
+        self.root = root
+        self.app_logic = app_logic
+        self.ui_manager = ui_manager
+        self.idle_ms = int(idle_minutes * 60 * 1000)
+        self._timer_id = None
+        self._trimmed = False
+        self._trim_callbacks = []
+
+    def register_trim_callback(self, callback):
+        """Registers a callable invoked on trim to release an in-memory cache."""
+        self._trim_callbacks.append(callback)
+
+    def on_visibility_changed(self, visible):
+        """TrayManager visibility listener: arms the idle timer on hide, rehydrates on show."""
+        if self._timer_id is not None:
+            self.root.after_cancel(self._timer_id)
+            self._timer_id = None
+        if visible:
+            if self._trimmed:
+                self._trimmed = False
+                # Deferred so a capture that is about to replace the output skips the restore
+                self.root.after_idle(self._restore)
+        elif self.idle_ms > 0 and not self._trimmed:
+            self._timer_id = self.root.after(self.idle_ms, self._trim)
+
+    def _restore(self):
+        """Re-renders the offloaded response, or re-warms the renderer if there is none to show."""
+        if not self.app_logic.rehydrate_session():
+            self.app_logic.warm_up_renderer("restore")
+
+    def _trim(self):
+        """Unloads the rendered document, drops caches and returns memory to the OS."""
+        self._timer_id = None
+        rss_before = get_rss_bytes()
+
+        if not self.app_logic.offload_session():
+            print(f"Idle trim postponed by {_BUSY_RETRY_MS // 1000} s: a request is in flight.")
+            self._timer_id = self.root.after(_BUSY_RETRY_MS, self._trim)
+            return
+        self.ui_manager.unload_output()
+        for callback in self._trim_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in idle trim callback {callback}: {e}")
+        collected = gc.collect()
+        self._release_free_heap()
+        self._trimmed = True
+
+        rss_after = get_rss_bytes()
+        metrics.record("idle_trim", rss_before=rss_before, rss_after=rss_after, gc_collected=collected)
+
+    @staticmethod
+    def _release_free_heap():
+        """Asks glibc to return freed heap pages to the OS (no-op elsewhere)."""
+        if not sys.platform.startswith('linux'):
+            return
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"))
+            libc.malloc_trim(0)
+        except Exception as e:
+            print(f"malloc_trim unavailable: {e}")
@@ -0,0 +1,179 @@
+# pylint: disable=broad-except
+
+"""Single-instance enforcement: later launches forward their text to the running Lexi."""
+
+import getpass
+import json
+import os
+import secrets
+import stat
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+_AUTHKEY_BYTES = 32
+_MAX_MESSAGE_BYTES = 64 * 1024 * 1024 # Large inputs are forwarded whole
+# How long to wait for a key another launch has just created but not written yet
+_AUTHKEY_WAIT_SECONDS = 1.0
+
+
+def _private_directory():
+    """
+    Returns a directory only the current user can access, creating it if needed.
+
+    On Linux this is $XDG_RUNTIME_DIR (0700 by specification); otherwise a 0700
+    directory in the temporary directory, or the user's local application data
+    directory on Windows.
+
+    Raises:
+        OSError: If the directory is owned by another user or open to other users.
+    """
+    if sys.platform == 'win32':
+        directory = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "Lexi")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+    directory = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"lexi-{getpass.getuser()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    status = os.lstat(directory)
+    # Another local user could have created the directory first to intercept the socket
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or status.st_mode & 0o077:
+        raise OSError(f"{directory} is not a private directory of the current user")
+    return directory
+
+
+def default_address():
+    """Returns the per-user IPC address: a named pipe on Windows, a Unix domain socket in a private directory elsewhere."""
+    if sys.platform == 'win32':
+        return rf"\\.\pipe\lexi-{getpass.getuser()}"
+    return os.path.join(_private_directory(), "lexi.sock")
+
+
+def _load_authkey():
+    """
+    Returns the per-user secret authenticating both ends of the connection, creating it on first use.
+
+    It is stored readable only by the current user, so other local processes can
+    neither send requests nor pose as the running instance. A launch racing the one
+    that creates the file waits briefly for the key to be written.
+    """
+    path = os.path.join(_private_directory(), "lexi-instance.key")
+    try:
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        deadline = time.monotonic() + _AUTHKEY_WAIT_SECONDS
+        while True:
+            with open(path, "rb") as key_file:
+                authkey = key_file.read()
+            if len(authkey) == _AUTHKEY_BYTES:
+                return authkey
+            if len(authkey) > _AUTHKEY_BYTES or time.monotonic() > deadline:
+                raise OSError(f"{path} is not a valid instance key") from None
+            time.sleep(0.01) # Created by a concurrent launch that has not written it yet
+    authkey = secrets.token_bytes(_AUTHKEY_BYTES)
+    with os.fdopen(descriptor, "wb") as key_file:
+        key_file.write(authkey)
+    return authkey
+
+
+class InstanceManager:
+    """Forwards requests to a running Lexi instance, or serves them when this is the running instance."""
+
+    def __init__(self, address=None):
+        """
+        Initializes the InstanceManager.
+
+        Args:
+            address: The IPC address (defaults to default_address()).
+
+        Raises:
+            OSError: If no private directory for the socket and key can be set up.
+        """
+        self.address = address or default_address()
+        self._authkey = _load_authkey()
+        self._listener = None
+        self._thread = None
+
+    def forward_to_running_instance(self, message):
+        """
+        Sends a message to the running instance.
+
+        Args:
+            message (dict): {"text": str, "prompt": optional prompt label}.
+
+        Returns:
+            bool: True if a running instance received the message.
+        """
+        try:
+            connection = Client(self.address, authkey=self._authkey)
+        except (FileNotFoundError, ConnectionRefusedError, OSError):
+            return False # No running instance (or a stale socket left by a crash)
+        except AuthenticationError as e:
+            print(f"The process listening on {self.address} failed authentication: {e}")
+            return False
+        try:
+            connection.send_bytes(json.dumps(message).encode("utf-8"))
+            return True
+        except Exception as e:
+            print(f"Error forwarding to the running instance: {e}")
+            return False
+        finally:
+            connection.close()
+
+    def start_server(self, on_message):
+        """
+        Starts accepting messages from later launches in a daemon thread.
+
+        Args:
+            on_message: Callable receiving each message dict (called on the listener thread).
+                        An empty "text" means a bare launch that only wants the window shown.
+        """
+        if sys.platform != 'win32' and os.path.exists(self.address):
+            os.remove(self.address) # Stale socket: forward_to_running_instance() found nobody listening
+        # The socket is created without group or other permissions, so there is no window before a chmod
+        previous_umask = os.umask(0o177) if sys.platform != 'win32' else None
+        try:
+            self._listener = Listener(self.address, authkey=self._authkey)
+        except Exception as e:
+            print(f"Could not start single-instance listener on {self.address}: {e}")
+            return
+        finally:
+            if previous_umask is not None:
+                os.umask(previous_umask)
+        self._thread = threading.Thread(target=self._serve, args=(on_message,), daemon=True)
+        self._thread.start()
+        print(f"Single-instance listener started on {self.address}")
+
+    def _serve(self, on_message):
+        """Accepts connections until the listener is closed."""
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                break # Listener closed
+            except Exception as e:
+                print(f"Rejected single-instance connection: {e}")
+                continue
+            try:
+                # JSON, not pickle: a forwarded request is data and must never run code
+                message = json.loads(connection.recv_bytes(_MAX_MESSAGE_BYTES).decode("utf-8"))
+                if isinstance(message, dict) and isinstance(message.get("text", ""), str) and isinstance(message.get("prompt") or "", str):
+                    on_message(message)
+                else:
+                    print("Ignoring malformed forwarded request.")
+            except Exception as e:
+                print(f"Error receiving forwarded request: {e}")
+            finally:
+                connection.close()
+
+    def stop(self):
+        """Stops the listener and removes the socket file."""
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+            print("Single-instance listener stopped.")
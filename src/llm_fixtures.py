@@ -0,0 +1,147 @@
+# pylint: disable=line-too-long
+# pylint: disable=broad-except
+
+"""
+Record/replay of LLM traffic.
+
+With LEXI_RECORD_LLM=<file> every call made through gemini_client is appended
+to a JSON lines fixtures file: the request (model, prompt, generation settings,
+schema), the response and its chunks, timings and token usage. With
+LEXI_REPLAY_LLM=<file> calls are answered from such a file without network
+access, so a session or an evaluation can be reproduced exactly.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import gemini_client
+
+RECORD_ENV_VAR = "LEXI_RECORD_LLM"
+REPLAY_ENV_VAR = "LEXI_REPLAY_LLM"
+# Set to 1 to replay with the recorded latencies instead of instantly
+REPLAY_TIMING_ENV_VAR = "LEXI_REPLAY_TIMING"
+
+
+def fixture_key(call):
+    """Returns the key identifying a request: a hash of its model, prompt, generation settings and schema."""
+    request = [call["model"], call["prompt"], call.get("generation_settings") or {}, call.get("response_schema")]
+    return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class FixtureRecorder:
+    """Appends every LLM call to a JSON lines fixtures file."""
+
+    def __init__(self, path):
+        """
+        Initializes the FixtureRecorder.
+
+        Args:
+            path: The fixtures file (created if missing, appended to otherwise).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def record(self, call):
+        """Appends one call record (a gemini_client call observer). Abandoned calls have no response to replay."""
+        if call.get("cancelled"):
+            return
+        entry = dict(call, key=fixture_key(call), recorded_at=datetime.now().isoformat(timespec="seconds"))
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class ReplayProvider:
+    """
+    Answers LLM calls from a fixtures file.
+
+    Requests recorded several times are answered with their recordings in turn,
+    cycling, so repeated runs see the same sequence. A request that was never
+    recorded gets an error response rather than a network call.
+    """
+
+    def __init__(self, path, replay_timing=False):
+        """
+        Initializes the ReplayProvider.
+
+        Args:
+            path: A fixtures file written by FixtureRecorder.
+            replay_timing: Wait for the recorded latency before answering.
+        """
+        self.path = path
+        self.replay_timing = replay_timing
+        self._fixtures = {} # key -> list of recorded calls
+        self._next_index = {} # key -> index of the recording served next
+        self._lock = threading.Lock()
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Skipping invalid fixture at {path}:{line_number}: {e}")
+                    continue
+                self._fixtures.setdefault(entry.get("key") or fixture_key(entry), []).append(entry)
+        print(f"Replaying {sum(len(entries) for entries in self._fixtures.values())} recorded LLM calls from {path}")
+
+    def lookup(self, call):
+        """Returns the next recording for a request, or None if it was never recorded."""
+        key = fixture_key(call)
+        with self._lock:
+            entries = self._fixtures.get(key)
+            if not entries:
+                return None
+            index = self._next_index.get(key, 0)
+            self._next_index[key] = (index + 1) % len(entries)
+            return entries[index]
+
+    async def replay(self, call):
+        """
+        Returns the call record answering a request.
+
+        Args:
+            call: The request part of a call record (model, prompt, generation_settings, response_schema).
+
+        Returns:
+            dict: A complete call record; "error" is set if the request was never recorded.
+        """
+        entry = self.lookup(call)
+        if entry is None:
+            return dict(call, response=None, chunks=None, ttfb_ms=None, total_ms=0.0, usage={},
+                        error=f"Error: No recorded response for this request in {self.path}", quota_exceeded=False, cancelled=False)
+        if self.replay_timing and entry.get("total_ms"):
+            await asyncio.sleep(entry["total_ms"] / 1000)
+        return dict(call, response=entry.get("response"), chunks=entry.get("chunks"), ttfb_ms=entry.get("ttfb_ms"),
+                    total_ms=entry.get("total_ms"), usage=entry.get("usage") or {}, error=entry.get("error"),
+                    quota_exceeded=bool(entry.get("quota_exceeded")), cancelled=False)
+
+
+def configure(record_path=None, replay_path=None, replay_timing=False):
+    """
+    Enables recording and/or replay of LLM calls.
+
+    Args:
+        record_path: Fixtures file to append calls to.
+        replay_path: Fixtures file to answer calls from.
+        replay_timing: Replay with the recorded latencies.
+    """
+    if replay_path:
+        gemini_client.set_replay_provider(ReplayProvider(replay_path, replay_timing))
+    if record_path:
+        gemini_client.add_call_observer(FixtureRecorder(record_path).record)
+        print(f"Recording LLM calls to {record_path}")
+
+
+def configure_from_environment():
+    """Enables recording and/or replay from the LEXI_RECORD_LLM and LEXI_REPLAY_LLM environment variables."""
+    configure(os.environ.get(RECORD_ENV_VAR) or None, os.environ.get(REPLAY_ENV_VAR) or None,
+              os.environ.get(REPLAY_TIMING_ENV_VAR, "") not in ("", "0"))
@@ -0,0 +1,430 @@
+# pylint: disable=broad-except
+
+"""Request layer: runs LLM calls on a shared asyncio loop and coalesces identical in-flight requests."""
+
+import asyncio
+import json
+import threading
+import time
+from gemini_client import get_llm_response, stream_llm_response, error_message, is_error, ErrorResponse, request_label
+from request_scheduler import RequestScheduler, RequestPreempted, PRIORITIES
+from hedging import HedgePolicy
+from metrics import metrics
+
+# A routed request tries at most this many models before giving up
+MAX_ROUTED_ATTEMPTS = 2
+
+
+class QuotaRefusal(ErrorResponse):
+    """An interactive request refused locally by the quota; the model itself did not fail."""
+
+
+class _Flight:
+    """One underlying LLM call shared by every subscriber of an identical request."""
+
+    def __init__(self):
+        self.task = None
+        self.text = "" # Text streamed so far
+        self.chunk_callbacks = []
+        self.subscribers = 0
+        self.call_ms = None # Duration of the call itself, without the time queued for a slot
+        self.model = None # The model that answered (a hedge may answer on the fallback model)
+        self.started = None # Monotonic start of the answering attempt
+
+
+class _HedgeRace:
+    """State shared by the attempts of a hedged call: the first attempt to stream a chunk leads."""
+
+    def __init__(self):
+        self.tasks = [] # Attempt tasks, indexed by attempt number
+        self.leader = None
+        self.first_byte = asyncio.Event()
+
+    def claim(self, attempt):
+        """Returns True if the attempt may broadcast its chunks; the first caller becomes the leader."""
+        if self.leader is None:
+            self.leader = attempt
+            self.first_byte.set()
+            for i, task in enumerate(self.tasks):
+                if i != attempt:
+                    task.cancel() # The other attempt lost the race
+        return self.leader == attempt
+
+
+class LLMService:
+    """
+    Runs all LLM requests on one background asyncio event loop.
+
+    Identical concurrent requests (same API key, model, prompt and generation
+    config) share a single underlying call: every caller receives the result of
+    that call ("single flight"). The call is cancelled once every subscriber
+    has cancelled. Calls are admitted by a RequestScheduler, so interactive
+    requests run ahead of queued prefetch and batch work. With hedging enabled,
+    a call whose first byte is late gets a duplicate and the first to answer wins.
+    With a UsageTracker, new calls are paced or refused near the quota limits.
+    """
+
+    def __init__(self, max_concurrency=2, hedging_config=None, usage_tracker=None):
+        """
+        Initializes the LLMService. Call start() before submitting requests.
+
+        Args:
+            max_concurrency: Maximum number of LLM calls running at once.
+            hedging_config (dict, optional): The "hedging" settings (see HedgePolicy).
+            usage_tracker: Optional UsageTracker deciding the admission of new calls.
+        """
+        self._loop = None
+        self._thread = None
+        self._in_flight = {} # request key -> _Flight, only accessed on the loop thread
+        self.scheduler = RequestScheduler(max_concurrency)
+        self.hedge_policy = HedgePolicy(hedging_config)
+        self.usage_tracker = usage_tracker
+
+    def start(self, loop=None):
+        """
+        Starts the service.
+
+        Args:
+            loop: An event loop run by the caller (e.g. the headless API server).
+                  If omitted, the service runs its own loop in a daemon thread.
+        """
+        if self._loop is not None:
+            return
+        if loop is not None:
+            self._loop = loop
+            print("LLM service attached to the running event loop.")
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="LLMService", daemon=True)
+        self._thread.start()
+        print("LLM service started.")
+
+    def stop(self):
+        """Stops the event loop (only if the service owns it)."""
+        if self._loop is None:
+            return
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=2)
+            self._thread = None
+        self._loop = None
+        print("LLM service stopped.")
+
+    @staticmethod
+    def _request_key(api_key, model_name, prompt, generation_settings, response_schema):
+        """Builds the key identifying byte-identical requests."""
+        return (
+            api_key,
+            model_name,
+            prompt,
+            json.dumps(generation_settings or {}, sort_keys=True),
+            json.dumps(response_schema, sort_keys=True),
+        )
+
+    async def _admit_flight(self, flight, api_key, model_name, prompt, generation_settings, response_schema, stream, priority):
+        """
+        Waits for the quota, then runs the flight in a scheduler slot.
+
+        Part of the flight task, so identical requests joining during the quota wait
+        share one admission.
+        """
+        refusal = await self._throttle(model_name, priority)
+        if refusal is not None:
+            return refusal
+        return await self.scheduler.run(priority, lambda: self._run_flight(
+            flight, api_key, model_name, prompt, generation_settings, response_schema, stream, priority))
+
+    async def _run_flight(self, flight, api_key, model_name, prompt, generation_settings, response_schema, stream, priority):
+        """Performs the underlying call (hedged if enabled), broadcasting streamed text to the subscribers."""
+        flight.model, flight.started = model_name, time.monotonic()
+        try:
+            if not self.hedge_policy.enabled:
+                return await self._run_attempt(flight, None, 0, api_key, model_name, prompt, generation_settings, response_schema, stream)
+            return await self._run_hedged(flight, api_key, model_name, prompt, generation_settings, response_schema, stream, priority)
+        finally:
+            flight.call_ms = (time.monotonic() - flight.started) * 1000
+
+    async def _run_attempt(self, flight, race, attempt, api_key, model_name, prompt, generation_settings, response_schema, stream):
+        """Performs one call. In a hedge race, only the leading attempt broadcasts its chunks."""
+        start = time.monotonic()
+        if not stream:
+            response = await get_llm_response(api_key, model_name, prompt, generation_settings, response_schema)
+            if not is_error(response):
+                self.hedge_policy.record_ttfb((time.monotonic() - start) * 1000)
+            return response
+        text = ""
+        try:
+            async for chunk in stream_llm_response(api_key, model_name, prompt, generation_settings, response_schema):
+                if not text:
+                    self.hedge_policy.record_ttfb((time.monotonic() - start) * 1000)
+                if race is not None and not race.claim(attempt):
+                    return text # Another attempt streamed first; this one is being cancelled
+                text += chunk
+                flight.text = text
+                for callback in list(flight.chunk_callbacks):
+                    try:
+                        callback(flight.text)
+                    except Exception as e:
+                        print(f"Error in streaming callback: {e}")
+            return text
+        except Exception as e:
+            return error_message(e)
+
+    def _admit_hedge(self, model_name, priority):
+        """
+        Takes a scheduler slot for a hedged duplicate, if one is free and the quota admits another call now.
+
+        Returns:
+            bool: True if the duplicate may be sent; release the slot with scheduler.release() afterwards.
+        """
+        if not self.scheduler.try_acquire(priority):
+            return False
+        if not self.hedge_policy.try_hedge():
+            self.scheduler.release(priority)
+            return False # Hedge rate cap reached
+        if self.usage_tracker is not None:
+            wait_seconds, refusal = self.usage_tracker.admission(model_name, priority, may_wait=False)
+            if refusal is not None or wait_seconds > 0:
+                self.scheduler.release(priority)
+                return False
+        return True
+
+    async def _run_hedge_attempt(self, priority, *attempt_args):
+        """Runs the duplicate attempt of a hedge race in the slot taken by _admit_hedge()."""
+        try:
+            return await self._run_attempt(*attempt_args)
+        finally:
+            self.scheduler.release(priority)
+
+    async def _run_hedged(self, flight, api_key, model_name, prompt, generation_settings, response_schema, stream, priority):
+        """
+        Runs the call and, if its first byte is late, a duplicate on the same or the
+        fallback model. The first attempt to stream (or to answer without error) wins;
+        the other is cancelled.
+
+        The duplicate needs a scheduler slot of its own and quota admission, so
+        hedging never exceeds the concurrency limit or the per-minute pacing. The
+        flight's model and start are those of the attempt whose response is returned.
+        """
+        race = _HedgeRace()
+        race.tasks.append(asyncio.ensure_future(self._run_attempt(
+            flight, race, 0, api_key, model_name, prompt, generation_settings, response_schema, stream)))
+        first_byte = asyncio.ensure_future(race.first_byte.wait())
+        try:
+            await asyncio.wait({race.tasks[0], first_byte}, timeout=self.hedge_policy.delay_seconds(), return_when=asyncio.FIRST_COMPLETED)
+            if race.tasks[0].done() or race.first_byte.is_set():
+                self.hedge_policy.record_unhedged()
+                return await race.tasks[0]
+            hedge_model = self.hedge_policy.fallback_model or model_name
+            if not self._admit_hedge(hedge_model, priority):
+                return await race.tasks[0] # No free slot, rate cap reached or quota pacing
+            print(f"No first byte after {self.hedge_policy.delay_seconds():.1f} s. Hedging the request on {hedge_model}.")
+            attempts = [(model_name, flight.started), (hedge_model, time.monotonic())]
+            race.tasks.append(asyncio.ensure_future(self._run_hedge_attempt(
+                priority, flight, race, 1, api_key, hedge_model, prompt, generation_settings, response_schema, stream)))
+
+            response = None
+            pending = set(race.tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    attempt = race.tasks.index(task)
+                    response = task.result()
+                    flight.model, flight.started = attempts[attempt]
+                    if race.leader in (None, attempt) and not is_error(response):
+                        metrics.record("llm_hedge", winner="hedge" if attempt else "primary", model=hedge_model if attempt else model_name)
+                        return response
+            return response # Both attempts failed: the last error
+        finally:
+            first_byte.cancel()
+            for task in race.tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _throttle(self, model_name, priority):
+        """
+        Waits until the quota admits a new call.
+
+        Returns:
+            QuotaRefusal: The error message if an interactive call is refused, else None.
+
+        Raises:
+            request_scheduler.RequestPreempted: If a background call is refused.
+        """
+        if self.usage_tracker is None:
+            return None
+        wait_seconds, refusal = self.usage_tracker.admission(model_name, priority)
+        if refusal is not None:
+            metrics.record("llm_quota_refused", model=model_name, priority=priority)
+            if priority != "interactive":
+                raise RequestPreempted(refusal)
+            return QuotaRefusal(f"Error: {refusal}")
+        if wait_seconds > 0:
+            print(f"Approaching the rate limit of {model_name}. Waiting {wait_seconds:.1f} s.")
+            await asyncio.sleep(wait_seconds)
+        return None
+
+    async def request(self, api_key, model_name, prompt, generation_settings=None, response_schema=None, on_chunk=None, priority="interactive", label=None):
+        """
+        Returns the LLM response, joining an identical request that is already in flight.
+
+        Must be awaited on the service loop. The first five arguments are the
+        same as for gemini_client.get_llm_response.
+
+        Args:
+            on_chunk: Optional callable receiving the accumulated text each time a
+                      chunk arrives (called on the service thread). Passing it
+                      makes a new call stream its response.
+            priority: "interactive", "prefetch" or "batch". A call that is joined
+                      keeps the priority of the request that started it.
+            label: The prompt label the call's token usage is accounted to.
+
+        Raises:
+            request_scheduler.RequestPreempted: If a queued background call was dropped
+                or refused by the quota.
+        """
+        response, _, _ = await self._request_flight(api_key, model_name, prompt, generation_settings, response_schema, on_chunk, priority, label)
+        return response
+
+    async def _request_flight(self, api_key, model_name, prompt, generation_settings, response_schema, on_chunk, priority, label):
+        """
+        Implements request().
+
+        Returns:
+            tuple: (response, call_ms, model) where call_ms is the duration of the call
+            that answered (None if it never ran, e.g. refused by the quota) and model is
+            the model that answered it.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown request priority: {priority}")
+        key = self._request_key(api_key, model_name, prompt, generation_settings, response_schema)
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._in_flight[key] = flight
+            token = request_label.set(label or "") # Copied into the flight's task context
+            try:
+                # Joining a call in flight costs no quota; only new flights are throttled
+                flight.task = asyncio.ensure_future(self._admit_flight(
+                    flight, api_key, model_name, prompt, generation_settings, response_schema, on_chunk is not None, priority))
+            finally:
+                request_label.reset(token)
+            flight.task.add_done_callback(lambda _: self._forget_flight(key, flight))
+        else:
+            print("Identical request already in flight. Sharing its result.")
+
+        if on_chunk is not None:
+            flight.chunk_callbacks.append(on_chunk)
+            if flight.text:
+                on_chunk(flight.text)
+        flight.subscribers += 1
+        try:
+            # Shielded so one subscriber giving up does not cancel the call the others wait for
+            return await asyncio.shield(flight.task), flight.call_ms, flight.model
+        finally:
+            flight.subscribers -= 1
+            if on_chunk is not None:
+                flight.chunk_callbacks.remove(on_chunk)
+            if flight.subscribers == 0 and not flight.task.done():
+                print("All subscribers cancelled. Cancelling the request.")
+                self._forget_flight(key, flight) # New identical requests must not join a cancelled call
+                flight.task.cancel()
+
+    def _forget_flight(self, key, flight):
+        """Removes a finished flight from the single-flight table."""
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+
+    async def request_routed(self, router, label, input_length, models, api_key, prompt, generation_settings=None, response_schema=None, on_chunk=None, priority="interactive"):
+        """
+        Runs a request on the first of the ranked models, falling back to the next on an error.
+
+        Every attempt's latency and outcome is recorded in the router, under the model
+        that answered (a hedge may answer on the fallback model). The latency is the
+        call's own duration: time spent queued for a slot or waiting for the quota
+        says nothing about the model.
+
+        Args:
+            router: The ModelRouter that ranked the models.
+            label: The prompt label the statistics are kept for.
+            input_length: Length of the input text in characters.
+            models: Candidate models, best first (from ModelRouter.rank).
+            on_chunk: As for request(). If a model fails after streaming part of its
+                      answer, on_chunk("") resets the accumulated text before the next
+                      model streams, so subscribers never mix the text of two models.
+
+        Returns:
+            str: The first successful response, or the last error message.
+        """
+        attempts = models[:MAX_ROUTED_ATTEMPTS]
+        response = ""
+        streamed = False
+
+        def forward_chunk(text_so_far):
+            nonlocal streamed
+            streamed = True
+            on_chunk(text_so_far)
+
+        for i, model_name in enumerate(attempts):
+            if streamed:
+                on_chunk("") # The failed model's partial answer is discarded
+                streamed = False
+            response, call_ms, answered_by = await self._request_flight(api_key, model_name, prompt, generation_settings, response_schema,
+                                                           forward_chunk if on_chunk is not None else None, priority, label)
+            ok = not is_error(response)
+            if call_ms is not None and not isinstance(response, QuotaRefusal):
+                # A local quota refusal says nothing about the model's health
+                router.record(answered_by, label, input_length, call_ms, ok)
+            if ok:
+                return response
+            if i + 1 < len(attempts):
+                print(f"Model {model_name} failed ({response}). Falling back to {attempts[i + 1]}.")
+        return response
+
+    def submit_routed(self, router, label, input_length, models, api_key, prompt, generation_settings=None, response_schema=None, on_chunk=None, priority="interactive"):
+        """
+        Schedules request_routed from any thread.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the response text.
+        """
+        if self._loop is None:
+            raise RuntimeError("LLMService is not started")
+        return asyncio.run_coroutine_threadsafe(
+            self.request_routed(router, label, input_length, models, api_key, prompt, generation_settings, response_schema, on_chunk, priority), self._loop)
+
+    async def request_many(self, api_key, model_name, prompts, generation_settings=None, response_schema=None, priority="interactive", label=None):
+        """Runs several requests concurrently on the service loop. Returns the responses in order."""
+        return list(await asyncio.gather(*(
+            self.request(api_key, model_name, prompt, generation_settings, response_schema, priority=priority, label=label) for prompt in prompts)))
+
+    def submit_many(self, api_key, model_name, prompts, generation_settings=None, response_schema=None, priority="interactive", label=None):
+        """
+        Schedules request_many from any thread.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the list of response texts.
+            Cancelling it cancels every request of the batch.
+        """
+        if self._loop is None:
+            raise RuntimeError("LLMService is not started")
+        return asyncio.run_coroutine_threadsafe(
+            self.request_many(api_key, model_name, prompts, generation_settings, response_schema, priority, label), self._loop)
+
+    def submit(self, api_key, model_name, prompt, generation_settings=None, response_schema=None, on_chunk=None, priority="interactive", label=None):
+        """
+        Schedules a request from any thread.
+
+        Every caller gets its own future, so cancelling it only unsubscribes that
+        caller; identical requests still share one underlying call.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the response text. Done
+            callbacks run on the service thread.
+        """
+        if self._loop is None:
+            raise RuntimeError("LLMService is not started")
+        return asyncio.run_coroutine_threadsafe(
+            self.request(api_key, model_name, prompt, generation_settings, response_schema, on_chunk, priority, label), self._loop)
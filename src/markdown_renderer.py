@@ -1,22 +1,72 @@
+import copy
+import html
 import markdown
 import markdown_del_ins # Should be here to make pyinstaller able to collect all libraries needed
+from markdown.treeprocessors import Treeprocessor
 import re
+from profiler import profiled
 
-def render_markdown_to_html(markdown_text, css_content=""):
+MARKDOWN_EXTENSIONS = ['tables', 'extra', 'markdown_del_ins']
+_STASH_PLACEHOLDER_RE = re.compile(markdown.util.HTML_PLACEHOLDER % r'(\d+)')
+
+
+class _TreeCaptureProcessor(Treeprocessor):
+    """Keeps a copy of the final element tree so it can be rendered by other backends."""
+
+    def __init__(self, md):
+        super().__init__(md)
+        self.tree = None
+
+    def run(self, root):
+        self.tree = copy.deepcopy(root)
+        for element in self.tree.iter():
+            element.text = self._restore_stash(element.text)
+            element.tail = self._restore_stash(element.tail)
+
+    def _restore_stash(self, text):
+        """Replaces raw HTML placeholders: entities become characters, tags are dropped."""
+        if not text or markdown.util.STX not in text:
+            return text
+        def replace(match):
+            raw_html = str(self.md.htmlStash.rawHtmlBlocks[int(match.group(1))])
+            return "" if raw_html.lstrip().startswith("<") else html.unescape(raw_html)
+        return _STASH_PLACEHOLDER_RE.sub(replace, text)
+
+
+@profiled("parse_markdown")
+def parse_markdown(markdown_text):
     """
-    Converts Markdown text to HTML and includes custom CSS.
+    Parses Markdown once and returns both the element tree and the HTML body.
+
+    Both results come from the same parse, so a native renderer showing the tree
+    and "Copy with Formatting" using the HTML always agree.
 
     Args:
         markdown_text: The input text in Markdown format.
-        css_content: A string containing custom CSS rules.
 
     Returns:
-        A string containing the full HTML document with rendered Markdown and embedded CSS.
+        A tuple (tree, html_body) where tree is the root xml.etree Element
+        produced by Python-Markdown and html_body is the serialized HTML.
     """
-    # Convert markdown to HTML
-    html_body = markdown.markdown(markdown_text, extensions=['tables', 'extra', 'markdown_del_ins'])
+    md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    capture = _TreeCaptureProcessor(md)
+    # Lowest priority: runs after inline patterns, prettify and unescape
+    md.treeprocessors.register(capture, 'tree_capture', -10)
+    html_body = md.convert(markdown_text)
+    return capture.tree, html_body
 
-    # Create a full HTML document structure
+
+def wrap_html_document(html_body, css_content=""):
+    """
+    Wraps an HTML body into a full HTML document with embedded CSS.
+
+    Args:
+        html_body: The rendered HTML body.
+        css_content: A string containing custom CSS rules.
+
+    Returns:
+        A string containing the full HTML document.
+    """
     html_template = f"""
     <!DOCTYPE html>
     <html>
@@ -34,6 +84,73 @@ def render_markdown_to_html(markdown_text, css_content=""):
     return html_template
 
 
+def render_markdown_to_html(markdown_text, css_content=""):
+    """
+    Converts Markdown text to HTML and includes custom CSS.
+
+    Args:
+        markdown_text: The input text in Markdown format.
+        css_content: A string containing custom CSS rules.
+
+    Returns:
+        A string containing the full HTML document with rendered Markdown and embedded CSS.
+    """
+    # Convert markdown to HTML
+    html_body = markdown.markdown(markdown_text, extensions=MARKDOWN_EXTENSIONS)
+
+    # Create a full HTML document structure
+    return wrap_html_document(html_body, css_content)
+
+
+# Response schema for prompts with "mode": "word_entry"
+WORD_ENTRY_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "ipa": {"type": "STRING"},
+        "translations": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "examples": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "source": {"type": "STRING"},
+                    "translation": {"type": "STRING"},
+                },
+                "required": ["source", "translation"],
+            },
+        },
+    },
+    "required": ["ipa", "translations", "examples"],
+}
+
+
+def render_word_entry_markdown(word, entry):
+    """
+    Renders a structured word lookup with the local word entry template.
+
+    Args:
+        word: The looked up word.
+        entry: A dict matching WORD_ENTRY_SCHEMA.
+
+    Returns:
+        A Markdown string.
+    """
+    lines = [f"**{word.strip()}**"]
+    ipa = entry.get("ipa", "").strip().strip("/[]")
+    if ipa:
+        lines[0] += f" /{ipa}/"
+    translations = [t for t in entry.get("translations", []) if t]
+    if translations:
+        lines.append("")
+        lines.append("- Translations: " + ", ".join(f"`{t}`" for t in translations))
+    examples = [e for e in entry.get("examples", []) if e.get("source")]
+    if examples:
+        lines.append("- Examples:")
+        for example in examples:
+            lines.append(f"    - {example['source']} → {example.get('translation', '')}")
+    return "\n".join(lines)
+
+
 def _markdown_to_plain_text(markdown_text):
     """Converts a basic subset of Markdown to plain text."""
     # This is a simple conversion and might not handle all Markdown complexities.
@@ -0,0 +1,139 @@
+# pylint: disable=broad-except
+
+"""Lightweight in-process metrics recorder for Lexi."""
+
+import atexit
+import collections
+import ctypes
+import json
+import os
+import sys
+import threading
+import time
+
+
+def get_rss_bytes():
+    """
+    Returns the resident set size of the current process in bytes.
+
+    Only Linux and Windows report the current RSS cheaply; elsewhere (e.g. macOS,
+    where getrusage only gives the peak) None is returned rather than a value that
+    cannot be compared before and after a trim.
+
+    Returns:
+        int or None: The RSS, or None if it cannot be determined on this platform.
+    """
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/statm', 'r', encoding='utf-8') as f:
+                resident_pages = int(f.read().split()[1])
+            return resident_pages * os.sysconf('SC_PAGE_SIZE')
+        if sys.platform == 'win32':
+            class ProcessMemoryCounters(ctypes.Structure):
+                _fields_ = [
+                    ("cb", ctypes.c_ulong),
+                    ("PageFaultCount", ctypes.c_ulong),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+            counters = ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+        return None
+    except Exception as e:
+        print(f"Could not determine RSS: {e}")
+        return None
+
+
+class MetricsRecorder:
+    """
+    Keeps recent metric events in memory and optionally appends them to a JSON lines file.
+
+    Recording only appends to memory, so it is cheap enough for the event loop and
+    the Tk thread; a background thread writes the buffered events to the file.
+    """
+
+    def __init__(self, max_events=1000, flush_interval_s=2.0, flush_events=200):
+        """
+        Initializes the MetricsRecorder.
+
+        Args:
+            max_events: How many recent events to keep in memory.
+            flush_interval_s: Longest time an event waits in the buffer before it is written.
+            flush_events: Buffered events that trigger an early write.
+        """
+        self._events = collections.deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._filepath = None
+        self.flush_interval_s = flush_interval_s
+        self.flush_events = flush_events
+        self._pending = [] # Events not yet written to the file
+        self._flush_requested = threading.Condition(self._lock)
+        self._write_lock = threading.Lock() # Keeps the events of two flushes in order
+        self._writer_thread = None
+
+    def set_output_file(self, filepath):
+        """Sets the JSON lines file events are appended to (None disables writing)."""
+        self.flush()
+        with self._lock:
+            self._filepath = filepath
+            if filepath and self._writer_thread is None:
+                self._writer_thread = threading.Thread(target=self._write_periodically, daemon=True)
+                self._writer_thread.start()
+                atexit.register(self.flush)
+
+    def _write_periodically(self):
+        """Writer thread: flushes the buffer every flush_interval_s, or earlier when it fills up."""
+        while True:
+            with self._flush_requested:
+                self._flush_requested.wait_for(lambda: len(self._pending) >= self.flush_events, timeout=self.flush_interval_s)
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered events to the output file."""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                filepath = self._filepath
+            if not pending or not filepath:
+                return
+            try:
+                os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+                with open(filepath, 'a', encoding='utf-8') as f:
+                    f.write("".join(json.dumps(event) + "\n" for event in pending))
+            except Exception as e:
+                print(f"Error writing metrics to {filepath}: {e}")
+
+    def record(self, name, **fields):
+        """
+        Records a metric event.
+
+        Args:
+            name: The event name, e.g. "idle_trim".
+            **fields: JSON-serializable values describing the event.
+        """
+        event = {"time": time.time(), "name": name}
+        event.update(fields)
+        with self._lock:
+            self._events.append(event)
+            if self._filepath:
+                self._pending.append(event)
+                if len(self._pending) >= self.flush_events:
+                    self._flush_requested.notify()
+
+    def get_events(self, name=None):
+        """Returns the recorded events, optionally filtered by name."""
+        with self._lock:
+            return [event for event in self._events if name is None or event["name"] == name]
+
+
+# Shared recorder used by all modules
+metrics = MetricsRecorder()
@@ -0,0 +1,124 @@
+"""Adaptive model routing: picks the fastest healthy model of sufficient quality from measured latency."""
+
+import random
+import threading
+import time
+from collections import deque
+
+PROVIDER = "gemini"
+# Input length buckets in characters: latency depends heavily on input size
+_SIZE_BUCKETS = (200, 1000, 4000)
+
+
+def size_bucket(input_length):
+    """Returns the index of the size bucket for an input length."""
+    for i, limit in enumerate(_SIZE_BUCKETS):
+        if input_length <= limit:
+            return i
+    return len(_SIZE_BUCKETS)
+
+
+class _RollingStats:
+    """Rolling latency and error statistics of one (provider, model, prompt, size bucket)."""
+
+    def __init__(self, window):
+        self.outcomes = deque(maxlen=window) # True for success
+        self.latency_ewma_ms = None
+
+    def record(self, latency_ms, ok, alpha):
+        self.outcomes.append(ok)
+        if ok:
+            # Exponentially weighted, so a model that starts slowing down loses its rank quickly
+            self.latency_ewma_ms = latency_ms if self.latency_ewma_ms is None else alpha * latency_ms + (1 - alpha) * self.latency_ewma_ms
+
+    @property
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class ModelRouter:
+    """
+    Ranks candidate models for a request.
+
+    Candidates are the models of the "model_router" settings whose quality tier
+    is at least the tier required by the prompt. Among healthy candidates the
+    one with the lowest recent latency for the prompt and input size wins; a
+    model whose error rate crosses the threshold is benched for a cooldown.
+    Models without measurements are explored occasionally.
+    """
+
+    def __init__(self, router_config):
+        """
+        Initializes the ModelRouter.
+
+        Args:
+            router_config (dict): The "model_router" settings: "enabled", "models"
+                (model name -> quality tier, higher is better), "explore_rate",
+                "error_rate_threshold" and "cooldown_seconds".
+        """
+        self.enabled = bool(router_config.get("enabled", False))
+        self.model_tiers = dict(router_config.get("models", {}))
+        self.explore_rate = router_config.get("explore_rate", 0.05)
+        self.error_rate_threshold = router_config.get("error_rate_threshold", 0.5)
+        self.cooldown_seconds = router_config.get("cooldown_seconds", 60)
+        self.window = 20
+        self.min_samples = 3
+        self.alpha = 0.3
+        self._stats = {} # (provider, model, label, size bucket) -> _RollingStats
+        self._benched_until = {} # model -> monotonic time
+        self._lock = threading.Lock()
+
+    def rank(self, label, input_length, default_model, quality_tier=None):
+        """
+        Returns the candidate models for a request, best first.
+
+        Args:
+            label: The prompt label.
+            input_length: Length of the input text in characters.
+            default_model: The model configured for the prompt (used when nothing is measured yet).
+            quality_tier: Minimum quality tier; defaults to the tier of default_model.
+
+        Returns:
+            list: Model names; the first is the one to use, the others are fallbacks.
+        """
+        if not self.enabled:
+            return [default_model]
+        if quality_tier is None:
+            quality_tier = self.model_tiers.get(default_model, 0)
+        candidates = [model for model, tier in self.model_tiers.items() if tier >= quality_tier]
+        if default_model not in candidates:
+            candidates.insert(0, default_model)
+        bucket = size_bucket(input_length)
+        now = time.monotonic()
+        with self._lock:
+            healthy = [model for model in candidates if self._benched_until.get(model, 0) <= now] or candidates
+            measured = {}
+            for model in healthy:
+                stats = self._stats.get((PROVIDER, model, label, bucket))
+                if stats is not None and stats.latency_ewma_ms is not None and len(stats.outcomes) >= self.min_samples:
+                    measured[model] = stats.latency_ewma_ms
+        unmeasured = [model for model in healthy if model not in measured]
+        if default_model in unmeasured:
+            ranked = [default_model] + sorted(measured, key=measured.get)
+        elif unmeasured and random.random() < self.explore_rate:
+            ranked = [random.choice(unmeasured)] + sorted(measured, key=measured.get)
+        else:
+            ranked = sorted(measured, key=measured.get)
+        ranked += [model for model in healthy if model not in ranked]
+        ranked += [model for model in candidates if model not in ranked] # Benched models as last resort
+        return ranked
+
+    def record(self, model, label, input_length, latency_ms, ok):
+        """Records the outcome of a call; benches the model if its error rate is too high."""
+        if not self.enabled:
+            return
+        key = (PROVIDER, model, label, size_bucket(input_length))
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _RollingStats(self.window)
+            stats.record(latency_ms, ok, self.alpha)
+            if not ok and len(stats.outcomes) >= self.min_samples and stats.error_rate >= self.error_rate_threshold:
+                print(f"Model {model} is failing ({stats.error_rate:.0%} errors). Benched for {self.cooldown_seconds} s.")
+                self._benched_until[model] = time.monotonic() + self.cooldown_seconds
+                stats.outcomes.clear() # Start afresh after the cooldown
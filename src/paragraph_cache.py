@@ -0,0 +1,94 @@
+"""Per-paragraph result cache, so re-running a prompt on an edited long text only resubmits changed paragraphs."""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+# Paragraphs are separated by blank lines; the separators are kept to rebuild the text unchanged
+_PARAGRAPH_SEPARATOR_RE = re.compile(r"(\n[ \t]*\n\s*)")
+
+
+def split_paragraphs(text):
+    """
+    Splits text into paragraphs.
+
+    Returns:
+        tuple: (paragraphs, separators) where separators[i] follows paragraphs[i].
+    """
+    parts = _PARAGRAPH_SEPARATOR_RE.split(text.strip())
+    return parts[0::2], parts[1::2]
+
+
+def join_paragraphs(paragraphs, separators):
+    """Rebuilds a text from paragraphs and the separators returned by split_paragraphs."""
+    parts = []
+    for i, paragraph in enumerate(paragraphs):
+        parts.append(paragraph)
+        if i < len(separators):
+            parts.append(separators[i])
+    return "".join(parts)
+
+
+def make_prompt_key(label, template, from_language, to_language, model_name, generation_settings):
+    """Builds the key of everything besides the paragraph text that determines a result."""
+    return (label, template, from_language, to_language, model_name, json.dumps(generation_settings or {}, sort_keys=True))
+
+
+class ParagraphCache:
+    """Session cache of paragraph results keyed by prompt and paragraph content hash (LRU, thread-safe)."""
+
+    def __init__(self, max_entries=512):
+        """
+        Initializes the ParagraphCache.
+
+        Args:
+            max_entries: Number of paragraph results kept before the least recently used are evicted.
+        """
+        self.max_entries = max_entries
+        self._results = OrderedDict() # (prompt key, paragraph hash) -> result
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(paragraph):
+        return hashlib.sha256(paragraph.encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt_key, paragraphs):
+        """Returns the cached result of each paragraph, or None for paragraphs not seen before."""
+        results = []
+        with self._lock:
+            for paragraph in paragraphs:
+                key = (prompt_key, self._hash(paragraph))
+                result = self._results.get(key)
+                if result is not None:
+                    self._results.move_to_end(key)
+                results.append(result)
+        return results
+
+    def put(self, prompt_key, paragraph, result):
+        """Stores the result of one paragraph."""
+        with self._lock:
+            self._results[(prompt_key, self._hash(paragraph))] = result
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def store_response(self, prompt_key, paragraphs, response):
+        """
+        Stores a whole-text response paragraph by paragraph.
+
+        Returns:
+            bool: False if the response does not have one paragraph per input paragraph,
+                  in which case nothing is cached.
+        """
+        result_paragraphs, _ = split_paragraphs(response)
+        if len(result_paragraphs) != len(paragraphs):
+            return False
+        for paragraph, result in zip(paragraphs, result_paragraphs):
+            self.put(prompt_key, paragraph, result)
+        return True
+
+    def clear(self):
+        """Drops all cached results."""
+        with self._lock:
+            self._results.clear()
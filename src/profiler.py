@@ -0,0 +1,203 @@
+# pylint: disable=broad-except
+
+"""
+Opt-in profiling of Lexi's hot paths.
+
+Enabled with the LEXI_PROFILE=1 environment variable or the tray menu. While
+enabled, functions decorated with @profiled are timed and run under cProfile,
+a sampler thread records the Tk thread's stacks (to find what freezes the UI),
+and tracemalloc traces allocations for on-demand snapshots. Reports go to a
+timestamped directory under profiles/.
+"""
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import traceback
+from collections import Counter
+from datetime import datetime
+
+PROFILE_ENV_VAR = "LEXI_PROFILE"
+SAMPLE_INTERVAL_SECONDS = 0.01
+
+
+class Profiler:
+    """Collects cProfile statistics, call timings and stack samples for the @profiled functions."""
+
+    def __init__(self, output_dir="profiles"):
+        """
+        Initializes the Profiler (disabled).
+
+        Args:
+            output_dir: Directory in which each report gets its own timestamped subdirectory.
+        """
+        self.output_dir = output_dir
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock() # cProfile can only profile one call at a time
+        self._local = threading.local()
+        self._stats = {} # name -> pstats.Stats
+        self._timings = {} # name -> {"calls", "total_ms", "max_ms"}
+        self._samples = Counter() # collapsed stack -> count
+        self._sampled_thread_id = None
+        self._sampler_thread = None
+        self._report_dir = None
+
+    def _get_report_dir(self):
+        """Returns the directory of the current profiling session, creating it on first use."""
+        if self._report_dir is None:
+            self._report_dir = os.path.join(self.output_dir, datetime.now().strftime("%Y%m%d-%H%M%S"))
+            os.makedirs(self._report_dir, exist_ok=True)
+        return self._report_dir
+
+    def enable(self, sampled_thread_id=None):
+        """
+        Starts profiling.
+
+        Args:
+            sampled_thread_id: Thread whose stacks are sampled (defaults to the calling thread,
+                               which should be the Tk thread).
+        """
+        if self.enabled:
+            return
+        self._sampled_thread_id = sampled_thread_id or threading.get_ident()
+        with self._lock:
+            # Each profiling session gets its own report
+            self._stats = {}
+            self._timings = {}
+            self._samples = Counter()
+            self._report_dir = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+        self.enabled = True
+        self._sampler_thread = threading.Thread(target=self._sample_stacks, name="ProfilerSampler", daemon=True)
+        self._sampler_thread.start()
+        print("Profiling enabled.")
+
+    def disable(self):
+        """Stops profiling and writes the report."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._sampler_thread.join(timeout=1)
+        self._sampler_thread = None
+        self.write_report()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        print("Profiling disabled.")
+
+    def toggle(self):
+        """Enables or disables profiling. Returns the new state."""
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def _sample_stacks(self):
+        """Records the sampled thread's stack every SAMPLE_INTERVAL_SECONDS (runs in the sampler thread)."""
+        while self.enabled:
+            frame = sys._current_frames().get(self._sampled_thread_id)
+            if frame is not None:
+                stack = ";".join(f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+                                 for entry in traceback.extract_stack(frame))
+                with self._lock:
+                    self._samples[stack] += 1
+            time.sleep(SAMPLE_INTERVAL_SECONDS)
+
+    def call(self, name, function, *args, **kwargs):
+        """Runs function, profiling it under the given name when profiling is enabled."""
+        if not self.enabled or getattr(self._local, "active", False):
+            return function(*args, **kwargs) # Disabled, or nested in a profiled call (counted there)
+        self._local.active = True
+        profile = cProfile.Profile() if self._profile_lock.acquire(blocking=False) else None
+        start = time.perf_counter()
+        try:
+            if profile is None:
+                return function(*args, **kwargs) # Another thread is being profiled: time only
+            return profile.runcall(function, *args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._local.active = False
+            if profile is not None:
+                self._profile_lock.release()
+            self._record(name, elapsed_ms, profile)
+
+    def _record(self, name, elapsed_ms, profile):
+        """Adds one call to the timings and cProfile statistics of name."""
+        with self._lock:
+            timing = self._timings.setdefault(name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            timing["calls"] += 1
+            timing["total_ms"] += elapsed_ms
+            timing["max_ms"] = max(timing["max_ms"], elapsed_ms)
+            if profile is not None:
+                if name in self._stats:
+                    self._stats[name].add(profile)
+                else:
+                    self._stats[name] = pstats.Stats(profile)
+
+    def write_report(self):
+        """
+        Writes the collected data: timings.json, one .prof and .txt file per hot path,
+        and the Tk thread's stack samples in collapsed (flame graph) format.
+
+        Returns:
+            str: The report directory.
+        """
+        report_dir = self._get_report_dir()
+        with self._lock:
+            with open(os.path.join(report_dir, "timings.json"), "w", encoding="utf-8") as f:
+                json.dump(self._timings, f, indent=2)
+            for name, stats in self._stats.items():
+                stats.dump_stats(os.path.join(report_dir, f"{name}.prof"))
+                text = io.StringIO()
+                stats.stream = text
+                stats.sort_stats("cumulative").print_stats(40)
+                with open(os.path.join(report_dir, f"{name}.txt"), "w", encoding="utf-8") as f:
+                    f.write(text.getvalue())
+            with open(os.path.join(report_dir, "tk_thread_samples.txt"), "w", encoding="utf-8") as f:
+                for stack, count in self._samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        print(f"Profiling report written to {report_dir}")
+        return report_dir
+
+    def take_memory_snapshot(self):
+        """
+        Writes a tracemalloc snapshot and its top allocation sites to the report directory.
+
+        Returns:
+            str: The snapshot file path, or None if allocations are not being traced.
+        """
+        if not tracemalloc.is_tracing():
+            print("Memory snapshot unavailable: enable profiling first.")
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        report_dir = self._get_report_dir()
+        base_name = os.path.join(report_dir, f"memory-{datetime.now().strftime('%H%M%S')}")
+        snapshot.dump(base_name + ".snapshot")
+        with open(base_name + ".txt", "w", encoding="utf-8") as f:
+            for statistic in snapshot.statistics("lineno")[:50]:
+                f.write(f"{statistic}\n")
+        print(f"Memory snapshot written to {base_name}.snapshot")
+        return base_name + ".snapshot"
+
+
+# Shared profiler used by the @profiled hot paths
+profiler = Profiler()
+
+
+def profiled(name):
+    """Decorator profiling a function under the given name while profiling is enabled."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return profiler.call(name, function, *args, **kwargs)
+        return wrapper
+    return decorator
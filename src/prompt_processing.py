@@ -0,0 +1,99 @@
+"""Prompt building and response post-processing shared by the GUI and the headless API server."""
+
+import json
+import re
+from gemini_client import GENERATION_SETTING_KEYS, is_error
+from markdown_renderer import render_word_entry_markdown, WORD_ENTRY_SCHEMA
+from text_diff import word_diff_markdown, strip_wrapping_quotes
+
+
+_WHITESPACE_RE = re.compile(r"\s")
+
+
+def determine_input_type(text):
+    """Determines if the input text is a 'word' or 'phrase'."""
+    # A regex scan stops at the first space instead of splitting a possibly huge input into words
+    stripped = text.strip()
+    return "word" if stripped and not _WHITESPACE_RE.search(stripped) else "phrase"
+
+
+def find_prompt(prompts_config, input_type, label):
+    """Returns the prompt definition with the given label for an input type, or None."""
+    for prompt_def in prompts_config.get(input_type, []):
+        if prompt_def.get("label") == label:
+            return prompt_def
+    return None
+
+
+def fill_prompt_template(template, text, from_language, to_language):
+    """Replaces the {text}, {from_language} and {to_language} placeholders of a prompt template."""
+    return template.replace("{text}", text).replace("{from_language}", from_language).replace("{to_language}", to_language)
+
+
+def fill_paragraph_prompt(template, paragraph, previous_paragraph, next_paragraph, from_language, to_language):
+    """
+    Fills a prompt template for one paragraph of a longer text.
+
+    The neighbouring paragraphs are appended as read-only context so the model
+    keeps terminology and tone consistent with the rest of the text.
+    """
+    prompt = fill_prompt_template(template, paragraph, from_language, to_language)
+    context = []
+    if previous_paragraph:
+        context.append(f"Previous paragraph:\n{previous_paragraph}")
+    if next_paragraph:
+        context.append(f"Next paragraph:\n{next_paragraph}")
+    if not context:
+        return prompt
+    return prompt + "\n\nThe text above is one paragraph of a longer text. For context only (do not include it in your answer):\n" + "\n".join(context)
+
+
+def get_request_options(prompt_def, config, from_language=None, to_language=None):
+    """
+    Returns the model and generation options for a prompt.
+
+    Args:
+        prompt_def: The prompt definition from prompts.json.
+        config: The application settings.
+        from_language: Fills {from_language} in the system instruction (default: source_language).
+        to_language: Fills {to_language} in the system instruction (default: target_language).
+
+    Returns:
+        tuple: (model_name, generation_settings, response_schema)
+    """
+    # A prompt may override the global model and tune its generation settings
+    model_name = prompt_def.get("model") or config.get("llm_model", "")
+    generation_settings = {key: prompt_def[key] for key in GENERATION_SETTING_KEYS if key in prompt_def}
+    if generation_settings.get("system_instruction"):
+        # Only the languages vary, so the instruction is the same for every text (a cacheable prefix)
+        generation_settings["system_instruction"] = fill_prompt_template(
+            generation_settings["system_instruction"], "",
+            from_language or config.get("source_language", "English"), to_language or config.get("target_language", "Ukrainian"))
+    response_schema = WORD_ENTRY_SCHEMA if prompt_def.get("mode") == "word_entry" else None
+    return model_name, generation_settings, response_schema
+
+
+def postprocess_response(prompt_def, input_text, response):
+    """
+    Turns a raw model response into the Markdown to display, according to the prompt mode.
+
+    Returns:
+        tuple: (markdown_text, plain_text, word_entry) where plain_text is None unless
+               the copied text differs from the displayed Markdown, and word_entry is
+               the parsed structured response for "word_entry" prompts.
+    """
+    if is_error(response):
+        return response, None, None
+    mode = prompt_def.get("mode")
+    if mode == "diff":
+        # The model returned only the corrected text: show a local word diff, copy the corrected text
+        corrected_text = strip_wrapping_quotes(input_text, response)
+        return word_diff_markdown(input_text, corrected_text), corrected_text, None
+    if mode == "word_entry":
+        try:
+            entry = json.loads(response)
+        except json.JSONDecodeError as e:
+            print(f"Structured response is not valid JSON, showing it as is: {e}")
+            return response, None, None
+        return render_word_entry_markdown(input_text, entry), None, entry
+    return response, None, None
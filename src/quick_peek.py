@@ -0,0 +1,143 @@
+"""Quick peek: a small borderless popup next to the mouse showing the first lines of an answer."""
+
+import tkinter as tk
+from tkinter import ttk
+
+
+class QuickPeek:
+    """
+    A borderless, always-on-top popup shown at the mouse pointer.
+
+    It never takes the keyboard focus, so it does not trip the OS focus-stealing
+    rules that make the main window unreliable to raise, and showing it does not
+    lay out the main window. The popup is created once and reused.
+    """
+
+    def __init__(self, root, max_lines=6, dismiss_seconds=10):
+        """
+        Initializes the QuickPeek (the popup is created on first show).
+
+        Args:
+            root: The root Tkinter window.
+            max_lines: Number of answer lines shown.
+            dismiss_seconds: Seconds the finished answer stays up while the pointer is not over it (0 keeps it).
+        """
+        self.root = root
+        self.max_lines = max_lines
+        self.dismiss_ms = int(dismiss_seconds * 1000)
+        self._popup = None
+        self._heading_label = None
+        self._text_label = None
+        self._on_expand = None
+        self._on_dismiss = None
+        self._dismiss_after_id = None
+        self._done = False
+
+    @property
+    def visible(self):
+        """True while the popup is shown."""
+        return self._popup is not None and self._popup.winfo_viewable()
+
+    def _create(self):
+        """Creates the popup widgets."""
+        popup = tk.Toplevel(self.root)
+        popup.withdraw()
+        popup.overrideredirect(True) # No title bar, no taskbar entry
+        popup.attributes("-topmost", True)
+        frame = tk.Frame(popup, borderwidth=1, relief=tk.SOLID, padx=8, pady=6)
+        frame.pack(fill=tk.BOTH, expand=True)
+        self._heading_label = ttk.Label(frame, font=("TkDefaultFont", 10, "bold"))
+        self._heading_label.pack(anchor=tk.W)
+        self._text_label = ttk.Label(frame, wraplength=340, justify=tk.LEFT)
+        self._text_label.pack(anchor=tk.W, fill=tk.X, pady=(2, 4))
+        button_frame = ttk.Frame(frame)
+        button_frame.pack(fill=tk.X)
+        ttk.Button(button_frame, text="✕", width=3, command=self.hide).pack(side=tk.RIGHT)
+        ttk.Button(button_frame, text="Open ⤢", command=self._expand).pack(side=tk.RIGHT, padx=(0, 4))
+        # Clicking the answer opens it in the main window as well
+        self._text_label.bind("<Button-1>", lambda event: self._expand())
+        popup.bind("<Enter>", lambda event: self._cancel_dismiss())
+        popup.bind("<Leave>", lambda event: self._schedule_dismiss())
+        self._popup = popup
+
+    def show(self, heading, on_expand, on_dismiss=None):
+        """
+        Shows the popup at the mouse pointer with a "Thinking..." placeholder.
+
+        Args:
+            heading: The captured text (shortened to one line).
+            on_expand: Called when the user asks for the full answer; the popup is hidden first.
+            on_dismiss: Called when the popup is hidden without being expanded (closed,
+                        dismissed after the timeout or replaced by the main window).
+        """
+        if self._popup is None:
+            self._create()
+        self._cancel_dismiss()
+        self._on_expand = on_expand
+        self._on_dismiss = on_dismiss
+        self._done = False
+        heading = heading.strip().split("\n", 1)[0]
+        self._heading_label.config(text=heading if len(heading) <= 40 else heading[:39] + "…")
+        self._text_label.config(text="Thinking...")
+        self._place_at_pointer()
+        self._popup.deiconify()
+        self._popup.lift()
+
+    def _place_at_pointer(self):
+        """Moves the popup next to the pointer, keeping it on the screen."""
+        self._popup.update_idletasks()
+        pointer_x, pointer_y = self.root.winfo_pointerxy()
+        width = max(self._popup.winfo_reqwidth(), 220)
+        height = self._popup.winfo_reqheight()
+        x = min(pointer_x + 12, self.root.winfo_screenwidth() - width - 8)
+        y = pointer_y + 16
+        if y + height > self.root.winfo_screenheight() - 8:
+            y = max(pointer_y - height - 16, 0) # Above the pointer near the bottom edge
+        self._popup.geometry(f"+{max(x, 0)}+{y}")
+
+    def set_text(self, text, done=False):
+        """
+        Shows the first lines of the (partial) answer.
+
+        Args:
+            text: The answer as plain text.
+            done: True once the answer is complete; starts the dismiss timer.
+        """
+        if self._popup is None:
+            return
+        lines = [line.rstrip() for line in text.strip().splitlines() if line.strip()]
+        shown = "\n".join(lines[:self.max_lines])
+        if len(lines) > self.max_lines:
+            shown += "\n…"
+        self._text_label.config(text=shown or ("(empty answer)" if done else "Thinking..."))
+        if done:
+            self._done = True
+            self._schedule_dismiss()
+
+    def hide(self):
+        """Hides the popup, calling its on_dismiss callback."""
+        self._cancel_dismiss()
+        if self._popup is not None:
+            self._popup.withdraw()
+        on_dismiss, self._on_dismiss = self._on_dismiss, None
+        if on_dismiss is not None:
+            on_dismiss()
+
+    def _expand(self):
+        """Hides the popup and opens the answer in the main window."""
+        on_expand = self._on_expand
+        self._on_dismiss = None # The answer is handed over, not dropped
+        self.hide()
+        if on_expand is not None:
+            on_expand()
+
+    def _schedule_dismiss(self):
+        """Hides the finished answer after dismiss_ms unless the pointer comes back."""
+        self._cancel_dismiss()
+        if self._done and self.dismiss_ms > 0:
+            self._dismiss_after_id = self.root.after(self.dismiss_ms, self.hide)
+
+    def _cancel_dismiss(self):
+        if self._dismiss_after_id is not None:
+            self.root.after_cancel(self._dismiss_after_id)
+            self._dismiss_after_id = None
@@ -0,0 +1,69 @@
+"""Memoized Markdown rendering, so re-showing a response never converts it again."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from markdown_renderer import parse_markdown, wrap_html_document
+from metrics import metrics
+
+
+class RenderCache:
+    """
+    Rendered documents keyed by a hash of (Markdown, CSS) (LRU, thread-safe).
+
+    A rendered document is the (tree, html_content) pair shown in the output:
+    the element tree for the native renderer and the full HTML document for
+    HtmlFrame and "Copy with Formatting". Trees are only read once built, so a
+    cached pair can be shared by several sessions.
+    """
+
+    def __init__(self, max_entries=32):
+        """
+        Initializes the RenderCache.
+
+        Args:
+            max_entries: Number of rendered documents kept before the least recently used are evicted.
+        """
+        self.max_entries = max_entries
+        self._documents = OrderedDict() # key -> (tree, html_content)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(markdown_text, css_content):
+        digest = hashlib.sha256(markdown_text.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(css_content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, markdown_text, css_content=""):
+        """Returns the cached (tree, html_content) of a document, or None."""
+        key = self._key(markdown_text, css_content)
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def render(self, markdown_text, css_content=""):
+        """
+        Returns (tree, html_content) for Markdown, converting it only on a cache miss.
+
+        Safe to call from any thread; meant to run off the Tk thread.
+        """
+        document = self.get(markdown_text, css_content)
+        if document is not None:
+            return document
+        tree, html_body = parse_markdown(markdown_text)
+        document = (tree, wrap_html_document(html_body, css_content))
+        key = self._key(markdown_text, css_content)
+        with self._lock:
+            self._documents[key] = document
+            while len(self._documents) > self.max_entries:
+                self._documents.popitem(last=False)
+        metrics.record("render_cache_miss", chars=len(markdown_text))
+        return document
+
+    def clear(self):
+        """Drops all rendered documents (an IdleManager trim callback)."""
+        with self._lock:
+            self._documents.clear()
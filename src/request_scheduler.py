@@ -0,0 +1,152 @@
+# pylint: disable=broad-except
+
+"""Priority scheduler for LLM requests: interactive work goes ahead of prefetch and batch work."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from metrics import metrics
+
+# Lower value = higher priority
+PRIORITIES = {"interactive": 0, "prefetch": 1, "batch": 2}
+_PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+
+class RequestPreempted(Exception):
+    """Raised for a queued background request dropped to make room for more important work."""
+
+
+class RequestScheduler:
+    """
+    Limits concurrent LLM calls and orders waiting calls by priority class.
+
+    One slot is reserved for interactive requests (when max_concurrency > 1), so a
+    user's click never waits behind background work that is already running.
+    Queued background requests beyond max_queued_background are preempted, lowest
+    priority and newest first. Must be used from a single event loop.
+    """
+
+    def __init__(self, max_concurrency=2, max_queued_background=20):
+        """
+        Initializes the RequestScheduler.
+
+        Args:
+            max_concurrency: Maximum number of LLM calls running at once.
+            max_queued_background: Maximum number of waiting prefetch/batch requests.
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queued_background = max_queued_background
+        self._active = 0
+        self._active_background = 0
+        self._queue = [] # heap of [priority, sequence, waiter future]
+        self._sequence = itertools.count()
+
+    @property
+    def queue_depth(self):
+        """Number of requests waiting for a slot."""
+        return len(self._queue)
+
+    def _can_start(self, priority):
+        """Returns True if a request of this priority may take a slot now."""
+        if self._active >= self.max_concurrency:
+            return False
+        if priority > PRIORITIES["interactive"] and self.max_concurrency > 1:
+            return self._active_background < self.max_concurrency - 1
+        return True
+
+    def _acquire(self, priority):
+        self._active += 1
+        if priority > PRIORITIES["interactive"]:
+            self._active_background += 1
+
+    def _release(self, priority):
+        self._active -= 1
+        if priority > PRIORITIES["interactive"]:
+            self._active_background -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        """Hands free slots to the highest priority waiters."""
+        while self._queue and self._can_start(self._queue[0][0]):
+            priority, _, waiter = heapq.heappop(self._queue)
+            if waiter.done():
+                continue # Cancelled while waiting
+            self._acquire(priority)
+            waiter.set_result(True)
+
+    def _preempt_background(self):
+        """Drops the least important queued requests above the background queue limit."""
+        background = [entry for entry in self._queue if entry[0] > PRIORITIES["interactive"]]
+        excess = len(background) - self.max_queued_background
+        if excess <= 0:
+            return
+        # Lowest priority first, newest first within a priority class
+        for entry in sorted(background, key=lambda e: (-e[0], -e[1]))[:excess]:
+            self._queue.remove(entry)
+            if not entry[2].done():
+                entry[2].set_exception(RequestPreempted(f"{_PRIORITY_NAMES[entry[0]]} request preempted"))
+        heapq.heapify(self._queue)
+        metrics.record("llm_scheduler_preempted", count=excess, queue_depth=len(self._queue))
+
+    def try_acquire(self, priority_name):
+        """
+        Takes a slot for extra work (e.g. a hedged duplicate) only if one is free now.
+
+        The slot is not taken ahead of queued requests of the same or higher
+        priority. Release it with release().
+
+        Returns:
+            bool: True if a slot was taken.
+        """
+        priority = PRIORITIES[priority_name]
+        if (self._queue and self._queue[0][0] <= priority) or not self._can_start(priority):
+            return False
+        self._acquire(priority)
+        return True
+
+    def release(self, priority_name):
+        """Releases a slot taken with try_acquire()."""
+        self._release(PRIORITIES[priority_name])
+
+    async def run(self, priority_name, coroutine_factory):
+        """
+        Runs coroutine_factory() once a slot is available for the priority class.
+
+        Args:
+            priority_name: "interactive", "prefetch" or "batch".
+            coroutine_factory: Callable returning the coroutine to run.
+
+        Returns:
+            The coroutine's result.
+
+        Raises:
+            RequestPreempted: If the request was dropped from the queue.
+        """
+        priority = PRIORITIES[priority_name]
+        enqueued_at = time.monotonic()
+        # Start at once unless an equally or more important request is already waiting
+        if (not self._queue or self._queue[0][0] > priority) and self._can_start(priority):
+            self._acquire(priority)
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            entry = [priority, next(self._sequence), waiter]
+            heapq.heappush(self._queue, entry)
+            self._preempt_background()
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                    self._release(priority) # The slot was granted just before the cancellation
+                elif entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                raise
+
+        metrics.record("llm_scheduler_start", priority=priority_name,
+                       wait_ms=round((time.monotonic() - enqueued_at) * 1000, 1),
+                       queue_depth=len(self._queue), active=self._active)
+        try:
+            return await coroutine_factory()
+        finally:
+            self._release(priority)
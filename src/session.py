@@ -0,0 +1,36 @@
+"""Session tabs: each tab has its own input, selected prompt, output and in-flight request."""
+
+import itertools
+
+_session_ids = itertools.count(1)
+
+
+class Session:
+    """State of one session tab. The widgets are shared; the active session's state is shown in them."""
+
+    def __init__(self):
+        """Initializes an empty Session."""
+        self.id = next(_session_ids)
+        self.input_text = "" # Saved from the input widget when the tab is left
+        self.selected_label = None
+        self.custom_prompt_text = ""
+        self.last_raw_llm_response = "" # Raw LLM response (Markdown)
+        self.last_rendered_html = ""
+        self.last_plain_text = "" # Text used by the Copy buttons
+        self.last_word_entry = None # Last structured word lookup (ipa, translations, examples)
+        self.partial_text = "" # Response streamed so far while a request is in flight
+        self.partial_render = None # (tree, html_content) of partial_text, converted on the render worker
+        self.request_in_flight = False
+        self.current_request_live = False
+        self.current_future = None # Future of the pending LLM request
+        self.request_generation = 0 # Incremented per request; stale results are dropped
+        self.last_request_signature = None # (label, final prompt, from and to language) of the last request
+        self.offloaded = False # True while the last response lives only on disk
+
+    @property
+    def title(self):
+        """Short tab title: the beginning of the input text."""
+        first_line = self.input_text[:200].strip().split("\n", 1)[0]
+        if not first_line:
+            return "New"
+        return first_line if len(first_line) <= 18 else first_line[:17] + "…"
@@ -0,0 +1,92 @@
+"""Word-level diff between an original text and its corrected version, rendered as Markdown."""
+
+import difflib
+import re
+
+# Words, runs of punctuation and runs of whitespace are diffed as separate tokens
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]+|\s+")
+_MARKDOWN_SPECIAL_RE = re.compile(r"([\\`*_\[\]])")
+# Characters starting a heading, quote, list, rule or table at the beginning of a line,
+# and the dot of an ordered list item ("1."); "++" opens an insertion
+_BLOCK_MARKER_RE = re.compile(r"^([ \t]*)(?:([#>\-*=|]|\+(?!\+))|(\d+)\.)", re.MULTILINE)
+_QUOTES = ("'", '"', "«", "“", "‘")
+
+
+def _tokenize(text):
+    """Splits text into word, punctuation and whitespace tokens."""
+    return _TOKEN_RE.findall(text)
+
+
+def _escape(text):
+    """Escapes characters that would otherwise be read as Markdown formatting or HTML."""
+    text = text.replace("&", "&amp;").replace("<", "&lt;")
+    return _MARKDOWN_SPECIAL_RE.sub(r"\\\1", text)
+
+
+def _escape_block_markers(markdown_text):
+    """Escapes line starts that would turn the user's text into headings, quotes or lists."""
+    def replace(match):
+        indent, marker, number = match.groups()
+        if marker is not None:
+            return f"{indent}&#{ord(marker)};"
+        return f"{indent}{number}\\."
+    return _BLOCK_MARKER_RE.sub(replace, markdown_text)
+
+
+def _wrap(text, marker):
+    """
+    Wraps text in a del/ins marker line by line, keeping surrounding whitespace outside.
+
+    Markdown emphasis cannot span paragraphs or start with whitespace, so each
+    line is wrapped separately.
+    """
+    parts = []
+    for piece in re.split(r"(\n+)", text):
+        core = piece.strip()
+        if not core:
+            parts.append(piece)
+            continue
+        leading = piece[:len(piece) - len(piece.lstrip())]
+        trailing = piece[len(piece.rstrip()):]
+        parts.append(f"{leading}{marker}{_escape(core)}{marker}{trailing}")
+    return "".join(parts)
+
+
+def strip_wrapping_quotes(original, corrected):
+    """Removes quotes the model added around the corrected text when the original had none."""
+    corrected = corrected.strip()
+    if len(corrected) >= 2 and corrected[0] in _QUOTES and corrected[-1] in ("'", '"', "»", "”", "’"):
+        if not original.strip().startswith(corrected[0]):
+            return corrected[1:-1].strip()
+    return corrected
+
+
+def word_diff_markdown(original, corrected):
+    """
+    Computes a word-level diff and renders it with the markdown_del_ins syntax.
+
+    Args:
+        original: The text the user submitted.
+        corrected: The corrected text returned by the model.
+
+    Returns:
+        A Markdown string where removed words are ~~deleted~~ and added words are ++inserted++.
+    """
+    original_tokens = _tokenize(original.strip())
+    corrected_tokens = _tokenize(corrected.strip())
+    matcher = difflib.SequenceMatcher(None, original_tokens, corrected_tokens, autojunk=False)
+
+    parts = []
+    for opcode, i1, i2, j1, j2 in matcher.get_opcodes():
+        old_text = "".join(original_tokens[i1:i2])
+        new_text = "".join(corrected_tokens[j1:j2])
+        if opcode == "equal":
+            parts.append(_escape(old_text))
+        elif opcode == "delete":
+            parts.append(_wrap(old_text, "~~"))
+        elif opcode == "insert":
+            parts.append(_wrap(new_text, "++"))
+        else: # replace
+            parts.append(_wrap(old_text, "~~"))
+            parts.append(_wrap(new_text, "++"))
+    return _escape_block_markers("".join(parts))
@@ -0,0 +1,221 @@
+# pylint: disable=line-too-long
+
+"""Renders a Python-Markdown element tree directly into a tkinter Text widget."""
+
+import tkinter as tk
+from tkinter import font as tkfont
+from markdown.util import AMP_SUBSTITUTE
+
+BLOCK_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li", "table", "pre", "blockquote", "hr", "div", "dl", "dt", "dd"}
+INLINE_STYLE_TAGS = {
+    "strong": "bold", "b": "bold",
+    "em": "italic", "i": "italic",
+    "del": "del", "s": "del", "strike": "del",
+    "ins": "ins", "u": "ins",
+    "code": "code",
+    "mark": "mark",
+    "a": "link",
+    "sup": "sup",
+    "sub": "sub",
+}
+_LIST_INDENT = 20
+
+
+def _clean_text(text):
+    """Restores ampersands Python-Markdown replaced with a placeholder."""
+    if not text:
+        return ""
+    return text.replace(AMP_SUBSTITUTE, "&")
+
+
+class TextRenderer:
+    """
+    Lightweight output backend that shows Markdown in a tk.Text widget using tags.
+
+    Supports the subset used by Lexi responses: headings, bold, italic,
+    ~~deletions~~, ++insertions++, ==highlights==, code, lists, block quotes
+    and small tables. It needs no embedded browser engine.
+    """
+
+    def __init__(self, text_widget):
+        """
+        Initializes the TextRenderer and configures the formatting tags.
+
+        Args:
+            text_widget: The tk.Text widget to render into.
+        """
+        self.text_widget = text_widget
+        self._item_start = False # True right after a list marker was inserted
+        self._configure_tags()
+
+    def _configure_tags(self):
+        """Creates the tags used for inline and block formatting."""
+        base_font = tkfont.Font(font=self.text_widget.cget("font"))
+        family = base_font.actual("family")
+        size = base_font.actual("size")
+        fixed_family = tkfont.nametofont("TkFixedFont").actual("family")
+
+        widget = self.text_widget
+        widget.tag_configure("bold", font=(family, size, "bold"))
+        widget.tag_configure("italic", font=(family, size, "italic"))
+        widget.tag_configure("bold_italic", font=(family, size, "bold italic"))
+        widget.tag_configure("del", overstrike=True, foreground="#dc3545")
+        widget.tag_configure("ins", underline=True, foreground="#28a745")
+        widget.tag_configure("mark", background="#fff3a0")
+        widget.tag_configure("code", font=(fixed_family, size), background="#f0f0f0")
+        widget.tag_configure("link", foreground="#0056b3", underline=True)
+        widget.tag_configure("sup", offset=4, font=(family, max(size - 2, 6)))
+        widget.tag_configure("sub", offset=-4, font=(family, max(size - 2, 6)))
+        widget.tag_configure("blockquote", lmargin1=_LIST_INDENT, lmargin2=_LIST_INDENT, foreground="#5a6268")
+        widget.tag_configure("table", font=(fixed_family, size))
+        widget.tag_configure("table_header", font=(fixed_family, size, "bold"))
+        widget.tag_configure("hr", foreground="#cccccc")
+        for level, scale in zip(range(1, 7), (1.6, 1.4, 1.2, 1.1, 1.0, 1.0)):
+            widget.tag_configure(f"h{level}", font=(family, int(size * scale), "bold"), foreground="#0056b3", spacing1=6, spacing3=4)
+
+    def _list_tag(self, depth):
+        """Returns (and lazily creates) the indentation tag for a list nesting depth."""
+        tag_name = f"list{depth}"
+        if tag_name not in self.text_widget.tag_names():
+            indent = depth * _LIST_INDENT
+            self.text_widget.tag_configure(tag_name, lmargin1=indent - _LIST_INDENT // 2, lmargin2=indent)
+        return tag_name
+
+    def render(self, tree):
+        """
+        Replaces the widget content with the rendered element tree.
+
+        Args:
+            tree: The root element returned by markdown_renderer.parse_markdown.
+        """
+        widget = self.text_widget
+        widget.config(state=tk.NORMAL)
+        widget.delete("1.0", tk.END)
+        self._item_start = False
+        if tree is not None:
+            self._render_children(tree, (), 0)
+        # Trim the trailing block separators
+        while widget.get("end-2c", "end-1c") == "\n":
+            widget.delete("end-2c", "end-1c")
+        widget.config(state=tk.DISABLED)
+
+    def render_plain(self, text):
+        """Replaces the widget content with unformatted text (status and error messages)."""
+        widget = self.text_widget
+        widget.config(state=tk.NORMAL)
+        widget.delete("1.0", tk.END)
+        widget.insert("1.0", text)
+        widget.config(state=tk.DISABLED)
+
+    def _insert(self, text, tags):
+        """Inserts text at the end of the widget with the given tags."""
+        if text:
+            if "bold" in tags and "italic" in tags:
+                tags = tuple(t for t in tags if t not in ("bold", "italic")) + ("bold_italic",)
+            self.text_widget.insert(tk.END, text, tags)
+            self._item_start = False
+
+    def _ensure_block_break(self):
+        """Starts a new line unless the output already ends with one."""
+        if self._item_start:
+            return # The first block of a list item continues the marker line
+        last_char = self.text_widget.get("end-2c", "end-1c")
+        if last_char and last_char != "\n":
+            self.text_widget.insert(tk.END, "\n")
+
+    def _ensure_blank_line(self):
+        """Separates blocks by an empty line."""
+        if self._item_start or self.text_widget.index("end-1c") == "1.0":
+            return
+        self._ensure_block_break()
+        if self.text_widget.get("end-3c", "end-1c") != "\n\n":
+            self.text_widget.insert(tk.END, "\n")
+
+    def _render_children(self, element, tags, depth):
+        """Renders the text and children of an element."""
+        is_block_container = element.tag in BLOCK_TAGS and any(child.tag in BLOCK_TAGS for child in element)
+        text = _clean_text(element.text)
+        if text and not (is_block_container and not text.strip()):
+            self._insert(text, tags)
+        for child in element:
+            self._render_element(child, tags, depth)
+            tail = _clean_text(child.tail)
+            if tail and not (child.tag in BLOCK_TAGS and not tail.strip()):
+                self._insert(tail, tags)
+
+    def _render_element(self, element, tags, depth):
+        """Renders a single element and its subtree."""
+        tag = element.tag
+        if tag in INLINE_STYLE_TAGS:
+            self._render_children(element, tags + (INLINE_STYLE_TAGS[tag],), depth)
+        elif tag == "br":
+            self._insert("\n", tags)
+        elif tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+            self._ensure_blank_line()
+            self._render_children(element, tags + (tag,), depth)
+            self._insert("\n", tags)
+        elif tag in ("p", "dt", "dd"):
+            if depth == 0:
+                self._ensure_blank_line()
+            else:
+                self._ensure_block_break()
+            self._render_children(element, tags, depth)
+            self._insert("\n", tags)
+        elif tag in ("ul", "ol"):
+            self._render_list(element, tags, depth)
+        elif tag == "blockquote":
+            self._ensure_blank_line()
+            self._render_children(element, tags + ("blockquote",), depth)
+        elif tag == "pre":
+            self._ensure_blank_line()
+            self._insert("".join(element.itertext()).rstrip("\n") + "\n", tags + ("code",))
+        elif tag == "hr":
+            self._ensure_blank_line()
+            self._insert("─" * 30 + "\n", tags + ("hr",))
+        elif tag == "table":
+            self._render_table(element, tags)
+        else:
+            # div, span and unknown elements: render their content
+            self._render_children(element, tags, depth)
+
+    def _render_list(self, element, tags, depth):
+        """Renders an ordered or unordered list with indentation per nesting level."""
+        if depth == 0:
+            self._ensure_blank_line()
+        list_tag = self._list_tag(depth + 1)
+        number = int(element.get("start", "1"))
+        for item in element:
+            if item.tag != "li":
+                continue
+            self._ensure_block_break()
+            marker = f"{number}. " if element.tag == "ol" else "• "
+            number += 1
+            self._insert(marker, tags + (list_tag,))
+            self._item_start = True
+            self._render_children(item, tags + (list_tag,), depth + 1)
+        self._ensure_block_break()
+
+    def _render_table(self, element, tags):
+        """Renders a table as padded monospace columns."""
+        rows = []
+        for row in element.iter("tr"):
+            cells = [(cell.tag == "th", " ".join("".join(cell.itertext()).split())) for cell in row if cell.tag in ("th", "td")]
+            rows.append(cells)
+        if not rows:
+            return
+        column_count = max(len(cells) for cells in rows)
+        widths = [0] * column_count
+        for cells in rows:
+            for index, (_, text) in enumerate(cells):
+                widths[index] = max(widths[index], len(_clean_text(text)))
+
+        self._ensure_blank_line()
+        for row_index, cells in enumerate(rows):
+            for index, (is_header, text) in enumerate(cells):
+                separator = " │ " if index else ""
+                self._insert(separator, tags + ("table",))
+                cell_tag = "table_header" if is_header else "table"
+                self._insert(_clean_text(text).ljust(widths[index]), tags + (cell_tag,))
+            self._insert("\n", tags + ("table",))
+            if row_index == 0 and cells and all(is_header for is_header, _ in cells):
+                self._insert("─┼─".join("─" * width for width in widths) + "\n", tags + ("table",))
@@ -3,6 +3,7 @@
 import tkinter as tk
 import pystray
 from PIL import Image
+from profiler import profiler
 
 
 class TrayManager:
@@ -11,6 +12,16 @@ class TrayManager:
         self.window = window
         self.icon = None
         self.is_window_visible = True
+        self._visibility_listeners = []
+
+    def add_visibility_listener(self, callback):
+        """Registers callback(visible) to be called when the window is shown or hidden."""
+        self._visibility_listeners.append(callback)
+
+    def _notify_visibility(self, visible):
+        """Calls the visibility listeners."""
+        for callback in self._visibility_listeners:
+            callback(visible)
 
     def create_icon(self):
         """Create system tray icon with graceful fallback for Linux/WSL."""
@@ -34,6 +45,9 @@ class TrayManager:
 
             menu = (
                 pystray.MenuItem('Show/Hide Window', self.toggle_window_visibility, default=True),
+                pystray.MenuItem('Usage Summary', self.show_usage_summary),
+                pystray.MenuItem('Profiling', self.toggle_profiling, checked=lambda item: profiler.enabled),
+                pystray.MenuItem('Take Memory Snapshot', self.take_memory_snapshot, enabled=lambda item: profiler.enabled),
                 pystray.MenuItem('Exit', self.exit_application)
             )
 
@@ -65,6 +79,7 @@ class TrayManager:
             self.window.lift()
             self.window.focus_force()
             self.is_window_visible = True
+            self._notify_visibility(True)
             return
 
         # Original logic for when system tray is available
@@ -80,11 +95,36 @@ class TrayManager:
         self.window.focus_force()
         self.window.after(100, lambda: self.window.attributes('-topmost', 0))
         self.is_window_visible = True
+        self._notify_visibility(True)
 
     def hide_window(self):
         """Hide the main application window."""
         self.window.withdraw()
         self.is_window_visible = False
+        self._notify_visibility(False)
+
+    def show_usage_summary(self, icon=None, item=None):
+        """Shows today's token usage and quota in a window (on the Tk thread)."""
+        self.window.after(0, self._open_usage_window)
+
+    def _open_usage_window(self):
+        """Opens a read-only window with the usage summary."""
+        summary_window = tk.Toplevel(self.window)
+        summary_window.title("Lexi Token Usage")
+        text_widget = tk.Text(summary_window, font=("Courier", 10), wrap=tk.NONE, width=88, height=30)
+        text_widget.insert("1.0", self.window.app_logic.usage_tracker.format_summary())
+        text_widget.config(state=tk.DISABLED)
+        text_widget.pack(fill=tk.BOTH, expand=True)
+        summary_window.lift()
+        summary_window.focus_force()
+
+    def toggle_profiling(self, icon=None, item=None):
+        """Enables or disables profiling (on the Tk thread, whose stacks are sampled)."""
+        self.window.after(0, profiler.toggle)
+
+    def take_memory_snapshot(self, icon=None, item=None):
+        """Writes a tracemalloc snapshot to the profiling report directory."""
+        profiler.take_memory_snapshot()
 
     def exit_application(self, icon=None, item=None):
         """Exit the application, works with or without system tray."""
@@ -1,8 +1,15 @@
 # pylint: disable=line-too-long
 
+import html
+import re
+import time
 import tkinter as tk
 from tkinter import ttk
-import tkinterweb
+from text_renderer import TextRenderer
+from profiler import profiled
+
+# Characters of a large input shown in the input widget
+LARGE_INPUT_PREVIEW_CHARS = 20000
 
 class UIManager:
     """Manages the Tkinter user interface elements for the Lexi application."""
@@ -21,6 +28,12 @@ class UIManager:
         self.prompts_config = prompts_config
         self.css_content = css_content
         self.config = config
+        # "html" uses the tkinterweb HtmlFrame, "text" the lightweight native tk.Text renderer
+        self.output_renderer = config.get("output_renderer", "html")
+        self.text_renderer = None
+        # Above this size the input text lives in a Python buffer and the widget shows a read-only preview
+        self.large_input_threshold = config.get("large_input_threshold_chars", 100000)
+        self._input_buffer = None
 
         self._input_widget_modified_proxy = None  # Proxy for input widget modification events
 
@@ -36,6 +49,14 @@ class UIManager:
         # Main frame
         self.main_frame = ttk.Frame(self.root, padding="10")
 
+        # 0. Session tabs (one radio button per session, shown as tool buttons)
+        self.session_frame = ttk.Frame(self.main_frame)
+        self.session_tabs_frame = ttk.Frame(self.session_frame)
+        self.session_var = tk.IntVar()
+        self.new_session_button = ttk.Button(self.session_frame, text="+", width=3)
+        self.close_session_button = ttk.Button(self.session_frame, text="✕", width=3)
+        self._on_session_selected = None
+
         # 1. Language Selectors
         self.lang_frame = ttk.Frame(self.main_frame)
         self.from_label = ttk.Label(self.lang_frame, text="From:")
@@ -43,6 +64,9 @@ class UIManager:
         self.to_label = ttk.Label(self.lang_frame, text="To:")
         self.target_lang_combo = ttk.Combobox(self.lang_frame, values=self.config.get("target_languages", []), width=15)
         self.swap_lang_button = ttk.Button(self.lang_frame, text="↔", width=3, command=self._swap_languages)
+        # Live mode: run the selected prompt automatically when typing pauses
+        self.live_mode_var = tk.BooleanVar(value=bool(self.config.get("live_mode", False)))
+        self.live_mode_check = ttk.Checkbutton(self.lang_frame, text="Live", variable=self.live_mode_var)
 
         self._main_widgets.extend([self.source_lang_combo, self.target_lang_combo, self.swap_lang_button])
 
@@ -61,9 +85,20 @@ class UIManager:
         self.custom_prompt_entry = ttk.Entry(self.main_frame)
         self._main_widgets.append(self.custom_prompt_entry)
 
-        # 5. Output Widget (HtmlFrame)
-        self.output_widget = tkinterweb.HtmlFrame(self.main_frame, height=10, messages_enabled = False)
-        # HtmlFrame does not have a 'state' option, so we don't add it to _main_widgets.
+        # 5. Output Widget (HtmlFrame or native Text)
+        if self.output_renderer == "text":
+            self.output_widget = ttk.Frame(self.main_frame)
+            self.output_text = tk.Text(self.output_widget, height=10, wrap=tk.WORD, font="TkDefaultFont", state=tk.DISABLED, padx=10, pady=10)
+            output_scrollbar = ttk.Scrollbar(self.output_widget, command=self.output_text.yview)
+            self.output_text.config(yscrollcommand=output_scrollbar.set)
+            output_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            self.output_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            self.text_renderer = TextRenderer(self.output_text)
+        else:
+            import tkinterweb # Imported lazily: the embedded browser engine is only loaded when used
+            self.output_widget = tkinterweb.HtmlFrame(self.main_frame, height=10, messages_enabled = False)
+            # HtmlFrame does not have a 'state' option, so we don't add it to _main_widgets.
+        self._output_blank = True # Nothing shown yet (or unloaded): the warm-up may use the output
 
         # 6. Action Buttons Frame
         self.action_button_frame = ttk.Frame(self.main_frame)
@@ -88,27 +123,35 @@ class UIManager:
         # Configure columns and rows within main_frame for responsiveness
         self.main_frame.columnconfigure(0, weight=1)
         self.main_frame.columnconfigure(1, weight=1)
-        self.main_frame.rowconfigure(0, weight=0) # Language selectors row
-        self.main_frame.rowconfigure(1, weight=0) # Input widget row - make this resizable
-        self.main_frame.rowconfigure(2, weight=0) # Separator row (not used currently, but kept for structure)
+        self.main_frame.rowconfigure(0, weight=0) # Session tabs row
+        self.main_frame.rowconfigure(1, weight=0) # Language selectors row
+        self.main_frame.rowconfigure(2, weight=0) # Input widget row
         self.main_frame.rowconfigure(3, weight=0) # Custom prompt entry / Sizegrip row (Sizegrip commented out)
         self.main_frame.rowconfigure(4, weight=0) # Processing options row
         self.main_frame.rowconfigure(5, weight=1) # Output widget row - make this resizable
         self.main_frame.rowconfigure(6, weight=0) # Action buttons row
 
+        # 0. Session tabs
+        self.session_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        self.session_tabs_frame.pack(side=tk.LEFT)
+        self.new_session_button.pack(side=tk.LEFT, padx=(5, 0))
+        self.close_session_button.pack(side=tk.RIGHT)
+
         # 1. Language Selectors
-        self.lang_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        self.lang_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E))
         self.from_label.pack(side=tk.LEFT, padx=(0, 5))
         self.source_lang_combo.pack(side=tk.LEFT, padx=(0, 5))
         self.swap_lang_button.pack(side=tk.LEFT, padx=(0, 5))
         self.to_label.pack(side=tk.LEFT, padx=(0, 5))
         self.target_lang_combo.pack(side=tk.LEFT)
+        self.live_mode_check.pack(side=tk.RIGHT)
 
         # 2. Input Widget
-        self.input_widget.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        self.input_widget.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
         # Bind events for the clear button
         self.input_widget.bind("<Enter>", self._show_clear_button)
         self.input_widget.bind("<Leave>", self._hide_clear_button)
+        self.input_widget.bind("<<Paste>>", self._on_input_paste)
         self.clear_button.bind("<Enter>", self._show_clear_button) # Keep button visible when mouse is over it
         self.clear_button.bind("<Leave>", self._hide_clear_button)
 
@@ -126,6 +169,7 @@ class UIManager:
         self.copy_button.pack(side=tk.LEFT, padx=5)
         self.copy_with_formatting_button.pack(side=tk.LEFT)
 
+    @profiled("create_processing_buttons")
     def create_processing_buttons(self, input_type, on_button_click_callback):
         """Creates buttons on the processing_options_frame based on input type."""
         # Clear existing buttons
@@ -152,6 +196,8 @@ class UIManager:
     def toggle_main_widgets_state(self, state):
         """Enables or disables the main application widgets."""
         for widget in self._main_widgets:
+            if widget is self.input_widget and self._input_buffer is not None:
+                continue # The large-input preview stays read-only
             try:
                 widget.config(state=state)
             except tk.TclError:
@@ -182,13 +228,33 @@ class UIManager:
         self.main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S)) # Show main frame
 
     def get_input_text(self):
-        """Gets the text from the input widget."""
+        """Gets the input text: the large-input buffer if one is loaded, else the input widget's text."""
+        if self._input_buffer is not None:
+            return self._input_buffer
         return self.input_widget.get("1.0", tk.END).strip()
 
     def set_input_text(self, text):
-        """Sets the text in the input widget."""
+        """
+        Sets the input text.
+
+        Text longer than large_input_threshold is kept in a Python-side buffer and the
+        widget shows a read-only preview of its beginning, so Tk never holds megabytes.
+        """
+        self.input_widget.config(state=tk.NORMAL)
         self.input_widget.delete("1.0", tk.END)
-        self.input_widget.insert("1.0", text)
+        if len(text) <= self.large_input_threshold:
+            self._input_buffer = None
+            self.input_widget.insert("1.0", text)
+            return
+        self._input_buffer = text.strip()
+        self.input_widget.insert("1.0", self._input_buffer[:LARGE_INPUT_PREVIEW_CHARS])
+        self.input_widget.insert(tk.END, f"\n\n[Large input: {len(self._input_buffer):,} characters, showing the first {LARGE_INPUT_PREVIEW_CHARS:,}. The full text is processed. Clear (X) to edit.]")
+        self.input_widget.config(state=tk.DISABLED)
+        print(f"Large input mode: {len(self._input_buffer)} characters kept outside the input widget.")
+
+    def is_large_input(self):
+        """Returns True while the input is held in the large-input buffer."""
+        return self._input_buffer is not None
 
     def get_source_language(self):
         """Gets the selected source language."""
@@ -230,9 +296,56 @@ class UIManager:
         """Hides the custom prompt entry."""
         self.custom_prompt_entry.grid_forget()
 
-    def update_output_html(self, html_content):
-        """Updates the output widget with HTML content."""
-        self.output_widget.load_html(html_content)
+    @profiled("update_output_html")
+    def update_output_html(self, html_content, tree=None):
+        """
+        Updates the output widget with rendered content.
+
+        Args:
+            html_content: The full HTML document (used by the HtmlFrame backend).
+            tree: The Markdown element tree the HTML was generated from (used by
+                  the native text backend). Without it, the text backend shows
+                  the HTML as plain text, which is enough for status messages.
+        """
+        self._output_blank = not html_content
+        if self.text_renderer is None:
+            self.output_widget.load_html(html_content)
+        elif tree is not None:
+            self.text_renderer.render(tree)
+        else:
+            self.text_renderer.render_plain(html.unescape(re.sub(r"<[^>]+>", "", html_content)).strip())
+
+    def warm_up_output(self, hidden_html_content, tree):
+        """
+        Renders a document in the output widget itself, without showing it, then blanks it again.
+
+        Runs the layout, font and style code paths of the widget the first real
+        result is shown in. Skipped if the output already shows something.
+
+        Args:
+            hidden_html_content: A full HTML document whose body is laid out but not
+                painted (visibility: hidden), for the HtmlFrame backend.
+            tree: The element tree for the native text backend.
+
+        Returns:
+            float: Milliseconds spent rendering, or None if the output is in use.
+        """
+        if not self._output_blank:
+            return None
+        start = time.perf_counter()
+        if self.text_renderer is None:
+            self.output_widget.load_html(hidden_html_content)
+            self.root.update_idletasks() # Lay the document out, as a real paint would
+            self.output_widget.load_html("")
+        else:
+            # Cleared again before control returns to Tk, so the text is never painted
+            self.text_renderer.render(tree)
+            self.text_renderer.render_plain("")
+        return (time.perf_counter() - start) * 1000
+
+    def unload_output(self):
+        """Replaces the rendered document with an empty one to release its memory."""
+        self.update_output_html("")
 
     def get_pressed_prompt_button_label(self):
         """Returns the label of the currently pressed prompt button, or None."""
@@ -256,6 +369,35 @@ class UIManager:
             self._prompt_buttons[0].state(['pressed'])
             print("Saved processing option not found. Defaulting to first option.")
 
+    def bind_session_controls(self, on_select, on_new, on_close):
+        """
+        Binds the session tab controls.
+
+        Args:
+            on_select: Called with the session id when a tab is clicked.
+            on_new: Called when the "+" button is clicked.
+            on_close: Called when the close button is clicked (closes the active tab).
+        """
+        self._on_session_selected = on_select
+        self.new_session_button.config(command=on_new)
+        self.close_session_button.config(command=on_close)
+
+    def update_session_tabs(self, tabs, active_id):
+        """
+        Redraws the session tabs.
+
+        Args:
+            tabs: List of (session id, title, busy) tuples in display order.
+            active_id: The id of the session shown in the widgets.
+        """
+        for widget in self.session_tabs_frame.winfo_children():
+            widget.destroy()
+        for session_id, title, busy in tabs:
+            text = f"{title} …" if busy else title # "…" marks a tab whose request is still running
+            ttk.Radiobutton(self.session_tabs_frame, text=text, value=session_id, variable=self.session_var, style="Toolbutton",
+                            command=lambda i=session_id: self._on_session_selected and self._on_session_selected(i)).pack(side=tk.LEFT, padx=1)
+        self.session_var.set(active_id)
+
     def bind_copy_button(self, command):
         """Binds a command to the Copy button."""
         self.copy_button.config(command=command)
@@ -264,6 +406,14 @@ class UIManager:
         """Binds a command to the Copy with Formatting button."""
         self.copy_with_formatting_button.config(command=command)
 
+    def get_live_mode(self):
+        """Returns True if live ("as you type") processing is enabled."""
+        return self.live_mode_var.get()
+
+    def bind_live_mode_toggle(self, callback):
+        """Binds callback(enabled) to the Live checkbox."""
+        self.live_mode_check.config(command=lambda: callback(self.live_mode_var.get()))
+
     def bind_input_widget_change(self, callback):
         """Binds a callback function to the input widget's text change event."""
         # Create a proxy to manage the <<Modified>> event flag
@@ -313,9 +463,22 @@ class UIManager:
             return "break"  # Prevent default Tkinter behavior (which would add a newline)
 
     def _clear_input_widget(self):
-        """Clears the text in the input widget."""
+        """Clears the text in the input widget (and leaves large-input mode)."""
+        self._input_buffer = None
+        self.input_widget.config(state=tk.NORMAL)
         self.input_widget.delete("1.0", tk.END)
 
+    def _on_input_paste(self, event):
+        """Routes a paste of large clipboard text into the large-input buffer instead of the widget."""
+        try:
+            text = self.root.clipboard_get()
+        except tk.TclError:
+            return None # Nothing to paste as text: default handling
+        if len(text) <= self.large_input_threshold:
+            return None
+        self.set_input_text(text)
+        return "break"
+
     def _swap_languages(self):
         """Swaps the selected source and target languages."""
         source_lang = self.get_source_language()
@@ -0,0 +1,56 @@
+# pylint: disable=broad-except
+
+"""Frame-coalesced delivery of background updates to the Tk thread."""
+
+import threading
+
+
+class UIUpdateBus:
+    """
+    Collects UI updates posted from any thread and applies them on the Tk thread
+    at most once per frame.
+
+    Each update has a key naming the piece of UI it replaces (e.g. "output").
+    Posting under a key that already has a pending update replaces it, so a
+    burst of streamed chunks costs one re-render per frame instead of one per
+    chunk.
+    """
+
+    def __init__(self, root, frame_ms=33):
+        """
+        Initializes the UIUpdateBus.
+
+        Args:
+            root: The root Tkinter window.
+            frame_ms: Minimum interval between two flushes, in milliseconds.
+        """
+        self.root = root
+        self.frame_ms = frame_ms
+        self._pending = {} # key -> (callback, args); dicts keep the order keys were first posted
+        self._lock = threading.Lock()
+        self._flush_scheduled = False
+
+    def post(self, key, callback, *args):
+        """
+        Schedules callback(*args) on the Tk thread, superseding any pending update with the same key.
+
+        Safe to call from any thread.
+        """
+        with self._lock:
+            self._pending[key] = (callback, args)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self.root.after(self.frame_ms, self._flush)
+
+    def _flush(self):
+        """Applies the latest pending update of every key (runs on the Tk thread)."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._flush_scheduled = False
+        for key, (callback, args) in pending.items():
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error applying UI update '{key}': {e}")
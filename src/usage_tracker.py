@@ -0,0 +1,216 @@
+# pylint: disable=line-too-long
+# pylint: disable=broad-except
+
+"""Token and quota accounting: per-day usage by model and prompt, and quota-aware admission of requests."""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, timedelta
+from metrics import metrics
+
+_COUNTERS = ("requests", "errors", "prompt_tokens", "output_tokens", "cached_tokens", "total_tokens")
+# Days kept in the usage file
+_HISTORY_DAYS = 31
+# The usage file is written at most this often (and on exit)
+_SAVE_INTERVAL_SECONDS = 10
+
+
+def _empty_counters():
+    return dict.fromkeys(_COUNTERS, 0)
+
+
+class UsageTracker:
+    """
+    Aggregates the token usage of LLM calls per day, model and prompt label.
+
+    Register record() with gemini_client.add_call_observer. The "quota"
+    settings give per-model limits; admission() uses them (and the calls that
+    failed with a quota error) to delay or refuse requests before the API
+    answers with ResourceExhausted. Days follow the local calendar.
+    """
+
+    def __init__(self, path, quota_config=None):
+        """
+        Initializes the UsageTracker and loads the usage recorded so far.
+
+        Args:
+            path: The JSON usage file (None keeps usage in memory only).
+            quota_config (dict, optional): The "quota" settings: "requests_per_minute",
+                "requests_per_day" and "tokens_per_day" (model name -> limit),
+                "warn_fraction" and "cooldown_seconds".
+        """
+        quota_config = quota_config or {}
+        self.path = path
+        self.requests_per_minute = dict(quota_config.get("requests_per_minute", {}))
+        self.requests_per_day = dict(quota_config.get("requests_per_day", {}))
+        self.tokens_per_day = dict(quota_config.get("tokens_per_day", {}))
+        self.warn_fraction = quota_config.get("warn_fraction", 0.8)
+        self.cooldown_seconds = quota_config.get("cooldown_seconds", 60)
+        self._days = {} # ISO date -> {"models": {model: counters}, "labels": {label: counters}}
+        self._admitted = {} # model -> deque of monotonic admission times (last minute)
+        self._cooldown_until = {} # model -> monotonic time
+        self._warned = set() # (day, model) pairs already warned about
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock() # Keeps two saves from interleaving their writes
+        self._last_save = time.monotonic()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        """Loads the usage file, if any."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._days = json.load(f).get("days", {})
+        except Exception as e:
+            print(f"Error loading usage from {self.path}: {e}")
+
+    def save(self):
+        """Writes the usage file (last _HISTORY_DAYS days)."""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                oldest = (date.today() - timedelta(days=_HISTORY_DAYS)).isoformat()
+                self._days = {day: usage for day, usage in self._days.items() if day > oldest}
+                data = json.dumps({"days": self._days}, indent=2)
+                self._dirty = False
+                self._last_save = time.monotonic()
+            try:
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.write(data)
+            except Exception as e:
+                print(f"Error saving usage to {self.path}: {e}")
+
+    def record(self, call):
+        """Adds one call record (a gemini_client call observer)."""
+        usage = call.get("usage") or {}
+        model = call.get("model") or "unknown"
+        with self._lock:
+            today = self._days.setdefault(date.today().isoformat(), {"models": {}, "labels": {}})
+            for counters in (today["models"].setdefault(model, _empty_counters()),
+                             today["labels"].setdefault(call.get("label") or "(unlabelled)", _empty_counters())):
+                counters["requests"] += 1
+                counters["errors"] += 1 if call.get("error") else 0
+                for name in ("prompt_tokens", "output_tokens", "cached_tokens", "total_tokens"):
+                    counters[name] += usage.get(name, 0)
+            if call.get("quota_exceeded"):
+                print(f"Quota exceeded for {model}. Holding its requests for {self.cooldown_seconds} s.")
+                self._cooldown_until[model] = time.monotonic() + self.cooldown_seconds
+            self._dirty = True
+            save_due = time.monotonic() - self._last_save >= _SAVE_INTERVAL_SECONDS
+            if save_due:
+                self._last_save = time.monotonic() # One background save per interval
+        if save_due and self.path:
+            # Observers run on the LLM event loop, which must not block on file I/O
+            threading.Thread(target=self.save, name="UsageSave", daemon=True).start()
+
+    def _daily_fraction(self, model):
+        """Returns the largest used fraction of the model's daily limits (0 without limits). Caller holds the lock."""
+        counters = self._days.get(date.today().isoformat(), {}).get("models", {}).get(model)
+        if counters is None:
+            return 0.0
+        fractions = [0.0]
+        if self.requests_per_day.get(model):
+            fractions.append(counters["requests"] / self.requests_per_day[model])
+        if self.tokens_per_day.get(model):
+            fractions.append(counters["total_tokens"] / self.tokens_per_day[model])
+        return max(fractions)
+
+    def admission(self, model, priority="interactive", may_wait=True):
+        """
+        Decides whether a new request may be sent now.
+
+        Interactive requests are only refused when a daily limit is used up or the
+        API reported the quota exceeded; background requests ("prefetch", "batch")
+        are already refused near the limits, and paced below the per-minute rate.
+
+        Args:
+            model: The model the request is for.
+            priority: "interactive", "prefetch" or "batch".
+            may_wait: If False, a request that would have to wait is not counted as
+                admitted (the caller drops it, e.g. a hedged duplicate).
+
+        Returns:
+            tuple: (wait_seconds, refusal). If refusal is a message the request must not
+            be sent; otherwise it may be sent after waiting wait_seconds.
+        """
+        background = priority != "interactive"
+        now = time.monotonic()
+        with self._lock:
+            if self._cooldown_until.get(model, 0) > now:
+                return 0.0, f"Quota exceeded for {model}; requests resume in {self._cooldown_until[model] - now:.0f} s"
+            fraction = self._daily_fraction(model)
+            if fraction >= 1:
+                return 0.0, f"Daily quota of {model} used up"
+            if fraction >= self.warn_fraction:
+                if (date.today(), model) not in self._warned:
+                    self._warned.add((date.today(), model))
+                    print(f"Warning: {fraction:.0%} of the daily quota of {model} used. Background requests are paused.")
+                if background:
+                    return 0.0, f"Daily quota of {model} nearly used up; background requests are paused"
+
+            wait_seconds = 0.0
+            limit = self.requests_per_minute.get(model)
+            admitted = self._admitted.setdefault(model, deque())
+            while admitted and now - admitted[0] >= 60:
+                admitted.popleft()
+            if limit:
+                # Background requests leave headroom below the limit for interactive ones
+                allowed = max(1, int(limit * self.warn_fraction)) if background else limit
+                if len(admitted) >= allowed:
+                    wait_seconds = 60 - (now - admitted[len(admitted) - allowed])
+            if wait_seconds > 0 and not may_wait:
+                return wait_seconds, None
+            admitted.append(now + wait_seconds)
+        if wait_seconds > 0:
+            metrics.record("llm_quota_throttled", model=model, priority=priority, wait_ms=round(wait_seconds * 1000))
+        return wait_seconds, None
+
+    def summary(self, days=7):
+        """
+        Returns the usage of the last days.
+
+        Returns:
+            dict: {"today": {"models": ..., "labels": ...}, "days": {ISO date: totals},
+            "quota": {model: used fraction of the daily limit}}.
+        """
+        today = date.today()
+        with self._lock:
+            totals = {}
+            for offset in range(days):
+                day = (today - timedelta(days=offset)).isoformat()
+                day_totals = _empty_counters()
+                for counters in self._days.get(day, {}).get("models", {}).values():
+                    for name in _COUNTERS:
+                        day_totals[name] += counters[name]
+                totals[day] = day_totals
+            current = json.loads(json.dumps(self._days.get(today.isoformat(), {"models": {}, "labels": {}})))
+            quota = {model: self._daily_fraction(model) for model in set(self.requests_per_day) | set(self.tokens_per_day)}
+        return {"today": current, "days": totals, "quota": quota}
+
+    def format_summary(self, days=7):
+        """Returns the summary as plain text tables."""
+        summary = self.summary(days)
+        columns = ("requests", "errors", "prompt_tokens", "output_tokens", "cached_tokens")
+
+        def table(title, rows):
+            lines = [f"{title:<24}" + "".join(f"{name.replace('_tokens', ' tok'):>12}" for name in columns)]
+            for name, counters in rows:
+                lines.append(f"{name[:24]:<24}" + "".join(f"{counters[column]:>12,}" for column in columns))
+            return lines
+
+        lines = [f"Today ({date.today().isoformat()})", ""]
+        lines += table("Model", sorted(summary["today"]["models"].items()))
+        lines.append("")
+        lines += table("Prompt", sorted(summary["today"]["labels"].items(), key=lambda item: -item[1]["total_tokens"]))
+        if summary["quota"]:
+            lines += ["", "Daily quota used"]
+            lines += [f"  {model}: {fraction:.0%}" for model, fraction in sorted(summary["quota"].items())]
+        lines += ["", f"Last {days} days", ""]
+        lines += table("Day", list(summary["days"].items()))
+        return "\n".join(lines)
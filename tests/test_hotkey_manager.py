@@ -0,0 +1,147 @@
+"""Tests of the hotkey chord state machine, fed with virtual key codes as in hotkey_benchmark."""
+
+import os
+import string
+import sys
+import unittest
+
+# The state machine does not need a keyboard backend (and CI has no display)
+os.environ.setdefault("PYNPUT_BACKEND", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from pynput import keyboard # pylint: disable=wrong-import-position
+from hotkey_manager import ChordDetector, HotkeyManager, parse_chord # pylint: disable=wrong-import-position
+
+CTRL, SHIFT, ALT = 0xA2, 0xA0, 0xA4
+MODIFIER_VKS = {CTRL: 1, SHIFT: 2, ALT: 4}
+KEY_VKS = {char: [ord(char.upper())] for char in string.ascii_lowercase + string.digits}
+WINDOW_MS = 400
+
+
+def vk(char):
+    return ord(char.upper())
+
+
+class ChordDetectorTest(unittest.TestCase):
+
+    def make_detector(self, *chords):
+        return ChordDetector([parse_chord(chord) for chord in chords], WINDOW_MS, MODIFIER_VKS, KEY_VKS)
+
+    def feed(self, detector, events, step=0.05):
+        """Feeds (pressed, vk) events 50 ms apart; returns the bindings that fired."""
+        fired = []
+        now = 100.0
+        for pressed, code in events:
+            now += step
+            if pressed:
+                binding = detector.press(code, now)
+                if binding is not None:
+                    fired.append(binding)
+            else:
+                detector.release(code)
+        return fired
+
+    @staticmethod
+    def tap(code, *modifiers):
+        return [(True, m) for m in modifiers] + [(True, code), (False, code)] + [(False, m) for m in reversed(modifiers)]
+
+    def test_double_ctrl_c_fires(self):
+        detector = self.make_detector("ctrl+c ctrl+c")
+        events = [(True, CTRL), (True, vk("c")), (False, vk("c")), (True, vk("c")), (False, vk("c")), (False, CTRL)]
+        self.assertEqual(self.feed(detector, events), [0])
+
+    def test_single_ctrl_c_does_not_fire(self):
+        detector = self.make_detector("ctrl+c ctrl+c")
+        self.assertEqual(self.feed(detector, self.tap(vk("c"), CTRL)), [])
+
+    def test_second_combination_after_window_does_not_fire(self):
+        detector = self.make_detector("ctrl+c ctrl+c")
+        self.assertEqual(self.feed(detector, self.tap(vk("c"), CTRL) + self.tap(vk("c"), CTRL), step=0.2), [])
+
+    def test_plain_key_between_combinations_breaks_chord(self):
+        detector = self.make_detector("ctrl+c ctrl+c")
+        events = self.tap(vk("c"), CTRL) + self.tap(vk("c")) + self.tap(vk("c"), CTRL)
+        self.assertEqual(self.feed(detector, events), [])
+
+    def test_other_combination_between_breaks_chord(self):
+        detector = self.make_detector("ctrl+c ctrl+c")
+        events = self.tap(vk("c"), CTRL) + self.tap(vk("x"), CTRL) + self.tap(vk("c"), CTRL)
+        self.assertEqual(self.feed(detector, events), [])
+
+    def test_auto_repeat_is_not_a_second_press(self):
+        detector = self.make_detector("ctrl+c ctrl+c")
+        events = [(True, CTRL), (True, vk("c")), (True, vk("c")), (True, vk("c")), (False, vk("c")), (False, CTRL)]
+        self.assertEqual(self.feed(detector, events), [])
+
+    def test_shared_prefix_selects_binding(self):
+        detector = self.make_detector("ctrl+c ctrl+c", "ctrl+c ctrl+t", "ctrl+alt+p")
+        self.assertEqual(self.feed(detector, self.tap(vk("c"), CTRL) + self.tap(vk("t"), CTRL)), [1])
+        self.assertEqual(self.feed(detector, self.tap(vk("p"), CTRL, ALT)), [2])
+        self.assertEqual(self.feed(detector, self.tap(vk("c"), CTRL) + self.tap(vk("c"), CTRL)), [0])
+
+    def test_extra_modifier_does_not_match(self):
+        detector = self.make_detector("ctrl+alt+p")
+        self.assertEqual(self.feed(detector, self.tap(vk("p"), CTRL, SHIFT, ALT)), [])
+
+    def test_duplicate_chord_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.make_detector("ctrl+c ctrl+c", "control+c ctrl+c")
+
+    def test_unknown_key_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.make_detector("ctrl+nosuchkey")
+
+    def test_parse_chord(self):
+        self.assertEqual(parse_chord("Ctrl+Shift+T"), [(3, "t")])
+        self.assertEqual(parse_chord("ctrl+c ctrl+c"), [(1, "c"), (1, "c")])
+        with self.assertRaises(ValueError):
+            parse_chord("ctrl+shift")
+        with self.assertRaises(ValueError):
+            parse_chord("ctrl+a+b")
+
+
+class HotkeyManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fired = []
+        self.manager = HotkeyManager(self.fired.append, key_codes=(MODIFIER_VKS, KEY_VKS))
+        self.manager._running = True # pylint: disable=protected-access
+
+    def send(self, pressed, code):
+        key = keyboard.KeyCode.from_vk(code)
+        if pressed:
+            self.manager._on_press(key) # pylint: disable=protected-access
+        else:
+            self.manager._on_release(key) # pylint: disable=protected-access
+
+    def test_announced_simulated_copy_is_ignored(self):
+        # The user holds Ctrl through a double Ctrl+C while our own Ctrl+C is delivered like a physical one (X11)
+        self.send(True, CTRL)
+        self.send(True, vk("c"))
+        self.send(False, vk("c"))
+        self.manager.expect_simulated_keys("ctrl", "c")
+        for pressed, code in [(True, CTRL), (True, vk("c")), (False, vk("c")), (False, CTRL)]:
+            self.send(pressed, code)
+        self.assertEqual(self.fired, [])
+        self.send(True, vk("c")) # Ctrl is still held
+        self.assertEqual(self.fired, [None])
+
+    def test_user_release_before_simulated_press_is_kept(self):
+        self.send(True, CTRL)
+        self.manager.expect_simulated_keys("ctrl", "c")
+        self.send(False, CTRL) # The user lets go of Ctrl before our Ctrl+C arrives
+        for pressed, code in [(True, CTRL), (True, vk("c")), (False, vk("c")), (False, CTRL)]:
+            self.send(pressed, code)
+        for pressed, code in [(True, vk("c")), (False, vk("c")), (True, CTRL), (True, vk("c"))]:
+            self.send(pressed, code)
+        self.assertEqual(self.fired, []) # The first c was typed without Ctrl
+
+    def test_announcement_expires(self):
+        self.manager.expect_simulated_keys("ctrl", "c")
+        self.manager._simulated_until = 0.0 # pylint: disable=protected-access
+        for pressed, code in [(True, CTRL), (True, vk("c")), (False, vk("c")), (True, vk("c"))]:
+            self.send(pressed, code)
+        self.assertEqual(self.fired, [None])
+
+if __name__ == "__main__":
+    unittest.main()